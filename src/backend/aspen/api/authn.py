@@ -19,9 +19,12 @@ from starlette.requests import Request
 import aspen.api.error.http_exceptions as ex
 from aspen.api.deps import get_db, get_settings
 from aspen.api.settings import APISettings
+from aspen.api.timing import timed_phase
 from aspen.auth.auth0_management import Auth0Client
+from aspen.auth.auth_cache import auth_cache_for, AuthContextCache
 from aspen.auth.device_auth import validate_auth_header
 from aspen.database.models import Group, GroupRole, User, UserRole
+from aspen.util.blocking import run_blocking
 
 
 def get_usergroup_query(
@@ -70,6 +73,35 @@ async def setup_userinfo(
     return user
 
 
+async def load_auth_user(
+    session: AsyncSession,
+    auth_cache: AuthContextCache,
+    auth0_user_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+) -> Optional[User]:
+    """Returns the user (with roles and groups loaded) attached to `session`, using
+    the auth cache to skip the usergroup query whenever we can."""
+    cache_key = AuthContextCache.user_key(auth0_user_id, user_id)
+    cached_user = auth_cache.get_user(cache_key)
+    if cached_user is None:
+        # Load the user in a throwaway session, so the cached copy is never attached
+        # to (or modified by) any one request.
+        async with AsyncSession(session.bind, expire_on_commit=False) as loader:
+            cached_user = await setup_userinfo(loader, auth0_user_id, user_id)
+        if not cached_user:
+            return None
+        auth_cache.put_user(cache_key, cached_user)
+    else:
+        sentry_sdk.set_user(
+            {
+                "id": cached_user.id,
+                "auth0_uid": cached_user.auth0_user_id,
+            }
+        )
+    # Copy the cached user graph into this request's session without any queries.
+    return await session.merge(cached_user, load=False)
+
+
 class MagicLinkPayload(TypedDict):
     user_id: str
     expiry: str
@@ -143,6 +175,7 @@ async def get_auth_user(
     magic_link_userid: Optional[str] = Depends(magic_link_userid),
     cookie_userid: Optional[str] = Depends(get_cookie_userid),
     token_userid: Optional[str] = Depends(get_token_userid),
+    settings: APISettings = Depends(get_settings),
 ) -> User:
     auth0_user_id = None
     user_id = None
@@ -154,7 +187,11 @@ async def get_auth_user(
     if not auth0_user_id and not user_id:
         # TODO - redirect to login.
         raise ex.UnauthenticatedException("Login failure")
-    found_auth_user = await setup_userinfo(session, auth0_user_id, user_id)
+    auth_cache = auth_cache_for(session, settings.AUTH_CACHE_TTL)
+    with timed_phase("authn"):
+        found_auth_user = await load_auth_user(
+            session, auth_cache, auth0_user_id, user_id
+        )
     if not found_auth_user:
         # login attempt from user not in DB
         # TODO - redirect to login.
@@ -176,7 +213,10 @@ async def get_auth0_apiclient(settings: APISettings = Depends(get_settings)):
     client_id: str = settings.AUTH0_MANAGEMENT_CLIENT_ID
     client_secret: str = settings.AUTH0_MANAGEMENT_CLIENT_SECRET
     domain: str = settings.AUTH0_MANAGEMENT_DOMAIN
-    auth0_client = Auth0Client(client_id, client_secret, domain)
+    # Creating a client fetches a management API token from Auth0.
+    auth0_client = await run_blocking(
+        "auth0", Auth0Client, client_id, client_secret, domain
+    )
     return auth0_client
 
 
@@ -218,6 +258,9 @@ async def get_user_roles(
 ) -> MutableSequence[UserRole]:
     # Figure out whether this user is a *direct member* of the group
     # we're trying to get context for.
+    if "user_roles" not in sa.inspect(user).unloaded:
+        # get_auth_user already loaded every role this user has.
+        return [row for row in user.user_roles if row.group_id == group_id]
     query = (
         sa.select(UserRole)  # type: ignore
         .options(  # type: ignore
@@ -246,18 +289,24 @@ async def get_auth_context(
         roles.append(row.role.name)
         group = row.group
     if group:
-        query = (
-            sa.select(GroupRole)  # type: ignore
-            .options(  # type: ignore
-                joinedload(GroupRole.role, innerjoin=True),  # type: ignore
-                joinedload(GroupRole.grantor_group, innerjoin=True),  # type: ignore
+        auth_cache = auth_cache_for(session)
+        cached_groles = auth_cache.get_group_roles(group.id)
+        if cached_groles is not None:
+            groles = list(cached_groles)  # type: ignore
+        else:
+            query = (
+                sa.select(GroupRole)  # type: ignore
+                .options(  # type: ignore
+                    joinedload(GroupRole.role, innerjoin=True),  # type: ignore
+                    joinedload(GroupRole.grantor_group, innerjoin=True),  # type: ignore
+                )
+                .filter(GroupRole.grantee_group_id == group_id)  # type: ignore
             )
-            .filter(GroupRole.grantee_group_id == group_id)  # type: ignore
-        )
-        rolewait = await session.execute(query)
-        group_roles = rolewait.unique().scalars().all()
-        for row in group_roles:
-            groles.append({"group_id": row.grantor_group.id, "role": row.role.name})
+            rolewait = await session.execute(query)
+            group_roles = rolewait.unique().scalars().all()
+            for row in group_roles:
+                groles.append({"group_id": row.grantor_group.id, "role": row.role.name})
+            auth_cache.put_group_roles(group.id, list(groles))  # type: ignore
 
     # Generate an auth context with or without group info.
     ac = AuthContext(user, group, roles, groles)
@@ -1,17 +1,22 @@
+from contextvars import ContextVar
 from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import Dict, FrozenSet, List, Optional, Tuple
 
+import sqlalchemy as sa
 from fastapi import Depends
 from oso import AsyncOso, Relation
 from polar.data.adapter.async_sqlalchemy2_adapter import AsyncSqlAlchemyAdapter
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.sql import Select
 from starlette.requests import Request
 
 from aspen.api.authn import AuthContext, get_auth_context
 from aspen.api.deps import get_db
 from aspen.api.error import http_exceptions as ex
+from aspen.api.timing import timed_phase
 from aspen.database.models import Group, PhyloRun, PhyloTree, Sample, User
 from aspen.database.models.base import idbase
 
@@ -76,28 +81,132 @@ def register_classes(oso):
     )
 
 
+POLICY_FILE = Path.joinpath(Path(__file__).parent.absolute(), "policy.polar")
+
+# The db session for the authorization check that's currently running. Oso wants its
+# data filtering adapter at setup time, but our compiled policy outlives any single
+# request, so the adapter looks the session up here instead.
+current_authz_db_session: ContextVar[AsyncSession] = ContextVar(
+    "current_authz_db_session"
+)
+
+
+class RequestSessionAdapter(AsyncSqlAlchemyAdapter):
+    """Data filtering adapter that uses the db session of the current request."""
+
+    def __init__(self) -> None:
+        pass
+
+    @property
+    def session(self) -> AsyncSession:
+        return current_authz_db_session.get()
+
+
+async def build_authz_policy() -> AsyncOso:
+    """Parses policy.polar and registers our classes. This is pure CPU work, so it
+    only needs to happen once per worker."""
+    oso = AsyncOso()
+    oso.set_data_filtering_adapter(RequestSessionAdapter())
+    register_classes(oso)
+    await oso.load_files([POLICY_FILE])
+    return oso
+
+
+_authz_policy: Optional[AsyncOso] = None
+
+
+async def get_authz_policy() -> AsyncOso:
+    """Returns this worker's compiled policy, building it on first use."""
+    global _authz_policy
+    if _authz_policy is None:
+        _authz_policy = await build_authz_policy()
+    return _authz_policy
+
+
+# The Sample rules in policy.polar, compiled by hand. For each permission: the roles
+# on a sample's submitting group that grant it on every sample, and the roles that
+# only grant it on public samples. Keep this in sync with policy.polar;
+# test_authz_policy.py checks that both give the same answers.
+SAMPLE_PERMISSIONS: Dict[str, Tuple[FrozenSet[str], FrozenSet[str]]] = {
+    "read": (frozenset({"admin", "member"}), frozenset({"viewer"})),
+    "read_private": (frozenset({"admin", "member"}), frozenset()),
+    "sequences": (frozenset({"admin", "member"}), frozenset()),
+    "write": (frozenset({"admin", "member"}), frozenset()),
+}
+
+
+def _group_ids_param(group_ids: List[int]):
+    # One array parameter, so the SQL is the same however many groups there are.
+    return sa.any_(sa.literal(group_ids, type_=postgresql.ARRAY(sa.Integer)))
+
+
 # This is just a thin indirection/wrapper for Oso's interface in case we need to swap it out
 # with something else in the future.
 class AuthZSession:
     def __init__(self, session: AsyncSession, auth_context: AuthContext):
-        oso = AsyncOso()
-        oso.set_data_filtering_adapter(AsyncSqlAlchemyAdapter(session))
-        register_classes(oso)
+        # The compiled policy is shared by every request in this worker; all we keep
+        # per-request is who is asking and which db session to filter with.
+        self.session = session
         self.auth_context = auth_context
-        self.oso = oso
-        self.config_loaded = False
+        # roles -> ids of the groups the caller has any of those roles on.
+        self._role_group_ids: Dict[FrozenSet[str], List[int]] = {}
+
+    def role_group_ids(self, roles: FrozenSet[str]) -> List[int]:
+        """Ids of the groups the caller has one of `roles` on, either directly or
+        through a role another group granted their group."""
+        group_ids = self._role_group_ids.get(roles)
+        if group_ids is None:
+            ac = self.auth_context
+            found = set()
+            if ac.group is not None and roles.intersection(ac.user_roles):
+                found.add(ac.group.id)
+            for grole in ac.group_roles:
+                if grole["role"] in roles:
+                    found.add(grole["group_id"])
+            group_ids = self._role_group_ids[roles] = sorted(found)
+        return group_ids
 
-    async def load_config(self):
-        await self.oso.load_files(
-            [Path.joinpath(Path(__file__).parent.absolute(), "policy.polar")]
-        )
-        self.config_loaded = True
+    def native_query(self, privilege: str, model: idbase) -> Optional[Select]:
+        """The same filter Oso would build, without asking Oso, for the rules we've
+        compiled by hand. Returns None for everything else."""
+        if model is not Sample or privilege not in SAMPLE_PERMISSIONS:
+            return None
+        all_roles, public_roles = SAMPLE_PERMISSIONS[privilege]
+        all_group_ids = self.role_group_ids(all_roles)
+        clause = Sample.submitting_group_id == _group_ids_param(all_group_ids)
+        if public_roles:
+            public_group_ids = [
+                group_id
+                for group_id in self.role_group_ids(public_roles)
+                if group_id not in all_group_ids
+            ]
+            if public_group_ids:
+                clause = sa.or_(
+                    clause,
+                    sa.and_(
+                        Sample.submitting_group_id
+                        == _group_ids_param(public_group_ids),
+                        Sample.private.is_(False),
+                    ),
+                )
+        return sa.select(Sample).where(clause)  # type: ignore
 
     async def authorized_query(self, privilege: str, model: idbase):
-        # Temp hack to avoid an await in __init__
-        if not self.config_loaded:
-            await self.load_config()
-        return await self.oso.authorized_query(self.auth_context, privilege, model)
+        with timed_phase("authz"):
+            query = self.native_query(privilege, model)
+            if query is not None:
+                return query
+            return await self._oso_authorized_query(privilege, model)
+
+    async def oso_authorized_query(self, privilege: str, model: idbase):
+        """Always asks Oso, even when we have a native filter for this rule."""
+        with timed_phase("authz"):
+            return await self._oso_authorized_query(privilege, model)
+
+    async def _oso_authorized_query(self, privilege: str, model: idbase):
+        oso = await get_authz_policy()
+        current_authz_db_session.set(self.session)
+        return await oso.authorized_query(self.auth_context, privilege, model)
 
 
 async def get_authz_session(
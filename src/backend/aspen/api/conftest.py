@@ -15,6 +15,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from aspen.api.authn import get_auth0_apiclient, get_cookie_userid
 from aspen.api.deps import get_auth0_client, get_db, get_splitio
 from aspen.api.main import get_app
+from aspen.api.utils.phylo_cache import phylo_tree_cache
 from aspen.auth.auth0_management import Auth0Client
 from aspen.database import connection as aspen_connection
 from aspen.database import schema
@@ -155,6 +156,8 @@ async def api(
     split_client: SplitClient,
 ) -> FastAPI:
     api = get_app()
+    # Tree ids and S3 keys get reused from test to test.
+    phylo_tree_cache.clear()
     api.dependency_overrides[get_db] = partial(override_get_db, async_db)
     api.dependency_overrides[get_cookie_userid] = override_get_cookie_userid
     api.dependency_overrides[get_auth0_apiclient] = lambda: auth0_apiclient
@@ -1,19 +1,17 @@
-from operator import and_
 from typing import AsyncGenerator
 
-import sqlalchemy as sa
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import contains_eager
-from sqlalchemy.orm.exc import NoResultFound
 from starlette.requests import Request
 
 from aspen.api.error import http_exceptions as ex
 from aspen.api.settings import APISettings
+from aspen.api.timing import timed_phase
 from aspen.database.connection import init_async_db, SqlAlchemyInterface
 from aspen.database.models import Pathogen
 from aspen.database.models.pathogens import PathogenRepoConfig
 from aspen.database.models.public_repositories import PublicRepository
+from aspen.database.reference_cache import reference_cache_for
 from aspen.util.split import SplitClient
 
 
@@ -36,15 +34,28 @@ def get_splitio(request: Request) -> SplitClient:
     return splitio
 
 
+def init_app_db(settings: APISettings) -> SqlAlchemyInterface:
+    """Builds the engine (and connection pool) shared by every request in this worker"""
+    return init_async_db(
+        settings.DB_DSN,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        echo=settings.DB_ECHO,
+    )
+
+
 async def get_engine(
     request: Request, settings: APISettings = Depends(get_settings)
-) -> AsyncGenerator[SqlAlchemyInterface, None]:
-    """Store db session in the context var and reset it"""
-    engine = init_async_db(settings.DB_DSN)
-    try:
-        yield engine
-    finally:
-        pass
+) -> SqlAlchemyInterface:
+    # The engine is created by our startup handler, but some ASGI harnesses (like
+    # httpx's test client) don't send lifespan events, so create it lazily if needed.
+    engine = getattr(request.app.state, "db_engine", None)
+    if engine is None:
+        engine = init_app_db(settings)
+        request.app.state.db_engine = engine
+    return engine
 
 
 async def get_db(
@@ -68,10 +79,11 @@ def get_pathogen_slug(pathogen_slug=None):
 async def get_pathogen(
     slug: str = Depends(get_pathogen_slug), db: AsyncSession = Depends(get_db)
 ) -> Pathogen:
-    try:
-        return await Pathogen.get_by_slug(db, slug)
-    except NoResultFound:
+    with timed_phase("deps"):
+        pathogen = await reference_cache_for(db).get_pathogen(db, slug)
+    if pathogen is None:
         raise ex.BadRequestException("Invalid pathogen slug")
+    return pathogen
 
 
 async def get_public_repository(
@@ -83,11 +95,13 @@ async def get_public_repository(
         "PATHOGEN_public_repository", pathogen
     )
 
-    try:
-        repo = (await db.execute(sa.select(PublicRepository).filter_by(name=preferred_public_db))).scalars().one()  # type: ignore
-        return repo
-    except NoResultFound:
+    with timed_phase("deps"):
+        repo = await reference_cache_for(db).get_public_repository(
+            db, preferred_public_db
+        )
+    if repo is None:
         raise ex.BadRequestException("Invalid public repository")
+    return repo
 
 
 async def get_contextual_repository(
@@ -99,39 +113,28 @@ async def get_contextual_repository(
         "PATHOGEN_contextual_repository", pathogen
     )
 
-    try:
-        repo = (await db.execute(sa.select(PublicRepository).filter_by(name=preferred_public_db))).scalars().one()  # type: ignore
-        return repo
-    except NoResultFound:
+    with timed_phase("deps"):
+        repo = await reference_cache_for(db).get_public_repository(
+            db, preferred_public_db
+        )
+    if repo is None:
         raise ex.BadRequestException("Invalid public repository")
+    return repo
 
 
 async def get_pathogen_repo_config(
     splitio: SplitClient = Depends(get_splitio),
     pathogen: Pathogen = Depends(get_pathogen),
     db: AsyncSession = Depends(get_db),
-):
+) -> PathogenRepoConfig:
     preferred_public_db = splitio.get_pathogen_treatment(
         "PATHOGEN_public_repository", pathogen
     )
 
-    q = (
-        sa.select(PathogenRepoConfig)  # type: ignore
-        .join(PathogenRepoConfig.public_repository)
-        .join(PathogenRepoConfig.pathogen)
-        .options(
-            contains_eager(PathogenRepoConfig.public_repository),
-            contains_eager(PathogenRepoConfig.pathogen),
-        )
-        .filter(
-            and_(
-                PathogenRepoConfig.pathogen == pathogen,
-                PublicRepository.name == preferred_public_db,
-            )
+    with timed_phase("deps"):
+        pathogen_repo_config = await reference_cache_for(db).get_pathogen_repo_config(
+            db, pathogen, preferred_public_db
         )
-    )
-    res = await db.execute(q)
-    pathogen_repo_config = res.scalars().one_or_none()
     if pathogen_repo_config is None:
         raise ex.ServerException(
             "no public repository found for given pathogen public repository"
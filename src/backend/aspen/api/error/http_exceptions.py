@@ -3,6 +3,8 @@ from typing import Any, Mapping, Optional
 from fastapi.responses import JSONResponse
 from starlette.requests import Request
 
+from aspen.util.blocking import BlockingCallError, BlockingCallTimeout
+
 
 class AspenException(Exception):
     status_code = 500
@@ -27,6 +29,16 @@ async def exception_handler(request: Request, exc: AspenException) -> JSONRespon
     return exc.make_response()
 
 
+async def blocking_call_exception_handler(
+    request: Request, exc: BlockingCallError
+) -> JSONResponse:
+    # An upstream service (S3, Auth0...) is too slow or we're making too many calls
+    # to it at once.
+    if isinstance(exc, BlockingCallTimeout):
+        return GatewayTimeoutException(str(exc)).make_response()
+    return ServiceUnavailableException(str(exc)).make_response()
+
+
 class UnauthenticatedException(AspenException):
     status_code = 401
 
@@ -45,3 +57,11 @@ class NotFoundException(AspenException):
 
 class ServerException(AspenException):
     status_code = 500
+
+
+class ServiceUnavailableException(AspenException):
+    status_code = 503
+
+
+class GatewayTimeoutException(AspenException):
+    status_code = 504
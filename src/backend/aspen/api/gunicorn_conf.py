@@ -3,6 +3,8 @@ import logging
 import os
 import sys
 
+from aspen.util.metrics import clear_metrics_dir, mark_process_dead
+
 logging.basicConfig(
     level=logging.INFO,
     format="apiv2 [%(asctime)s] %(levelname)s [%(name)s.%(funcName)s:%(lineno)d] %(message)s",
@@ -22,6 +24,19 @@ timeout = int(os.getenv("TIMEOUT", "120"))
 keepalive = int(os.getenv("KEEP_ALIVE", "5"))
 # TODO - this is broken, per https://github.com/encode/uvicorn/issues/527
 access_log_format = 'apiv2 %(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+# Workers share their metrics through this dir (see aspen.util.metrics).
+metrics_dir = os.environ.setdefault("METRICS_DIR", "/dev/shm/aspen-metrics")
+
+
+# Gunicorn server hooks
+def on_starting(server):
+    # Don't count requests served by a previous run of the server.
+    clear_metrics_dir(metrics_dir)
+
+
+def child_exit(server, worker):
+    mark_process_dead(worker.pid, metrics_dir)
+
 
 # For debugging and testing
 log_data = {
@@ -34,5 +49,6 @@ log_data = {
     "keepalive": keepalive,
     "errorlog": errorlog,
     "accesslog": accesslog,
+    "metrics_dir": metrics_dir,
 }
 print(json.dumps(log_data))
@@ -1,3 +1,5 @@
+import asyncio
+import logging
 import os
 from typing import List, Optional
 
@@ -5,14 +7,25 @@ import sentry_sdk
 import uvicorn
 from authlib.integrations.starlette_client import OAuth
 from fastapi import Depends, FastAPI
-from fastapi.responses import ORJSONResponse
 from sentry_sdk.integrations.asgi import SentryAsgiMiddleware
 from starlette.middleware.cors import CORSMiddleware
 
 from aspen.api.authn import get_auth_user, require_group_membership
-from aspen.api.error.http_exceptions import AspenException, exception_handler
+from aspen.api.authz import get_authz_policy
+from aspen.api.deps import init_app_db
+from aspen.api.error.http_exceptions import (
+    AspenException,
+    blocking_call_exception_handler,
+    exception_handler,
+)
+from aspen.api.middleware.metrics import MetricsMiddleware
+from aspen.api.middleware.query_profile import QueryProfileMiddleware
+from aspen.api.middleware.server_timing import ServerTimingMiddleware
 from aspen.api.middleware.session import SessionMiddleware
 from aspen.api.settings import APISettings
+from aspen.api.timing import TimedORJSONResponse
+from aspen.api.utils.job_queue import JobDispatcher
+from aspen.api.utils.phylo_cache import phylo_tree_cache
 from aspen.api.views import (
     auspice,
     auth,
@@ -29,6 +42,14 @@ from aspen.api.views import (
     users,
     usher,
 )
+from aspen.auth.auth_cache import listen_for_invalidations
+from aspen.database.query_profile import install_query_profiler
+from aspen.database.reference_cache import (
+    listen_for_invalidations as listen_for_reference_invalidations,
+)
+from aspen.database.reference_cache import reference_cache_for, run_refresher
+from aspen.util.blocking import BlockingCallError, configure_blocking_pools
+from aspen.util.metrics import run_reporter
 from aspen.util.split import SplitClient
 
 
@@ -73,12 +94,126 @@ def get_app() -> FastAPI:
         debug=settings.DEBUG,
         openapi_url="/v2/openapi.json",
         docs_url="/v2/docs",
-        default_response_class=ORJSONResponse,
+        default_response_class=TimedORJSONResponse,
     )
 
     # Add a global settings object to the app that we can use as a dependency
     _app.state.aspen_settings = settings
 
+    # Every worker process gets one engine (and one connection pool) that all of
+    # its requests share. It's created on startup and disposed on shutdown.
+    async def start_db_engine() -> None:
+        _app.state.db_engine = init_app_db(settings)
+
+    async def stop_db_engine() -> None:
+        engine = getattr(_app.state, "db_engine", None)
+        if engine is not None:
+            await engine.engine.dispose()
+            _app.state.db_engine = None
+
+    _app.add_event_handler("startup", start_db_engine)
+    _app.add_event_handler("shutdown", stop_db_engine)
+
+    # Compile our authorization policy before we start taking requests.
+    _app.add_event_handler("startup", get_authz_policy)
+
+    # Listen for auth and reference data cache invalidations sent by other workers
+    # and scripts. If we can't, cached auth data still expires after AUTH_CACHE_TTL
+    # seconds, and reference data is still refreshed by its version check.
+    async def start_auth_cache_listener() -> None:
+        try:
+            listener = await listen_for_invalidations(settings.DB_DSN)
+            await listen_for_reference_invalidations(listener)
+            _app.state.auth_cache_listener = listener
+        except Exception:
+            logging.exception("Could not listen for cache invalidations")
+
+    async def stop_auth_cache_listener() -> None:
+        listener = getattr(_app.state, "auth_cache_listener", None)
+        if listener is not None:
+            await listener.close()
+
+    _app.add_event_handler("startup", start_auth_cache_listener)
+    _app.add_event_handler("shutdown", stop_auth_cache_listener)
+
+    # Load the pathogen, repository and location tables before we take requests,
+    # and reload them whenever they change.
+    async def start_reference_cache() -> None:
+        engine = _app.state.db_engine.engine
+        try:
+            await reference_cache_for(engine).load(engine)
+        except Exception:
+            # Requests will load it instead.
+            logging.exception("Could not warm the reference data cache")
+        if settings.REFERENCE_CACHE_REFRESH_SECONDS > 0:
+            _app.state.reference_cache_refresher = asyncio.create_task(
+                run_refresher(engine, settings.REFERENCE_CACHE_REFRESH_SECONDS)
+            )
+
+    async def stop_reference_cache() -> None:
+        refresher = getattr(_app.state, "reference_cache_refresher", None)
+        if refresher is not None:
+            refresher.cancel()
+            try:
+                await refresher
+            except asyncio.CancelledError:
+                pass
+
+    _app.add_event_handler("startup", start_reference_cache)
+    _app.add_event_handler("shutdown", stop_reference_cache)
+
+    # Launch the jobs queued up by sample uploads.
+    async def start_job_dispatcher() -> None:
+        dispatcher = JobDispatcher(_app.state.db_engine, settings)
+        _app.state.job_dispatcher = asyncio.create_task(
+            dispatcher.run(settings.JOB_QUEUE_POLL_SECONDS)
+        )
+
+    async def stop_job_dispatcher() -> None:
+        dispatcher = getattr(_app.state, "job_dispatcher", None)
+        if dispatcher is not None:
+            dispatcher.cancel()
+            try:
+                await dispatcher
+            except asyncio.CancelledError:
+                pass
+
+    if settings.JOB_QUEUE_DISPATCH_ENABLED:
+        _app.add_event_handler("startup", start_job_dispatcher)
+        _app.add_event_handler("shutdown", stop_job_dispatcher)
+
+    # Sample event loop lag, and share our metrics with the other workers.
+    async def start_metrics_reporter() -> None:
+        _app.state.metrics_reporter = asyncio.create_task(
+            run_reporter(settings.METRICS_LAG_INTERVAL, settings.METRICS_FLUSH_EVERY)
+        )
+
+    async def stop_metrics_reporter() -> None:
+        reporter = getattr(_app.state, "metrics_reporter", None)
+        if reporter is not None:
+            reporter.cancel()
+            try:
+                await reporter
+            except asyncio.CancelledError:
+                pass
+
+    if settings.METRICS_ENABLED:
+        _app.add_event_handler("startup", start_metrics_reporter)
+        _app.add_event_handler("shutdown", stop_metrics_reporter)
+
+    configure_blocking_pools(
+        settings.BLOCKING_IO_MAX_WORKERS,
+        settings.BLOCKING_IO_MAX_PENDING,
+        settings.BLOCKING_IO_TIMEOUT,
+    )
+
+    phylo_tree_cache.configure(
+        settings.PHYLO_TREE_CACHE_MAX_BYTES,
+        settings.PHYLO_TREE_CACHE_DIR,
+        settings.PHYLO_TREE_CACHE_MAX_DISK_BYTES,
+        settings.PHYLO_TREE_ETAG_TTL,
+    )
+
     # Set up Split.io feature flagging
     splitio = SplitClient(settings)
 
@@ -110,6 +245,17 @@ def get_app() -> FastAPI:
         allow_methods=["*"],
     )
     _app.add_middleware(SessionMiddleware, secret_key=settings.FLASK_SECRET)
+    if settings.QUERY_PROFILE_ENABLED:
+        install_query_profiler()
+        _app.add_middleware(
+            QueryProfileMiddleware,
+            n_plus_one_threshold=settings.QUERY_PROFILE_N_PLUS_ONE_THRESHOLD,
+        )
+    if settings.SERVER_TIMING_ENABLED:
+        install_query_profiler()
+        _app.add_middleware(ServerTimingMiddleware)
+    if settings.METRICS_ENABLED:
+        _app.add_middleware(MetricsMiddleware)
 
     sentry_sdk.init(  # type: ignore
         dsn=settings.SENTRY_BACKEND_DSN,
@@ -143,6 +289,10 @@ def get_app() -> FastAPI:
         AspenException,
         exception_handler,
     )
+    _app.add_exception_handler(
+        BlockingCallError,
+        blocking_call_exception_handler,
+    )
 
     # Auspice endpoints don't all require authentication, they can do their own login checks.
     _app.include_router(auspice.router, prefix="/v2/orgs/{org_id}/auspice")
@@ -0,0 +1,73 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from aspen.util.metrics import REGISTRY
+
+REQUESTS = REGISTRY.counter(
+    "aspen_http_requests_total",
+    "HTTP requests served",
+    ["route", "method", "status"],
+)
+REQUEST_DURATION = REGISTRY.histogram(
+    "aspen_http_request_duration_seconds",
+    "Time from receiving a request until its response was finished",
+    ["route", "method"],
+)
+RESPONSE_SIZE = REGISTRY.histogram(
+    "aspen_http_response_size_bytes",
+    "Size of response bodies",
+    ["route", "method"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+)
+IN_PROGRESS = REGISTRY.gauge(
+    "aspen_http_requests_in_progress",
+    "Requests currently being handled",
+)
+
+# Requests that didn't match any route (404s, scanners...) share one label, so they
+# can't blow up the number of series.
+UNMATCHED_ROUTE = "unmatched"
+
+
+class MetricsMiddleware:
+    """Records request counts, latency, response sizes and in-flight requests.
+
+    Requests are labelled by the name of the endpoint that handled them rather than
+    by path, so /samples/1 and /samples/2 count as the same route.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+        response_size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_PROGRESS.dec()
+            # The router copies the matched endpoint into our scope.
+            endpoint = scope.get("endpoint")
+            route = getattr(endpoint, "__name__", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+            REQUESTS.inc(route=route, method=method, status=status_code)
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start, route=route, method=method
+            )
+            RESPONSE_SIZE.observe(response_size, route=route, method=method)
@@ -0,0 +1,60 @@
+import json
+import logging
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from aspen.database.query_profile import profile_queries, QueryProfile
+
+logger = logging.getLogger("aspen.query_profile")
+
+HEADER_NAME = "X-Query-Profile"
+
+
+class QueryProfileMiddleware:
+    """Profiles the SQL each request runs.
+
+    Adds an X-Query-Profile header (statement count, total db time and the number of
+    N+1 suspects) and logs a JSON summary with the top fingerprints once the response
+    is finished. Streaming responses keep querying after their headers go out, so
+    only the log line covers those completely.
+    """
+
+    def __init__(
+        self, app: ASGIApp, n_plus_one_threshold: int = 10, top: int = 5
+    ) -> None:
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.top = top
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = None
+        with profile_queries() as profile:
+
+            async def send_wrapper(message: Message) -> None:
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        HEADER_NAME, profile.header_value(self.n_plus_one_threshold)
+                    )
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # Requests that never touch the db (health checks etc.) aren't logged.
+                if profile.statements:
+                    self.log(scope, status_code, profile)
+
+    def log(self, scope: Scope, status_code: Optional[int], profile: QueryProfile):
+        summary = profile.summary(self.n_plus_one_threshold, self.top)
+        summary.update(method=scope["method"], path=scope["path"], status=status_code)
+        level = logging.WARNING if summary["n_plus_one_suspects"] else logging.INFO
+        logger.log(level, json.dumps(summary))
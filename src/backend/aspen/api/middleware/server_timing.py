@@ -0,0 +1,53 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from aspen.api.timing import phase_histograms, track_phases
+from aspen.database.query_profile import profile_queries
+
+HEADER_NAME = "Server-Timing"
+
+
+class ServerTimingMiddleware:
+    """Reports where each request spent its time.
+
+    Phases timed with `timed_phase` (authn, authz, query, serialize...) plus the
+    time spent waiting on the database and the overall total go out in a standard
+    Server-Timing header, so they show up in the browser's devtools. Once the
+    response is finished every phase is also recorded in `phase_histograms`, keyed
+    by the name of the endpoint that handled the request.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_phases() as phases, profile_queries() as queries:
+
+            def record_db_time() -> None:
+                if queries.statements:
+                    phases.durations["db"] = queries.total_time
+                    phases.descriptions["db"] = f"{queries.statements} statements"
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    record_db_time()
+                    headers = MutableHeaders(scope=message)
+                    headers.append(HEADER_NAME, phases.server_timing_header())
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                record_db_time()
+                # The router copies the matched endpoint into our scope.
+                endpoint = scope.get("endpoint")
+                if endpoint is not None:
+                    phase_histograms.observe(
+                        getattr(endpoint, "__name__", str(endpoint)),
+                        phases,
+                        phases.elapsed(),
+                    )
@@ -1,5 +1,40 @@
+from typing import Dict, Optional
+
 from aspen.api.schemas.base import BaseResponse
 
 
 class Health(BaseResponse):
     healthy: bool = False
+
+
+class DBPoolStatus(BaseResponse):
+    pool_size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    max_overflow: int
+    checkouts: Optional[int]
+    total_wait_seconds: Optional[float]
+    max_wait_seconds: Optional[float]
+
+
+class CacheStats(BaseResponse):
+    caches: Dict[str, Dict[str, float]]
+
+
+class JobQueueStatus(BaseResponse):
+    # job type -> status -> number of queued jobs
+    jobs: Dict[str, Dict[str, int]]
+    oldest_pending_seconds: Optional[float]
+
+
+class PhaseHistogram(BaseResponse):
+    count: int
+    sum_ms: float
+    # Cumulative counts, keyed by each bucket's upper bound in ms.
+    buckets: Dict[str, int]
+
+
+class PhaseTimings(BaseResponse):
+    # route -> phase -> histogram
+    routes: Dict[str, Dict[str, PhaseHistogram]]
@@ -12,6 +12,7 @@ from aspen.database.models import LineageType
 from aspen.database.models.lineages import QCMetricCaller
 
 SEQUENCE_VALIDATION_REGEX = r"^[WSKMYRVHDBNZNATCGUwskmyrvhdbnznatcgu-]+$"
+SEQUENCE_MIN_LENGTH = 1000
 
 
 class SampleRequest(BaseRequest):
@@ -124,6 +125,10 @@ class SamplesResponse(BaseResponse):
     samples: List[SampleResponse]
 
 
+class SamplesPageResponse(SamplesResponse):
+    next_cursor: Optional[str]
+
+
 class SampleBulkDeleteResponse(BaseResponse):
     ids: List[int]
 
@@ -167,7 +172,7 @@ class CreateSamplePathogenGenomeRequest(BaseRequest):
     sequencing_date: Optional[datetime.date]
     sequencing_depth: Optional[float]
     sequence: constr(  # type: ignore
-        min_length=1000,
+        min_length=SEQUENCE_MIN_LENGTH,
         strict=True,
         regex=SEQUENCE_VALIDATION_REGEX,
     )  # type: ignore
@@ -198,6 +203,32 @@ class CreateSamplesResponse(BaseResponse):
     success: bool
 
 
+class SampleUploadMetadataRow(CreateSamplesBaseRequest):
+    """One row of the metadata TSV sent to the streaming upload endpoint; its
+    sequence comes from the FASTA record with the same private identifier. Empty
+    cells count as missing values."""
+
+    sequencing_date: Optional[datetime.date]
+    sequencing_depth: Optional[float]
+
+
+class UploadedSampleResponse(BaseResponse):
+    id: int
+    private_identifier: str
+    public_identifier: str
+
+
+class SampleUploadResponse(BaseResponse):
+    samples: List[UploadedSampleResponse]
+
+
+class SampleUploadRowError(BaseResponse):
+    # The metadata TSV line the sample is on, if it has one.
+    line: Optional[int]
+    private_identifier: Optional[str]
+    message: str
+
+
 class SubmissionTemplateRequest(BaseRequest):
     sample_ids: List[str]
     public_repository_name: str
@@ -76,9 +76,61 @@ class Settings(BaseSettings):
     SERVICE_NAME: str = "Aspen"
     DB_DRIVER: str = "postgresql+asyncpg"
     DB_POOL_SIZE: int = 5
-    DB_MAX_OVERFLOW: int = 0
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
     DB_ECHO: bool = False
     DEBUG: bool = False
+    # How long (in seconds) each worker caches resolved users/roles for auth.
+    AUTH_CACHE_TTL: int = 60
+    # How often (in seconds) each worker checks whether the pathogen, repository and
+    # location tables changed. Set to 0 to only rely on invalidations.
+    REFERENCE_CACHE_REFRESH_SECONDS: int = 60
+    # How long (in seconds) browsers may reuse locations, lineages, pathogens and
+    # tree options before revalidating them with their ETag.
+    REFERENCE_DATA_MAX_AGE: int = 300
+    # Largest page the paginated sample list will return.
+    SAMPLES_PAGE_SIZE_MAX: int = 1000
+    # Have Postgres render the full sample list's JSON (see utils/sample_json.py)
+    # instead of building it from ORM objects.
+    SAMPLES_LIST_RENDER_IN_DB: bool = True
+    # How many samples the streaming upload endpoint inserts at a time.
+    SAMPLE_UPLOAD_CHUNK_SIZE: int = 500
+    # Processed phylo tree cache. Leave the dir empty to only cache in memory.
+    PHYLO_TREE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    PHYLO_TREE_CACHE_DIR: str = ""
+    PHYLO_TREE_CACHE_MAX_DISK_BYTES: int = 2 * 1024 * 1024 * 1024
+    PHYLO_TREE_ETAG_TTL: int = 300
+    # Per-request SQL profiling (X-Query-Profile header + a log line per request).
+    # A statement fingerprint that runs this many times in one request is flagged
+    # as a likely N+1.
+    QUERY_PROFILE_ENABLED: bool = True
+    QUERY_PROFILE_N_PLUS_ONE_THRESHOLD: int = 10
+    # Server-Timing header with per-phase timings, plus per-route histograms of them
+    # (see /v2/health/phase_timings).
+    SERVER_TIMING_ENABLED: bool = True
+    # Prometheus-style metrics at /v2/health/metrics. Event loop lag is sampled every
+    # METRICS_LAG_INTERVAL seconds, and under gunicorn each worker shares its metrics
+    # through METRICS_DIR (an env var, see aspen.util.metrics) every
+    # METRICS_FLUSH_EVERY samples.
+    METRICS_ENABLED: bool = True
+    METRICS_LAG_INTERVAL: float = 1.0
+    METRICS_FLUSH_EVERY: int = 5
+    # Thread pools for blocking S3/Step Functions/Auth0 calls (see aspen.util.blocking):
+    # threads per service, how many calls may be queued or running before we turn
+    # requests away, and how long (in seconds) a request waits for one call.
+    BLOCKING_IO_MAX_WORKERS: int = 8
+    BLOCKING_IO_MAX_PENDING: int = 64
+    BLOCKING_IO_TIMEOUT: float = 60.0
+    # Post-upload pangolin/lineage QC jobs are queued in the db and launched by a
+    # dispatcher in each worker (see aspen.api.utils.job_queue). Pending jobs for a
+    # pathogen are launched together once the oldest has waited COALESCE_SECONDS;
+    # failed launches are retried after BACKOFF_SECONDS, doubling every attempt.
+    JOB_QUEUE_DISPATCH_ENABLED: bool = True
+    JOB_QUEUE_POLL_SECONDS: float = 10.0
+    JOB_QUEUE_COALESCE_SECONDS: int = 30
+    JOB_QUEUE_MAX_ATTEMPTS: int = 5
+    JOB_QUEUE_BACKOFF_SECONDS: int = 60
 
     # Pydantic automatically tries to load settings with matching names from the environment if available, and then
     # goes down its list of "magic-settings-getters" to find more data to populate this settings object with. For
@@ -0,0 +1,160 @@
+"""Lightweight per-request phase timers.
+
+`ServerTimingMiddleware` starts a `RequestPhases` for every request. Code on the
+request path wraps the interesting parts in `timed_phase("name")`, and the totals
+are reported in a `Server-Timing` header and folded into per-route histograms
+(see `phase_histograms`). Outside of a request `timed_phase` does nothing.
+
+Time spent in the same phase is summed, and phases can nest (the "authz" time
+spent building a query is also part of the handler's "query" phase), so phase
+durations don't have to add up to the total.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Generator, List, Optional, Tuple
+
+from fastapi.responses import ORJSONResponse
+
+# Upper bounds (in ms) of our histogram buckets; anything slower lands in +Inf.
+BUCKETS_MS: Tuple[float, ...] = (
+    1,
+    2,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+)
+
+
+class RequestPhases:
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        # phase name -> seconds, in the order the phases first ran.
+        self.durations: Dict[str, float] = {}
+        self.descriptions: Dict[str, str] = {}
+
+    def add(self, name: str, seconds: float, description: Optional[str] = None):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        if description is not None:
+            self.descriptions[name] = description
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing_header(self) -> str:
+        metrics = []
+        for name, seconds in [*self.durations.items(), ("total", self.elapsed())]:
+            metric = f"{name};dur={seconds * 1000:.1f}"
+            if name in self.descriptions:
+                metric += f';desc="{self.descriptions[name]}"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+
+_current_phases: ContextVar[Optional[RequestPhases]] = ContextVar(
+    "request_phases", default=None
+)
+
+
+@contextmanager
+def track_phases() -> Generator[RequestPhases, None, None]:
+    phases = RequestPhases()
+    token = _current_phases.set(phases)
+    try:
+        yield phases
+    finally:
+        _current_phases.reset(token)
+
+
+@contextmanager
+def timed_phase(name: str) -> Generator[None, None, None]:
+    # The RequestPhases object is shared (not copied) with sync dependencies that
+    # starlette runs in its threadpool, so their phases count too.
+    phases = _current_phases.get()
+    if phases is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases.add(name, time.perf_counter() - start)
+
+
+class TimedORJSONResponse(ORJSONResponse):
+    """Our default response class; times serializing the response body."""
+
+    def render(self, content: Any) -> bytes:
+        with timed_phase("serialize"):
+            return super().render(content)
+
+
+class Histogram:
+    def __init__(self) -> None:
+        # One slot per bucket, plus +Inf.
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        buckets: Dict[str, int] = {}
+        cumulative = 0
+        for bound, count in zip([*BUCKETS_MS, "+Inf"], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum_ms, 3),
+            "buckets": buckets,
+        }
+
+
+class PhaseHistograms:
+    """Per-route, per-phase latency histograms for this worker.
+
+    Buckets are cumulative, like Prometheus' `le` buckets."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, Histogram]] = {}
+
+    def observe(self, route: str, phases: RequestPhases, total: float) -> None:
+        observations: List[Tuple[str, float]] = [
+            *phases.durations.items(),
+            ("total", total),
+        ]
+        with self._lock:
+            histograms = self._routes.setdefault(route, {})
+            for name, seconds in observations:
+                if name not in histograms:
+                    histograms[name] = Histogram()
+                histograms[name].observe(seconds * 1000)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            return {
+                route: {name: hist.snapshot() for name, hist in histograms.items()}
+                for route, histograms in self._routes.items()
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+
+phase_histograms = PhaseHistograms()
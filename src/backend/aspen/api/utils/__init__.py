@@ -1,5 +1,7 @@
 from aspen.api.utils.find_samples_by_id import (  # noqa: F401
     get_missing_and_found_sample_ids,
+    resolve_sample_identifiers,
+    ResolvedIdentifiers,
 )
 from aspen.api.utils.pathogens import (  # noqa: F401
     get_pathogen_repo_config_for_pathogen,
@@ -7,6 +9,7 @@ from aspen.api.utils.pathogens import (  # noqa: F401
 from aspen.api.utils.phylo import (  # noqa: F401
     extract_accessions,
     process_phylo_tree,
+    process_phylo_tree_json,
     verify_and_access_phylo_tree,
 )
 from aspen.api.utils.repo_metadata import (  # noqa: F401
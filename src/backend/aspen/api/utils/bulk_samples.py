@@ -0,0 +1,323 @@
+"""Set-based inserts, updates and deletes for samples.
+
+Adding samples as ORM objects costs a few statements per sample: the sample, the
+genome's entity, pathogen_genomes and uploaded_pathogen_genomes rows, plus a
+`currval` for each generated public identifier. Here each table gets a single
+`INSERT ... SELECT ... FROM unnest(...)` for the whole upload, with every column
+sent as one array. An upload takes the same handful of round trips however many
+samples it has.
+
+Ids for the new samples and genome entities are reserved up front, with a single
+statement drawing one block from each sequence. That means we can generate
+public identifiers (which contain the sample id) before inserting, and link each
+genome to its sample without reading anything back.
+
+Bulk updates and deletes work the same way: one `UPDATE ... FROM unnest(...)` or
+`DELETE ... WHERE id = ANY(...)` per table, however many samples they touch.
+Deletes rely on the foreign keys' `ON DELETE` rules to clean up each sample's
+rows in other tables.
+"""
+import json
+from typing import Any, List, Mapping, NamedTuple, Sequence, Tuple, TYPE_CHECKING
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.type_api import TypeEngine
+
+from aspen.database.models import (
+    AlignedPathogenGenome,
+    Entity,
+    EntityType,
+    Group,
+    Location,
+    PathogenGenome,
+    Sample,
+    UploadedPathogenGenome,
+    User,
+)
+from aspen.util.sequence import encode_sequence, sequence_stats
+
+if TYPE_CHECKING:
+    from aspen.api.schemas.samples import CreateSampleRequest, UpdateSamplesBaseRequest
+
+
+class CreatedSample(NamedTuple):
+    id: int
+    public_identifier: str
+    upload_date: Any
+
+
+async def reserve_ids(
+    db: AsyncSession, tables: Sequence[sa.Table], count: int
+) -> List[Tuple[int, ...]]:
+    """`count` new ids from each table's id sequence, in one round trip."""
+    next_ids = [
+        sa.func.nextval(sa.func.pg_get_serial_sequence(table.fullname, "id"))
+        for table in tables
+    ]
+    result = await db.execute(
+        sa.select(*next_ids).select_from(
+            sa.func.generate_series(1, sa.cast(count, sa.Integer))
+        )
+    )
+    return [tuple(row) for row in result.all()]
+
+
+def _array(type_: TypeEngine, values: List[Any]) -> Any:
+    # asyncpg needs the cast to know what type of array it's sending.
+    return sa.cast(sa.literal(values, ARRAY(type_)), ARRAY(type_))
+
+
+def _unnest(columns: Sequence[Tuple[str, TypeEngine, List[Any]]]) -> Any:
+    """A FROM clause with one row per array element, one column per array."""
+    arrays = [_array(type_, values) for _, type_, values in columns]
+    return (
+        sa.func.unnest(*arrays)
+        .table_valued(*[sa.column(name, type_) for name, type_, _ in columns])
+        .render_derived()
+    )
+
+
+def _insert_from_arrays(
+    table: sa.Table, columns: Sequence[Tuple[str, TypeEngine, List[Any]]], **casts
+):
+    """INSERT INTO `table` with one row per array element. `casts` maps a column
+    name to the type its (text) array values are cast to on the way in.
+
+    Column defaults aren't applied, so pass every column that needs a value."""
+    rows = _unnest(columns)
+    selected = [
+        sa.cast(rows.c[name], casts[name]) if name in casts else rows.c[name]
+        for name, _, _ in columns
+    ]
+    return sa.insert(table).from_select(
+        [name for name, _, _ in columns], sa.select(*selected), include_defaults=False
+    )
+
+
+async def bulk_insert_samples(
+    db: AsyncSession,
+    rows: Sequence["CreateSampleRequest"],
+    group: Group,
+    user: User,
+    pathogen_id: int,
+    public_identifier_prefix: str,
+    locations: Mapping[int, Location],
+) -> List[CreatedSample]:
+    """Inserts a sample and its uploaded genome for each of `rows`, in the order
+    given. Every row's location must be in `locations`."""
+    ids = await reserve_ids(db, [Sample.__table__, Entity.__table__], len(rows))
+    sample_ids = [sample_id for sample_id, _ in ids]
+    entity_ids = [entity_id for _, entity_id in ids]
+
+    public_identifiers = []
+    for sample_id, row in zip(sample_ids, rows):
+        # Same as Sample.generate_public_identifier, minus the currval().
+        if row.sample.public_identifier:
+            public_identifiers.append(row.sample.public_identifier)
+        else:
+            before_id, after_id = Sample.public_identifier_affixes(
+                public_identifier_prefix, locations[row.sample.location_id], group
+            )
+            public_identifiers.append(f"{before_id}{sample_id}{after_id}")
+
+    def constant(value: Any) -> List[Any]:
+        return [value] * len(rows)
+
+    await db.execute(
+        _insert_from_arrays(
+            Sample.__table__,
+            [
+                ("id", sa.Integer, sample_ids),
+                ("submitting_group_id", sa.Integer, constant(group.id)),
+                ("uploaded_by_id", sa.Integer, constant(user.id)),
+                ("pathogen_id", sa.Integer, constant(pathogen_id)),
+                ("sample_collected_by", sa.String, constant(group.name)),
+                (
+                    "sample_collector_contact_address",
+                    sa.String,
+                    constant(group.address),
+                ),
+                ("organism", sa.String, [row.sample.organism for row in rows]),
+                (
+                    "private_identifier",
+                    sa.String,
+                    [row.sample.private_identifier for row in rows],
+                ),
+                (
+                    "collection_date",
+                    sa.Date,
+                    [row.sample.collection_date for row in rows],
+                ),
+                ("private", sa.Boolean, [row.sample.private for row in rows]),
+                ("public_identifier", sa.String, public_identifiers),
+                (
+                    "authors",
+                    sa.Text,
+                    [json.dumps(row.sample.authors or [group.name]) for row in rows],
+                ),
+                ("location_id", sa.Integer, [row.sample.location_id for row in rows]),
+                ("original_submission", sa.Text, constant("{}")),
+                ("host", sa.String, constant("human")),
+            ],
+            authors=Sample.__table__.c.authors.type,
+            original_submission=Sample.__table__.c.original_submission.type,
+        )
+    )
+
+    await db.execute(
+        _insert_from_arrays(
+            Entity.__table__,
+            [
+                ("id", sa.Integer, entity_ids),
+                (
+                    "entity_type",
+                    sa.String,
+                    constant(EntityType.UPLOADED_PATHOGEN_GENOME.value),
+                ),
+            ],
+        )
+    )
+
+    stats = [sequence_stats(row.pathogen_genome.sequence) for row in rows]
+    await db.execute(
+        _insert_from_arrays(
+            PathogenGenome.__table__,
+            [
+                ("entity_id", sa.Integer, entity_ids),
+                (
+                    "sequence",
+                    sa.Text,
+                    [encode_sequence(row.pathogen_genome.sequence) for row in rows],
+                ),
+                (
+                    "num_unambiguous_sites",
+                    sa.Integer,
+                    [stat.num_unambiguous_sites for stat in stats],
+                ),
+                (
+                    "num_missing_alleles",
+                    sa.Integer,
+                    [stat.num_missing_alleles for stat in stats],
+                ),
+                ("num_mixed", sa.Integer, [stat.num_mixed for stat in stats]),
+                (
+                    "sequencing_date",
+                    sa.Date,
+                    [row.pathogen_genome.sequencing_date for row in rows],
+                ),
+            ],
+        )
+    )
+
+    uploaded_pathogen_genomes = UploadedPathogenGenome.__table__
+    result = await db.execute(
+        _insert_from_arrays(
+            uploaded_pathogen_genomes,
+            [
+                ("pathogen_genome_id", sa.Integer, entity_ids),
+                ("sample_id", sa.Integer, sample_ids),
+            ],
+        ).returning(
+            uploaded_pathogen_genomes.c.sample_id,
+            uploaded_pathogen_genomes.c.upload_date,
+        )
+    )
+    upload_dates = dict(result.all())
+
+    return [
+        CreatedSample(sample_id, public_identifier, upload_dates[sample_id])
+        for sample_id, public_identifier in zip(sample_ids, public_identifiers)
+    ]
+
+
+async def bulk_update_samples(
+    db: AsyncSession,
+    rows: Sequence["UpdateSamplesBaseRequest"],
+    submitting_groups: Mapping[int, Group],
+    public_identifier_prefix: str,
+    locations: Mapping[int, Location],
+) -> None:
+    """Applies each of `rows` to the sample with its id. `submitting_groups` maps
+    each sample id to its group, and every row's location must be in `locations`.
+
+    Rows without a public identifier get a generated one, like
+    `Sample.generate_public_identifier`."""
+    public_identifiers = []
+    for row in rows:
+        if row.public_identifier:
+            public_identifiers.append(row.public_identifier)
+        else:
+            before_id, after_id = Sample.public_identifier_affixes(
+                public_identifier_prefix,
+                locations[row.collection_location],
+                submitting_groups[row.id],
+            )
+            public_identifiers.append(f"{before_id}{row.id}{after_id}")
+
+    updates = _unnest(
+        [
+            ("id", sa.Integer, [row.id for row in rows]),
+            ("collection_date", sa.Date, [row.collection_date for row in rows]),
+            ("location_id", sa.Integer, [row.collection_location for row in rows]),
+            ("private", sa.Boolean, [row.private for row in rows]),
+            (
+                "private_identifier",
+                sa.String,
+                [row.private_identifier for row in rows],
+            ),
+            ("public_identifier", sa.String, public_identifiers),
+            ("sequencing_date", sa.Date, [row.sequencing_date for row in rows]),
+        ]
+    )
+    samples = Sample.__table__
+    await db.execute(
+        sa.update(samples)
+        .values(
+            collection_date=updates.c.collection_date,
+            location_id=updates.c.location_id,
+            private=updates.c.private,
+            private_identifier=updates.c.private_identifier,
+            public_identifier=updates.c.public_identifier,
+        )
+        .where(samples.c.id == updates.c.id)
+    )
+    # sequencing_date lives on pathogen_genomes, a step removed from the sample.
+    pathogen_genomes = PathogenGenome.__table__
+    uploaded_pathogen_genomes = UploadedPathogenGenome.__table__
+    await db.execute(
+        sa.update(pathogen_genomes)
+        .values(sequencing_date=updates.c.sequencing_date)
+        .where(
+            pathogen_genomes.c.entity_id
+            == uploaded_pathogen_genomes.c.pathogen_genome_id,
+            uploaded_pathogen_genomes.c.sample_id == updates.c.id,
+        )
+    )
+
+
+async def bulk_delete_samples(db: AsyncSession, sample_ids: Sequence[int]) -> List[int]:
+    """Deletes samples along with their genomes, accessions, QC metrics and so on,
+    and returns the ids that were deleted."""
+    ids = _array(sa.Integer, list(sample_ids))
+    # Deleting a sample cascades to its genomes, but not up to the entities they
+    # extend, so those go first (and cascade down through the genome tables).
+    uploaded = UploadedPathogenGenome.__table__
+    aligned = AlignedPathogenGenome.__table__
+    genome_entity_ids = sa.union_all(
+        sa.select(uploaded.c.pathogen_genome_id).where(
+            uploaded.c.sample_id == sa.any_(ids)
+        ),
+        sa.select(aligned.c.pathogen_genome_id).where(
+            aligned.c.sample_id == sa.any_(ids)
+        ),
+    )
+    entities = Entity.__table__
+    await db.execute(sa.delete(entities).where(entities.c.id.in_(genome_entity_ids)))
+
+    samples = Sample.__table__
+    result = await db.execute(
+        sa.delete(samples).where(samples.c.id == sa.any_(ids)).returning(samples.c.id)
+    )
+    return list(result.scalars())
@@ -1,7 +1,19 @@
-from typing import Any, Iterable, Set, Tuple
+from typing import Any, Iterable, NamedTuple, Set, Tuple
 
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.query import Query
 
+from aspen.api.authz import AuthZSession
+from aspen.api.utils.sample import identifier_array, samples_by_identifiers
+from aspen.database.models import (
+    Pathogen,
+    PathogenRepoConfig,
+    PublicRepository,
+    PublicRepositoryMetadata,
+    Sample,
+)
+
 
 def get_missing_and_found_sample_ids(
     sample_ids: Iterable[str], all_samples: Query
@@ -28,3 +40,96 @@ def get_missing_and_found_sample_ids(
     # These are the sample ID's that don't match the TheiaGenEpi db
     missing_sample_ids = set(sample_ids) - found_sample_ids
     return missing_sample_ids, found_sample_ids
+
+
+class ResolvedIdentifiers(NamedTuple):
+    # Matched nothing at all.
+    missing: Set[str]
+    # Matched a public repository strain name (as submitted, prefix and all).
+    repo_ids: Set[str]
+    # Matched a public repository EPI ISL, and the strain names they belong to.
+    epi_isls: Set[str]
+    repo_ids_from_isls: Set[str]
+
+
+async def resolve_sample_identifiers(
+    db: AsyncSession,
+    az: AuthZSession,
+    pathogen: Pathogen,
+    repository: PublicRepository,
+    repo_config: PathogenRepoConfig,
+    sample_ids: Iterable[str],
+) -> ResolvedIdentifiers:
+    """
+    Works out what each of a user's identifiers refers to, in one statement.
+
+    Same answers as running `samples_by_identifiers` +
+    `get_missing_and_found_sample_ids`, then `get_matching_repo_ids` and then
+    `get_matching_repo_ids_by_epi_isl` on whatever is still missing: an identifier
+    counts as the first of these it matches.
+    """
+    identifiers = list(set(sample_ids))
+    # Repository strain names don't have our prefix (see get_matching_repo_ids).
+    strip = f"{repo_config.prefix}/"
+    strains = [
+        identifier.replace(strip, "") if identifier.startswith(strip) else identifier
+        for identifier in identifiers
+    ]
+    requested = (
+        sa.func.unnest(identifier_array(identifiers), identifier_array(strains))
+        .table_valued(sa.column("identifier", sa.Text), sa.column("strain", sa.Text))
+        .render_derived()
+    )
+
+    found_samples = (
+        (await samples_by_identifiers(az, pathogen, set(identifiers)))
+        .with_only_columns(  # type: ignore
+            Sample.public_identifier, Sample.private_identifier
+        )
+        .cte("found_samples")
+    )
+    found_identifiers = sa.union(
+        sa.select(found_samples.c.public_identifier),
+        sa.select(found_samples.c.private_identifier),
+    )
+    repo_metadata_filter = sa.and_(
+        PublicRepositoryMetadata.public_repository_id == repository.id,
+        PublicRepositoryMetadata.pathogen_id == pathogen.id,
+    )
+    strain_match = (
+        sa.select(PublicRepositoryMetadata.strain)
+        .where(
+            repo_metadata_filter,
+            PublicRepositoryMetadata.strain == requested.c.strain,
+        )
+        .exists()
+    )
+    isl_strains = (
+        sa.select(sa.func.array_agg(PublicRepositoryMetadata.strain))
+        .where(
+            repo_metadata_filter,
+            PublicRepositoryMetadata.isl == requested.c.identifier,
+        )
+        .scalar_subquery()
+    )
+    rows = await db.execute(
+        sa.select(
+            requested.c.identifier,
+            requested.c.identifier.in_(found_identifiers),
+            strain_match,
+            isl_strains,
+        )
+    )
+
+    resolved = ResolvedIdentifiers(set(), set(), set(), set())
+    for identifier, is_sample, is_strain, strains_for_isl in rows:
+        if is_sample:
+            continue
+        if is_strain:
+            resolved.repo_ids.add(identifier)
+        elif strains_for_isl:
+            resolved.epi_isls.add(identifier)
+            resolved.repo_ids_from_isls.update(strains_for_isl)
+        else:
+            resolved.missing.add(identifier)
+    return resolved
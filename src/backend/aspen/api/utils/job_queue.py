@@ -0,0 +1,258 @@
+"""Durable, coalesced launching of the on-demand jobs that follow a sample upload.
+
+Uploads don't start Step Functions executions themselves. `enqueue_job` adds a
+QueuedJob row in the same transaction as the new samples, so the request to run
+the job is committed (or rolled back) along with them. Every API worker runs a
+`JobDispatcher`, and on each tick one of them (guarded by an advisory lock) looks
+at the pending rows:
+
+- rows are grouped by job type + pathogen, and a group is launched once its oldest
+  row has waited JOB_QUEUE_COALESCE_SECONDS, so a burst of uploads turns into one
+  execution instead of one per upload;
+- a failed launch is retried with exponential backoff, and the rows are marked
+  FAILED after JOB_QUEUE_MAX_ATTEMPTS;
+- launched rows are marked DISPATCHED with the execution arn.
+
+The rows are only updated after the launch, so a worker dying in between means
+that batch is launched again: jobs run at least once, never zero times.
+"""
+import asyncio
+import datetime
+import logging
+from collections import defaultdict
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from aspen.api.settings import APISettings
+from aspen.database.connection import SqlAlchemyInterface
+from aspen.database.models import (
+    Group,
+    Pathogen,
+    QueuedJob,
+    QueuedJobStatus,
+    QueuedJobType,
+)
+from aspen.util.blocking import run_blocking
+from aspen.util.metrics import REGISTRY
+from aspen.util.swipe import LineageQcJob, PangolinJob
+
+logger = logging.getLogger(__name__)
+
+# Key for pg_try_advisory_xact_lock, so only one worker dispatches at a time.
+DISPATCH_LOCK_KEY = 4_106_016
+# Step Functions inputs are limited to 256KB, so very large batches are split up.
+MAX_SAMPLES_PER_EXECUTION = 2000
+# The most pending rows we look at per tick; the rest wait for the next one.
+MAX_JOBS_PER_DISPATCH = 10000
+MAX_BACKOFF_SECONDS = 3600
+
+ENQUEUED = REGISTRY.counter(
+    "aspen_job_queue_enqueued_total",
+    "Jobs added to the queue",
+    ["job_type"],
+)
+EXECUTIONS = REGISTRY.counter(
+    "aspen_job_queue_executions_total",
+    "Step Functions executions started (or attempted) by the job dispatcher",
+    ["job_type", "outcome"],
+)
+COALESCED = REGISTRY.histogram(
+    "aspen_job_queue_coalesced_jobs",
+    "How many queued jobs were launched as one execution",
+    ["job_type"],
+    buckets=(1, 2, 5, 10, 25, 50, 100),
+)
+
+# (job type, group, pathogen slug, sample ids) -> execution arn
+Launcher = Callable[[QueuedJobType, Optional[Group], str, List[Any]], Awaitable[str]]
+
+
+def enqueue_job(
+    db: AsyncSession,
+    job_type: QueuedJobType,
+    pathogen: Pathogen,
+    group: Optional[Group],
+    sample_ids: Iterable[Any],
+) -> QueuedJob:
+    """Queues a job; it's only visible to the dispatcher once the caller commits."""
+    job = QueuedJob(
+        job_type=job_type,
+        status=QueuedJobStatus.PENDING,
+        pathogen=pathogen,
+        group=group,
+        sample_ids=list(sample_ids),
+        attempts=0,
+    )
+    db.add(job)
+    ENQUEUED.inc(job_type=job_type.value)
+    return job
+
+
+async def start_execution(
+    settings: APISettings,
+    job_type: QueuedJobType,
+    group: Optional[Group],
+    pathogen_slug: str,
+    sample_ids: List[Any],
+) -> str:
+    if job_type == QueuedJobType.PANGOLIN:
+        response = await run_blocking(
+            "sfn", PangolinJob(settings).run, group, sample_ids
+        )
+    else:
+        response = await run_blocking(
+            "sfn", LineageQcJob(settings).run, group, pathogen_slug, sample_ids
+        )
+    return response["executionArn"]
+
+
+def _chunks(jobs: List[QueuedJob]) -> Iterable[List[QueuedJob]]:
+    chunk: List[QueuedJob] = []
+    num_samples = 0
+    for job in jobs:
+        if chunk and num_samples + len(job.sample_ids) > MAX_SAMPLES_PER_EXECUTION:
+            yield chunk
+            chunk, num_samples = [], 0
+        chunk.append(job)
+        num_samples += len(job.sample_ids)
+    if chunk:
+        yield chunk
+
+
+class JobDispatcher:
+    def __init__(
+        self,
+        sql_interface: SqlAlchemyInterface,
+        settings: APISettings,
+        launch: Optional[Launcher] = None,
+    ):
+        self.sql_interface = sql_interface
+        self.settings = settings
+        self.launch: Launcher = launch or partial(start_execution, settings)
+
+    def backoff(self, attempts: int) -> datetime.timedelta:
+        seconds = self.settings.JOB_QUEUE_BACKOFF_SECONDS * 2 ** (attempts - 1)
+        return datetime.timedelta(seconds=min(seconds, MAX_BACKOFF_SECONDS))
+
+    async def run(self, interval: float) -> None:
+        """Dispatches every `interval` seconds until cancelled."""
+        while True:
+            try:
+                await self.dispatch_once()
+            except Exception:
+                logger.exception("Could not dispatch queued jobs")
+            await asyncio.sleep(interval)
+
+    async def dispatch_once(self) -> int:
+        """Launches every batch that's ready. Returns the number of executions."""
+        db = self.sql_interface.make_session()
+        try:
+            return await self._dispatch(db)
+        finally:
+            await db.close()  # type: ignore
+
+    async def _dispatch(self, db: AsyncSession) -> int:
+        locked = (
+            await db.execute(
+                sa.select(sa.func.pg_try_advisory_xact_lock(DISPATCH_LOCK_KEY))
+            )
+        ).scalar()
+        if not locked:
+            # Another worker is dispatching right now.
+            return 0
+
+        window = datetime.timedelta(seconds=self.settings.JOB_QUEUE_COALESCE_SECONDS)
+        # Retries don't wait for the window again, their backoff already did.
+        due = sa.or_(
+            QueuedJob.created_at <= sa.func.now() - window, QueuedJob.attempts > 0
+        )
+        rows = (
+            await db.execute(
+                sa.select(QueuedJob, due.label("due"))  # type: ignore
+                .options(joinedload(QueuedJob.pathogen), joinedload(QueuedJob.group))
+                .where(
+                    QueuedJob.status == QueuedJobStatus.PENDING,
+                    QueuedJob.next_attempt_at <= sa.func.now(),
+                )
+                .order_by(QueuedJob.id)
+                .limit(MAX_JOBS_PER_DISPATCH)
+            )
+        ).all()
+
+        batches: Dict[Tuple[QueuedJobType, int], List[QueuedJob]] = defaultdict(list)
+        ready = set()
+        for job, is_due in rows:
+            key = (job.job_type, job.pathogen_id)
+            batches[key].append(job)
+            if is_due:
+                ready.add(key)
+
+        launched = 0
+        for key, jobs in batches.items():
+            if key not in ready:
+                continue
+            for chunk in _chunks(jobs):
+                launched += await self._launch(chunk)
+        await db.commit()
+        return launched
+
+    async def _launch(self, jobs: List[QueuedJob]) -> int:
+        job_type = jobs[0].job_type
+        # Executions are named after the group when there's just one.
+        group = jobs[0].group if len({job.group_id for job in jobs}) == 1 else None
+        sample_ids = sorted({sample_id for job in jobs for sample_id in job.sample_ids})
+        try:
+            execution_arn = await self.launch(
+                job_type, group, jobs[0].pathogen.slug, sample_ids
+            )
+        except Exception as err:
+            logger.exception("Could not start %s execution", job_type.value)
+            EXECUTIONS.inc(job_type=job_type.value, outcome="error")
+            for job in jobs:
+                job.attempts += 1
+                job.last_error = str(err)[:1000]
+                if job.attempts >= self.settings.JOB_QUEUE_MAX_ATTEMPTS:
+                    job.status = QueuedJobStatus.FAILED
+                else:
+                    job.next_attempt_at = sa.func.now() + self.backoff(job.attempts)
+            return 0
+
+        EXECUTIONS.inc(job_type=job_type.value, outcome="ok")
+        COALESCED.observe(len(jobs), job_type=job_type.value)
+        for job in jobs:
+            job.attempts += 1
+            job.status = QueuedJobStatus.DISPATCHED
+            job.dispatched_at = sa.func.now()
+            job.execution_arn = execution_arn
+            job.last_error = None
+        return 1
+
+
+async def job_queue_status(db: AsyncSession) -> Dict[str, Any]:
+    counts: Dict[str, Dict[str, int]] = defaultdict(dict)
+    rows = await db.execute(
+        sa.select(QueuedJob.job_type, QueuedJob.status, sa.func.count()).group_by(  # type: ignore
+            QueuedJob.job_type, QueuedJob.status
+        )
+    )
+    for job_type, status, count in rows:
+        counts[job_type.value][status.value] = count
+    oldest_pending = (
+        await db.execute(
+            sa.select(  # type: ignore
+                sa.func.extract(
+                    "epoch", sa.func.now() - sa.func.min(QueuedJob.created_at)
+                )
+            ).where(QueuedJob.status == QueuedJobStatus.PENDING)
+        )
+    ).scalar()
+    return {
+        "jobs": counts,
+        "oldest_pending_seconds": None
+        if oldest_pending is None
+        else float(oldest_pending),
+    }
@@ -0,0 +1,119 @@
+"""A streaming reader for multipart/form-data request bodies.
+
+Starlette's `request.form()` needs python-multipart and spools every part before
+the handler sees any of it. This reads the parts in order straight off
+`request.stream()`, so a handler can process a large upload as it arrives and
+only ever hold about one network chunk (plus the line it's working on).
+"""
+import re
+from typing import AsyncGenerator, AsyncIterator, Dict, Optional
+
+# Headers for a single part are tiny; anything bigger is garbage or abuse.
+MAX_PART_HEADER_BYTES = 16 * 1024
+
+
+class MultipartError(Exception):
+    pass
+
+
+def get_boundary(content_type: str) -> bytes:
+    media_type, _, params = content_type.partition(";")
+    if media_type.strip().lower() != "multipart/form-data":
+        raise MultipartError("Expected a multipart/form-data request")
+    match = re.search(r'boundary=(?:"([^"]+)"|([^\s;]+))', params)
+    if not match:
+        raise MultipartError("The multipart request has no boundary")
+    return (match.group(1) or match.group(2)).encode("latin-1")
+
+
+class Part:
+    def __init__(self, headers: Dict[str, str], body: AsyncGenerator[bytes, None]):
+        self.headers = headers
+        self._body = body
+        disposition = headers.get("content-disposition", "")
+        name = re.search(r'\bname="([^"]*)"', disposition)
+        filename = re.search(r'\bfilename="([^"]*)"', disposition)
+        self.name: Optional[str] = name.group(1) if name else None
+        self.filename: Optional[str] = filename.group(1) if filename else None
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self._body
+
+    async def drain(self) -> None:
+        async for _ in self._body:
+            pass
+
+
+class MultipartReader:
+    """Yields a request body's parts in order. Each part's body has to be read (or
+    is skipped) before the next part is yielded."""
+
+    def __init__(self, content_type: str, chunks: AsyncIterator[bytes]):
+        # Every delimiter but the first is preceded by a CRLF. Starting the buffer
+        # with one lets us look for the same bytes every time.
+        self._delimiter = b"\r\n--" + get_boundary(content_type)
+        self._chunks = chunks.__aiter__()
+        self._buffer = b"\r\n"
+
+    async def _fill(self) -> None:
+        try:
+            self._buffer += await self._chunks.__anext__()
+        except StopAsyncIteration:
+            raise MultipartError("The multipart request ended early")
+
+    async def _read_until(self, separator: bytes, limit: int) -> bytes:
+        while (index := self._buffer.find(separator)) < 0:
+            if len(self._buffer) > limit:
+                raise MultipartError("Multipart part headers are too large")
+            await self._fill()
+        found, self._buffer = (
+            self._buffer[:index],
+            self._buffer[index + len(separator) :],
+        )
+        return found
+
+    async def _body(self) -> AsyncGenerator[bytes, None]:
+        # Hold back anything that could be the start of the next delimiter.
+        keep = len(self._delimiter) - 1
+        while (index := self._buffer.find(self._delimiter)) < 0:
+            if len(self._buffer) > keep:
+                yield self._buffer[:-keep]
+                self._buffer = self._buffer[-keep:]
+            await self._fill()
+        if index:
+            yield self._buffer[:index]
+        self._buffer = self._buffer[index + len(self._delimiter) :]
+
+    async def parts(self) -> AsyncGenerator[Part, None]:
+        # Anything before the first delimiter is a preamble we can ignore.
+        async for _ in self._body():
+            pass
+        while True:
+            while len(self._buffer) < 2:
+                await self._fill()
+            if self._buffer.startswith(b"--"):
+                return
+            if not self._buffer.startswith(b"\r\n"):
+                raise MultipartError("Malformed multipart delimiter")
+            self._buffer = self._buffer[2:]
+            raw_headers = await self._read_until(b"\r\n\r\n", MAX_PART_HEADER_BYTES)
+            headers = {}
+            for line in raw_headers.decode("latin-1").split("\r\n"):
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            part = Part(headers, self._body())
+            yield part
+            await part.drain()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncGenerator[str, None]:
+    """The UTF-8 lines in a stream of bytes, without their line endings."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip(b"\r").decode("utf-8")
+    if pending:
+        yield pending.rstrip(b"\r").decode("utf-8")
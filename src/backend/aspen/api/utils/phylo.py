@@ -7,14 +7,18 @@ from typing import Dict, Mapping, Optional, Set, Tuple
 import boto3
 import sqlalchemy as sa
 from sqlalchemy import asc
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased, joinedload, selectinload
 from sqlalchemy.sql.expression import and_, or_
 
 from aspen.api.authz import AuthZSession
 from aspen.api.error import http_exceptions as ex
+from aspen.api.timing import timed_phase
+from aspen.api.utils.phylo_cache import phylo_tree_cache
 from aspen.database.models import Group, Location, Pathogen, PhyloRun, PhyloTree, Sample
 from aspen.database.models.pathogens import PathogenRepoConfig
+from aspen.util.blocking import BOTO_TIMEOUTS, run_blocking
 
 # 16 colors
 NEXTSTRAIN_COLOR_SCALE = [
@@ -269,14 +273,70 @@ async def _set_colors(db: AsyncSession, tree_json: dict, phylo_run: PhyloRun) ->
     return tree_json
 
 
-async def process_phylo_tree(
+async def _identifier_map_version(db: AsyncSession, az: AuthZSession) -> str:
+    """Fingerprint of every public:private identifier pair the requester can see.
+
+    Changes whenever a sample they can see is added, removed or renamed, or when
+    their access changes, so it's safe to key cached (renamed) trees on it.
+    """
+    visible = (await az.authorized_query("read_private", Sample)).subquery()  # type: ignore
+    pairs = sa.func.concat_ws("\t", visible.c.public_identifier, visible.c.private_identifier)  # type: ignore
+    row = (
+        await db.execute(
+            sa.select(  # type: ignore
+                sa.func.count(),
+                sa.func.md5(
+                    sa.func.string_agg(pairs, aggregate_order_by("\n", visible.c.id))
+                ),
+            )
+        )
+    ).one()
+    return f"{row[0]}:{row[1]}"
+
+
+def _s3_resource():
+    return boto3.resource(
+        "s3",
+        endpoint_url=os.getenv("BOTO_ENDPOINT_URL") or None,
+        config=boto3.session.Config(signature_version="s3v4", **BOTO_TIMEOUTS),
+    )
+
+
+def _read_s3_etag(bucket: str, key: str) -> str:
+    return _s3_resource().Object(bucket, key).e_tag
+
+
+def _read_s3_object(bucket: str, key: str) -> bytes:
+    return _s3_resource().Bucket(bucket).Object(key).get()["Body"].read()
+
+
+async def _s3_etag(phylo_tree: PhyloTree) -> str:
+    etag = phylo_tree_cache.get_etag(phylo_tree.s3_bucket, phylo_tree.s3_key)
+    if etag is None:
+        etag = await run_blocking(
+            "s3", _read_s3_etag, phylo_tree.s3_bucket, phylo_tree.s3_key
+        )
+        phylo_tree_cache.put_etag(phylo_tree.s3_bucket, phylo_tree.s3_key, etag)
+    return etag
+
+
+def _serialize_tree(tree_json: dict) -> bytes:
+    # Same encoding as fastapi's JSONResponse, so cached bytes can be sent as-is.
+    return json.dumps(
+        tree_json, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+async def process_phylo_tree_json(
     db: AsyncSession,
     az: AuthZSession,
     phylo_tree_id: int,
     pathogen: Pathogen,
     pathogen_repo_config: PathogenRepoConfig,
     id_style: Optional[str] = None,
-) -> dict:
+) -> bytes:
+    """Like `process_phylo_tree`, but returns serialized JSON, straight from the
+    processed tree cache when possible."""
     (
         authorized,
         phylo_tree_result,
@@ -293,49 +353,77 @@ async def process_phylo_tree(
     phylo_tree: PhyloTree = phylo_tree_result
     phylo_run: PhyloRun = phylo_run_result
 
-    s3 = boto3.resource(
-        "s3",
-        endpoint_url=os.getenv("BOTO_ENDPOINT_URL") or None,
-        config=boto3.session.Config(signature_version="s3v4"),
+    is_public = id_style == "public"
+    tree_location = phylo_run.group.default_tree_location
+    cache_key = phylo_tree_cache.make_key(
+        phylo_tree.entity_id,
+        await _s3_etag(phylo_tree),
+        "public" if is_public else "private",
+        "" if is_public else await _identifier_map_version(db, az),
+        (tree_location.country, tree_location.division, tree_location.location),
+        pathogen_repo_config.prefix,
+        pathogen_repo_config.public_repository.name,
     )
+    cached = phylo_tree_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
-    data = (
-        s3.Bucket(phylo_tree.s3_bucket).Object(phylo_tree.s3_key).get()["Body"].read()
-    )
-    json_data = json.loads(data)
-    name = pathogen_repo_config.public_repository.name
-    save_key = "{}_ID".format(name.upper())
-    if id_style == "public":
-        json_data = await _set_colors(db, json_data, phylo_run)
-        json_data["tree"] = _rename_nodes_on_tree(
-            pathogen_repo_config.prefix, json_data["tree"], {}, save_key
+    with timed_phase("s3"):
+        data = await run_blocking(
+            "s3", _read_s3_object, phylo_tree.s3_bucket, phylo_tree.s3_key
         )
-        return json_data
-
-    # Load all the public:private sample mappings this user/group has access to.
-    # TODO we should limit the query scope here to just the samples on the tree.
-    identifier_map: Dict[str, str] = {}
-    translatable_samples: list[Sample] = (
-        (
-            await db.execute(
-                await az.authorized_query("read_private", Sample)  # type: ignore
+    with timed_phase("tree"):
+        json_data = json.loads(data)
+        name = pathogen_repo_config.public_repository.name
+        save_key = "{}_ID".format(name.upper())
+        if is_public:
+            json_data = await _set_colors(db, json_data, phylo_run)
+            json_data["tree"] = _rename_nodes_on_tree(
+                pathogen_repo_config.prefix, json_data["tree"], {}, save_key
             )
+        else:
+            # Load all the public:private sample mappings this user/group has access to.
+            # TODO we should limit the query scope here to just the samples on the tree.
+            identifier_map: Dict[str, str] = {}
+            translatable_samples: list[Sample] = (
+                (
+                    await db.execute(
+                        await az.authorized_query("read_private", Sample)  # type: ignore
+                    )
+                )
+                .scalars()
+                .all()
+            )
+            for sample in translatable_samples:
+                public_id = sample.public_identifier.replace(
+                    f"{pathogen_repo_config.prefix}/", ""
+                )
+                identifier_map[public_id] = sample.private_identifier
+            # we pass in the root node of the tree to the recursive naming function.
+            json_data["tree"] = _rename_nodes_on_tree(
+                pathogen_repo_config.prefix, json_data["tree"], identifier_map, save_key
+            )
+            # set country labeling/colors
+            json_data = await _set_colors(db, json_data, phylo_run)
+
+        serialized = _serialize_tree(json_data)
+    phylo_tree_cache.put(cache_key, serialized)
+    return serialized
+
+
+async def process_phylo_tree(
+    db: AsyncSession,
+    az: AuthZSession,
+    phylo_tree_id: int,
+    pathogen: Pathogen,
+    pathogen_repo_config: PathogenRepoConfig,
+    id_style: Optional[str] = None,
+) -> dict:
+    return json.loads(
+        await process_phylo_tree_json(
+            db, az, phylo_tree_id, pathogen, pathogen_repo_config, id_style
         )
-        .scalars()
-        .all()
-    )
-    for sample in translatable_samples:
-        public_id = sample.public_identifier.replace(
-            f"{pathogen_repo_config.prefix}/", ""
-        )
-        identifier_map[public_id] = sample.private_identifier
-    # we pass in the root node of the tree to the recursive naming function.
-    json_data["tree"] = _rename_nodes_on_tree(
-        pathogen_repo_config.prefix, json_data["tree"], identifier_map, save_key
     )
-    # set country labeling/colors
-    json_data = await _set_colors(db, json_data, phylo_run)
-    return json_data
 
 
 def extract_accessions(accessions_list: list, node: dict):
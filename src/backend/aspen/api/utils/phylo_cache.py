@@ -0,0 +1,162 @@
+"""Cache of processed (renamed + colored) phylo tree JSON.
+
+Processing a tree means downloading it from S3, walking it a couple of times and
+running a few location queries, and the result only depends on:
+  - the tree file itself (tree id + S3 ETag),
+  - the identifier style that was requested,
+  - the set of samples whose private identifiers the requester can see,
+  - the tree's default location (for colors).
+So we key on all of those and keep the serialized output in a per-worker LRU,
+backed by an optional local-disk tier that every worker on the host shares.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class ProcessedTreeCache:
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        max_disk_bytes: int = 2 * 1024 * 1024 * 1024,
+        etag_ttl: float = 300,
+    ):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        # (bucket, key) -> (expiry, etag). Tree files are written once, so we only
+        # need to re-check them occasionally.
+        self._etags: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self.configure(max_bytes, disk_dir, max_disk_bytes, etag_ttl)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def configure(
+        self,
+        max_bytes: int,
+        disk_dir: Optional[str],
+        max_disk_bytes: int,
+        etag_ttl: float,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self.max_disk_bytes = max_disk_bytes
+        self.etag_ttl = etag_ttl
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    def get_etag(self, bucket: str, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._etags.get((bucket, key))
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+        return None
+
+    def put_etag(self, bucket: str, key: str, etag: str) -> None:
+        with self._lock:
+            self._etags[(bucket, key)] = (time.monotonic() + self.etag_ttl, etag)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")  # type: ignore
+
+    def _remember(self, key: str, value: bytes) -> None:
+        # Caller holds the lock.
+        if len(value) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._size -= len(self._entries.pop(key))
+        self._entries[key] = value
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return value
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "rb") as fh:
+                    value = fh.read()
+            except OSError:
+                value = None
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, value)
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._remember(key, value)
+        if self.disk_dir:
+            try:
+                self._write_to_disk(key, value)
+            except OSError:
+                # The disk tier is best-effort.
+                pass
+
+    def _write_to_disk(self, key: str, value: bytes) -> None:
+        # Write + rename so other workers never read a partial file.
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(value)
+        os.replace(tmp_path, self._disk_path(key))
+        self._trim_disk()
+
+    def _trim_disk(self) -> None:
+        files = []
+        total = 0
+        with os.scandir(self.disk_dir) as entries:  # type: ignore
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        # Drop the oldest files until we're back under the limit.
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._etags.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0,
+            "entries": len(self._entries),
+            "bytes": self._size,
+        }
+
+
+# Shared by every request this worker handles; configured from settings at startup.
+phylo_tree_cache = ProcessedTreeCache()
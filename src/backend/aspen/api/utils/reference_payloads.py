@@ -0,0 +1,98 @@
+"""Pre-serialized responses for the reference data endpoints.
+
+Locations, lineages, pathogens and UShER tree options only change when an import
+workflow runs, but clients fetch them on almost every page load. So we build each
+response once per data version (see `ReferenceDataCache.version`), keep it as JSON
+bytes plus a gzipped copy, and serve it with a strong ETag. Clients that send the
+ETag back in `If-None-Match` get an empty 304 instead of the whole payload again.
+
+The ETag is a hash of the body, so every worker hands out the same one for the same
+data, whichever of them built it.
+"""
+import gzip
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+from starlette.responses import Response
+
+from aspen.database.reference_cache import reference_cache_for
+
+GZIP_LEVEL = 6
+# Compressing tiny payloads isn't worth the bytes the header costs.
+MIN_GZIP_BYTES = 1024
+
+
+@dataclass(frozen=True)
+class Payload:
+    body: bytes
+    gzipped: Optional[bytes]
+    etag: str
+
+    @property
+    def gzip_etag(self) -> str:
+        # A different representation needs its own strong ETag.
+        return self.etag[:-1] + '-gzip"'
+
+    @classmethod
+    def from_content(cls, content: Any) -> "Payload":
+        body = orjson.dumps(jsonable_encoder(content))
+        gzipped = None
+        if len(body) >= MIN_GZIP_BYTES:
+            # mtime=0 keeps the compressed bytes the same on every worker.
+            gzipped = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        return cls(body, gzipped, etag)
+
+
+async def reference_payload(
+    db: AsyncSession, key: Any, build: Callable[[], Awaitable[Any]]
+) -> Payload:
+    """The memoized payload for `key`, calling `build` to make it if the reference
+    data changed (or we haven't built it yet)."""
+    cache = reference_cache_for(db)
+    await cache.ensure_loaded(db.bind)
+    payload = cache.get_payload(key)
+    if payload is None:
+        version = cache.version
+        payload = Payload.from_content(await build())
+        cache.put_payload(key, version, payload)
+    return payload
+
+
+def _accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00")
+    return False
+
+
+def _etag_matches(if_none_match: str, etags: Any) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so ignore any W/ prefix.
+    candidates = {tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")}
+    return any(etag in candidates for etag in etags)
+
+
+def payload_response(request: Request, payload: Payload, max_age: int) -> Response:
+    use_gzip = payload.gzipped is not None and _accepts_gzip(request)
+    headers = {
+        "ETag": payload.gzip_etag if use_gzip else payload.etag,
+        "Cache-Control": f"private, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(
+        if_none_match, (payload.etag, payload.gzip_etag)
+    ):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(payload.gzipped, media_type="application/json", headers=headers)
+    return Response(payload.body, media_type="application/json", headers=headers)
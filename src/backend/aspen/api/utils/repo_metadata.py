@@ -3,6 +3,7 @@ from typing import Iterable, Mapping, Set, Tuple
 import sqlalchemy as sa
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from aspen.api.utils.sample import identifier_array
 from aspen.database.models import (
     Pathogen,
     PathogenRepoConfig,
@@ -50,7 +51,7 @@ async def get_matching_repo_ids(
     repo_matches_query = sa.select(PublicRepositoryMetadata).filter(  # type: ignore
         PublicRepositoryMetadata.public_repository == repository,
         PublicRepositoryMetadata.pathogen == pathogen,
-        PublicRepositoryMetadata.strain.in_(stripped_mapping.keys()),
+        PublicRepositoryMetadata.strain == sa.any_(identifier_array(stripped_mapping)),
     )
     repo_matches: Iterable[PublicRepositoryMetadata] = (
         await session.execute(repo_matches_query)
@@ -83,7 +84,7 @@ async def get_matching_repo_ids_by_epi_isl(
     isl_matches_query = sa.select(PublicRepositoryMetadata).where(  # type: ignore
         PublicRepositoryMetadata.public_repository == repository,
         PublicRepositoryMetadata.pathogen == pathogen,
-        PublicRepositoryMetadata.isl.in_(sample_ids),
+        PublicRepositoryMetadata.isl == sa.any_(identifier_array(sample_ids)),
     )
     isl_matches: Iterable[PublicRepositoryMetadata] = (
         (await session.execute(isl_matches_query)).scalars().all()
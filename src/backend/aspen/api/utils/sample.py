@@ -3,6 +3,7 @@ from collections import Counter
 from typing import (
     Any,
     Dict,
+    Iterable,
     List,
     Mapping,
     Optional,
@@ -14,8 +15,10 @@ from typing import (
 
 import sentry_sdk
 import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.query import Query
+from sqlalchemy.sql import ColumnElement
 from sqlalchemy.sql.expression import and_, or_
 
 from aspen.api.authz import AuthZSession
@@ -73,36 +76,40 @@ async def get_public_repository_prefix(pathogen: Pathogen, public_repository_nam
             return pathogen_repo_config.prefix
 
 
+def identifier_array(identifiers: Optional[Iterable[str]]) -> ColumnElement:
+    """`identifiers` as a single text[] parameter, for `column == sa.any_(...)`.
+
+    Users paste in tens of thousands of identifiers at a time. As an `IN (...)`
+    list that's one bind parameter per identifier, and Postgres spends longer
+    planning the statement than running it."""
+    return sa.cast(sa.literal(list(identifiers or []), ARRAY(sa.Text)), ARRAY(sa.Text))
+
+
 async def samples_by_identifiers(
     az: AuthZSession,
     pathogen: Pathogen,
     sample_ids: Optional[Set[str]],
     permission="read",
 ) -> Query:
-    # TODO, this query can be updated to use an "id in (select id from...)" clause when we get a chance to fix it.
-    public_samples_query = (
+    ids = identifier_array(sample_ids)
+    public_sample_ids = (
         (await az.authorized_query("read", Sample))
-        .filter(Sample.public_identifier.in_(sample_ids))  # type: ignore
-        .subquery()  # type: ignore
+        .with_only_columns(Sample.id)  # type: ignore
+        .filter(Sample.public_identifier == sa.any_(ids))  # type: ignore
     )
-    private_samples_query = (
+    private_sample_ids = (
         (await az.authorized_query("read_private", Sample))
-        .filter(Sample.private_identifier.in_(sample_ids))  # type: ignore
-        .subquery()  # type: ignore
+        .with_only_columns(Sample.id)  # type: ignore
+        .filter(Sample.private_identifier == sa.any_(ids))  # type: ignore
     )
-    query = (
-        (await az.authorized_query(permission, Sample))
-        .outerjoin(public_samples_query, Sample.id == public_samples_query.c.id)  # type: ignore
-        .outerjoin(private_samples_query, Sample.id == private_samples_query.c.id)  # type: ignore
-        .where(
-            and_(
-                Sample.pathogen == pathogen,  # noqa: E711
-                or_(
-                    public_samples_query.c.id != None,  # noqa: E711
-                    private_samples_query.c.id != None,  # noqa: E711
-                ),
+    query = (await az.authorized_query(permission, Sample)).where(
+        and_(
+            Sample.pathogen == pathogen,  # noqa: E711
+            or_(
+                Sample.id.in_(public_sample_ids),
+                Sample.id.in_(private_sample_ids),
             ),
-        )
+        ),
     )
     return query
 
@@ -121,30 +128,6 @@ def get_all_identifiers_in_request(
     return private_ids, public_ids
 
 
-async def get_existing_private_ids(
-    private_ids: list[str], session: AsyncSession, group_id=None
-) -> list[str]:
-    samples = sa.select(Sample).filter(Sample.private_identifier.in_(private_ids))  # type: ignore
-
-    if group_id is not None:
-        samples = samples.filter(Sample.submitting_group_id == group_id)
-
-    res = await session.execute(samples)
-    return [i.private_identifier for i in res.scalars().all()]
-
-
-async def get_existing_public_ids(
-    public_ids: list[str], session: AsyncSession, group_id=None
-) -> list[str]:
-    samples = sa.select(Sample).filter(Sample.public_identifier.in_(public_ids))  # type: ignore
-
-    if group_id is not None:
-        samples = samples.filter(Sample.submitting_group_id == group_id)
-
-    res = await session.execute(samples)
-    return [i.public_identifier for i in res.scalars().all()]
-
-
 async def check_duplicate_samples(
     data: List["CreateSampleRequest"],
     session: AsyncSession,
@@ -159,12 +142,28 @@ async def check_duplicate_samples(
     """
     private_ids, public_ids = get_all_identifiers_in_request(data)
 
-    existing_private_ids: list[str] = await get_existing_private_ids(
-        private_ids, session, group_id
-    )
-    existing_public_ids: list[str] = await get_existing_public_ids(
-        public_ids, session, group_id
+    # One query for both kinds of identifier, and only the columns we compare.
+    existing = sa.select(Sample.private_identifier, Sample.public_identifier).where(
+        or_(
+            Sample.private_identifier.in_(private_ids),  # type: ignore
+            Sample.public_identifier.in_(public_ids),  # type: ignore
+        )
     )
+    if group_id is not None:
+        existing = existing.where(Sample.submitting_group_id == group_id)
+    rows = (await session.execute(existing)).all()
+
+    requested_private_ids, requested_public_ids = set(private_ids), set(public_ids)
+    existing_private_ids: list[str] = [
+        row.private_identifier
+        for row in rows
+        if row.private_identifier in requested_private_ids
+    ]
+    existing_public_ids: list[str] = [
+        row.public_identifier
+        for row in rows
+        if row.public_identifier in requested_public_ids
+    ]
 
     if existing_private_ids or existing_public_ids:
         return {
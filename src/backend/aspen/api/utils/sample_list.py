@@ -0,0 +1,122 @@
+import base64
+import datetime
+import json
+from dataclasses import dataclass
+from enum import Enum
+from typing import List, Optional, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy.sql import Select
+
+from aspen.api.error import http_exceptions as ex
+from aspen.database.models import (
+    Sample,
+    SampleLineage,
+    SampleQCMetric,
+    UploadedPathogenGenome,
+)
+
+
+class SampleOrderEnum(str, Enum):
+    ID = "id"
+    COLLECTION_DATE = "collection_date"
+
+
+@dataclass
+class SampleListFilters:
+    lineages: Optional[List[str]] = None
+    collection_date_start: Optional[datetime.date] = None
+    collection_date_end: Optional[datetime.date] = None
+    upload_date_start: Optional[datetime.datetime] = None
+    upload_date_end: Optional[datetime.datetime] = None
+    qc_statuses: Optional[List[str]] = None
+    location_ids: Optional[List[int]] = None
+
+
+def apply_sample_filters(query: Select, filters: SampleListFilters) -> Select:
+    """Pushes the sample list filters down into SQL. Filters on related tables use
+    EXISTS subqueries, so they never multiply the rows we get back."""
+    if filters.lineages:
+        query = query.filter(
+            Sample.lineages.any(SampleLineage.lineage.in_(filters.lineages))  # type: ignore
+        )
+    if filters.collection_date_start:
+        query = query.filter(Sample.collection_date >= filters.collection_date_start)
+    if filters.collection_date_end:
+        query = query.filter(Sample.collection_date <= filters.collection_date_end)
+    upload_conditions = []
+    if filters.upload_date_start:
+        upload_conditions.append(
+            UploadedPathogenGenome.upload_date >= filters.upload_date_start
+        )
+    if filters.upload_date_end:
+        upload_conditions.append(
+            UploadedPathogenGenome.upload_date <= filters.upload_date_end
+        )
+    if upload_conditions:
+        query = query.filter(
+            Sample.uploaded_pathogen_genome.has(sa.and_(*upload_conditions))  # type: ignore
+        )
+    if filters.qc_statuses:
+        query = query.filter(
+            Sample.qc_metrics.any(SampleQCMetric.qc_status.in_(filters.qc_statuses))  # type: ignore
+        )
+    if filters.location_ids:
+        query = query.filter(Sample.location_id.in_(filters.location_ids))  # type: ignore
+    return query
+
+
+def encode_cursor(order_by: SampleOrderEnum, sample: Sample) -> str:
+    position = {"order_by": order_by.value, "id": sample.id}
+    if order_by == SampleOrderEnum.COLLECTION_DATE:
+        position["collection_date"] = sample.collection_date.isoformat()
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(
+    order_by: SampleOrderEnum, cursor: str
+) -> Tuple[int, Optional[datetime.date]]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if position["order_by"] != order_by.value:
+            raise ValueError("cursor is for a different sort order")
+        collection_date = None
+        if order_by == SampleOrderEnum.COLLECTION_DATE:
+            collection_date = datetime.date.fromisoformat(position["collection_date"])
+        return int(position["id"]), collection_date
+    except (ValueError, KeyError, TypeError):
+        raise ex.BadRequestException("Invalid cursor")
+
+
+def paginate_samples(
+    query: Select,
+    order_by: SampleOrderEnum,
+    descending: bool,
+    cursor: Optional[str],
+    limit: int,
+) -> Select:
+    """Orders the query by a unique key and resumes after `cursor`.
+
+    Keyset pagination only ever reads the rows for the requested page, however far
+    into the list the client is, which OFFSET can't do. We fetch one extra row so
+    callers can tell whether there's another page.
+    """
+    if order_by == SampleOrderEnum.COLLECTION_DATE:
+        key = sa.tuple_(Sample.collection_date, Sample.id)
+        sort_columns = [Sample.collection_date, Sample.id]
+    else:
+        key = Sample.id
+        sort_columns = [Sample.id]
+
+    if cursor:
+        last_id, last_collection_date = decode_cursor(order_by, cursor)
+        last_key = (
+            sa.tuple_(last_collection_date, last_id)
+            if order_by == SampleOrderEnum.COLLECTION_DATE
+            else last_id
+        )
+        query = query.filter(key < last_key if descending else key > last_key)
+
+    if descending:
+        sort_columns = [column.desc() for column in sort_columns]
+    return query.order_by(*sort_columns).limit(limit + 1)
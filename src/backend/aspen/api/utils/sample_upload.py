@@ -0,0 +1,241 @@
+"""Sample uploads from a metadata TSV and a FASTA file, processed as they stream in.
+
+The TSV comes first: one header row of `SampleUploadMetadataRow` field names, then
+one row per sample. It's small, so we read and validate all of it up front. Then
+each FASTA record is checked line by line as it arrives, against the same
+alphabet and minimum length as `CreateSamplePathogenGenomeRequest`, and paired
+with its metadata row by private identifier. Valid samples are inserted in
+chunks with `bulk_insert_samples`, so we only ever hold one chunk's sequences.
+
+Uploads are all or nothing. Once a row fails, we stop inserting but keep
+checking the rest of the upload so every problem can be reported in one go. The
+caller rolls back if there are any `errors`.
+"""
+import re
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.api.error import http_exceptions as ex
+from aspen.api.schemas.samples import (
+    CreateSamplePathogenGenomeRequest,
+    CreateSampleRequest,
+    SampleUploadMetadataRow,
+    SampleUploadRowError,
+    SEQUENCE_MIN_LENGTH,
+    SEQUENCE_VALIDATION_REGEX,
+    UploadedSampleResponse,
+)
+from aspen.api.utils.bulk_samples import bulk_insert_samples
+from aspen.api.utils.sample import check_duplicate_samples
+from aspen.database.models import Group, Pathogen, User
+from aspen.database.reference_cache import reference_cache_for
+
+SEQUENCE_LINE = re.compile(SEQUENCE_VALIDATION_REGEX)
+# Enough to fix a bad upload; past this we'd just be building a huge response.
+MAX_ROW_ERRORS = 1000
+
+
+def _validation_message(err: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}"
+        for error in err.errors()
+    )
+
+
+class SampleUpload:
+    def __init__(
+        self,
+        db: AsyncSession,
+        group: Group,
+        user: User,
+        pathogen: Pathogen,
+        public_identifier_prefix: str,
+        chunk_size: int,
+    ):
+        self.db = db
+        self.group = group
+        self.user = user
+        self.pathogen = pathogen
+        self.public_identifier_prefix = public_identifier_prefix
+        self.chunk_size = chunk_size
+        # private identifier -> (TSV line, row)
+        self.metadata: Dict[str, Tuple[int, SampleUploadMetadataRow]] = {}
+        self.sequenced: Set[str] = set()
+        self.pending: List[CreateSampleRequest] = []
+        self.created: List[UploadedSampleResponse] = []
+        self.errors: List[SampleUploadRowError] = []
+
+    def add_error(
+        self,
+        private_identifier: Optional[str],
+        message: str,
+        line: Optional[int] = None,
+    ) -> None:
+        if len(self.errors) >= MAX_ROW_ERRORS:
+            return
+        if line is None and private_identifier in self.metadata:
+            line = self.metadata[private_identifier][0]  # type: ignore
+        self.errors.append(
+            SampleUploadRowError(
+                line=line, private_identifier=private_identifier, message=message
+            )
+        )
+
+    async def read_metadata(self, lines: AsyncIterator[str]) -> None:
+        header: Optional[List[str]] = None
+        public_identifiers: Set[str] = set()
+        line_number = 0
+        async for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            cells = line.split("\t")
+            if header is None:
+                header = [cell.strip() for cell in cells]
+                unknown = set(header) - set(SampleUploadMetadataRow.__fields__)
+                if unknown:
+                    raise ex.BadRequestException(
+                        f"Unknown metadata columns: {', '.join(sorted(unknown))}"
+                    )
+                continue
+            values = {
+                column: cell for column, cell in zip(header, cells) if cell.strip()
+            }
+            try:
+                row = SampleUploadMetadataRow(**values)
+            except ValidationError as err:
+                self.add_error(
+                    values.get("private_identifier"),
+                    _validation_message(err),
+                    line_number,
+                )
+                continue
+            if row.private_identifier in self.metadata:
+                self.add_error(
+                    row.private_identifier, "Duplicate private identifier", line_number
+                )
+                continue
+            if row.public_identifier and row.public_identifier in public_identifiers:
+                self.add_error(
+                    row.private_identifier, "Duplicate public identifier", line_number
+                )
+                continue
+            self.metadata[row.private_identifier] = (line_number, row)
+            if row.public_identifier:
+                public_identifiers.add(row.public_identifier)
+        if header is None:
+            raise ex.BadRequestException("The metadata file is empty")
+
+    async def read_sequences(self, lines: AsyncIterator[str]) -> None:
+        private_identifier: Optional[str] = None
+        sequence: List[str] = []
+        length = 0
+        problem: Optional[str] = None
+        async for line in lines:
+            if line.startswith(">"):
+                if private_identifier is not None:
+                    await self._add_record(
+                        private_identifier, sequence, length, problem
+                    )
+                private_identifier = line[1:].strip()
+                sequence, length, problem = [], 0, None
+            elif line.startswith(";") or not line.strip():
+                continue
+            elif private_identifier is None:
+                raise ex.BadRequestException(
+                    "The FASTA file has to start with a >header line"
+                )
+            elif problem is None:
+                line = line.strip()
+                if not SEQUENCE_LINE.match(line):
+                    problem = "Sequence has invalid characters"
+                    sequence = []
+                else:
+                    sequence.append(line)
+                    length += len(line)
+        if private_identifier is not None:
+            await self._add_record(private_identifier, sequence, length, problem)
+
+    async def _add_record(
+        self,
+        private_identifier: str,
+        lines: List[str],
+        length: int,
+        problem: Optional[str],
+    ) -> None:
+        if private_identifier in self.sequenced:
+            self.add_error(private_identifier, "Duplicate sequence")
+            return
+        self.sequenced.add(private_identifier)
+        if private_identifier not in self.metadata:
+            self.add_error(private_identifier, "No metadata for this sequence")
+            return
+        if problem is None and length < SEQUENCE_MIN_LENGTH:
+            problem = f"Sequences need at least {SEQUENCE_MIN_LENGTH} characters"
+        if problem is not None:
+            self.add_error(private_identifier, problem)
+            return
+        _, row = self.metadata[private_identifier]
+        # Both halves are already validated, so skip doing it again.
+        self.pending.append(
+            CreateSampleRequest.construct(
+                sample=row,
+                pathogen_genome=CreateSamplePathogenGenomeRequest.construct(
+                    sequence="".join(lines),
+                    sequencing_date=row.sequencing_date,
+                    sequencing_depth=row.sequencing_depth,
+                ),
+            )
+        )
+        if len(self.pending) >= self.chunk_size:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        rows, self.pending = self.pending, []
+        if not rows:
+            return
+        existing = await check_duplicate_samples(rows, self.db, self.group.id)
+        if existing:
+            existing_private = set(existing["existing_private_ids"])
+            existing_public = set(existing["existing_public_ids"])
+            for row in rows:
+                if row.sample.private_identifier in existing_private or (
+                    row.sample.public_identifier in existing_public
+                ):
+                    self.add_error(
+                        row.sample.private_identifier, "Sample already exists"
+                    )
+        locations = await reference_cache_for(self.db).get_locations(
+            self.db, [row.sample.location_id for row in rows]
+        )
+        for row in rows:
+            if row.sample.location_id not in locations:
+                self.add_error(row.sample.private_identifier, "Invalid location id")
+        # Nothing is going to be committed, so don't bother writing anything.
+        if self.errors:
+            return
+        created = await bulk_insert_samples(
+            self.db,
+            rows,
+            self.group,
+            self.user,
+            self.pathogen.id,
+            self.public_identifier_prefix,
+            locations,
+        )
+        for row, sample in zip(rows, created):
+            self.created.append(
+                UploadedSampleResponse(
+                    id=sample.id,
+                    private_identifier=row.sample.private_identifier,
+                    public_identifier=sample.public_identifier,
+                )
+            )
+
+    async def finish(self) -> None:
+        await self._flush()
+        for private_identifier, (line, _) in self.metadata.items():
+            if private_identifier not in self.sequenced:
+                self.add_error(private_identifier, "No sequence for this sample", line)
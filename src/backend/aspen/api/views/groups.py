@@ -23,6 +23,7 @@ from aspen.api.schemas.usergroup import (
 from aspen.api.settings import APISettings
 from aspen.auth.auth0_management import Auth0Client, Auth0Org
 from aspen.database.models import Group, User, UserRole
+from aspen.util.blocking import run_blocking
 
 router = APIRouter()
 
@@ -41,7 +42,9 @@ async def create_group(
     auth0_safe_prefix = re.sub(
         r"[^a-zA-Z0-9_-]+", "_", group_creation_request.prefix.lower()
     )
-    organization = auth0_client.add_org(auth0_safe_prefix, group_creation_request.name)
+    organization = await run_blocking(
+        "auth0", auth0_client.add_org, auth0_safe_prefix, group_creation_request.name
+    )
     group_values = dict(group_creation_request) | {"auth0_org_id": organization["id"]}
     group = Group(**group_values)
     db.add(group)
@@ -108,10 +111,14 @@ async def get_group_invitations(
     auth0_client: Auth0Client = Depends(get_auth0_apiclient),
 ) -> InvitationsResponse:
     try:
-        auth0_org: Auth0Org = auth0_client.get_org_by_id(group.auth0_org_id)
+        auth0_org: Auth0Org = await run_blocking(
+            "auth0", auth0_client.get_org_by_id, group.auth0_org_id
+        )
     except Exception:
         raise ex.BadRequestException("Not found")
-    invitations = auth0_client.get_org_invitations(auth0_org)
+    invitations = await run_blocking(
+        "auth0", auth0_client.get_org_invitations, auth0_org
+    )
     return InvitationsResponse.parse_obj({"invitations": invitations})
 
 
@@ -123,13 +130,17 @@ async def invite_group_members(
     settings: APISettings = Depends(get_settings),
     user: User = Depends(get_auth_user),
 ) -> GroupInvitationsResponse:
-    organization = auth0_client.get_org_by_id(group.auth0_org_id)
+    organization = await run_blocking(
+        "auth0", auth0_client.get_org_by_id, group.auth0_org_id
+    )
     client_id = settings.AUTH0_CLIENT_ID
     responses = []
     for email in group_invitation_request.emails:
         success = True
         try:
-            auth0_client.invite_member(
+            await run_blocking(
+                "auth0",
+                auth0_client.invite_member,
                 organization["id"],
                 client_id,
                 user.name,
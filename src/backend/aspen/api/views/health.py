@@ -1,6 +1,19 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from aspen.api.deps import get_db, get_engine
+from aspen.api.schemas.health import CacheStats, DBPoolStatus
 from aspen.api.schemas.health import Health as healthschema
+from aspen.api.schemas.health import JobQueueStatus, PhaseTimings
+from aspen.api.timing import phase_histograms
+from aspen.api.utils.job_queue import job_queue_status
+from aspen.api.utils.phylo_cache import phylo_tree_cache
+from aspen.auth import device_auth
+from aspen.auth.auth_cache import auth_cache_stats
+from aspen.database.connection import SqlAlchemyInterface
+from aspen.database.reference_cache import reference_cache_stats
+from aspen.util import metrics
 
 router = APIRouter()
 
@@ -8,3 +21,51 @@ router = APIRouter()
 @router.get("/", response_model=healthschema)
 async def get_health() -> healthschema:
     return healthschema.parse_obj({"healthy": True})
+
+
+@router.get("/db_pool", response_model=DBPoolStatus)
+async def get_db_pool_status(
+    engine: SqlAlchemyInterface = Depends(get_engine),
+) -> DBPoolStatus:
+    """Connection pool statistics for the worker that served this request."""
+    return DBPoolStatus.parse_obj(engine.pool_status())
+
+
+@router.get("/caches", response_model=CacheStats)
+async def get_cache_stats() -> CacheStats:
+    """Hit/miss counters for this worker's in-process caches."""
+    verified_tokens = device_auth.verified_tokens
+    return CacheStats.parse_obj(
+        {
+            "caches": {
+                "auth_context": auth_cache_stats(),
+                "verified_tokens": {
+                    "hits": verified_tokens.hits,
+                    "misses": verified_tokens.misses,
+                },
+                "phylo_trees": phylo_tree_cache.stats(),
+                "reference_data": reference_cache_stats(),
+            }
+        }
+    )
+
+
+@router.get("/job_queue", response_model=JobQueueStatus)
+async def get_job_queue_status(db: AsyncSession = Depends(get_db)) -> JobQueueStatus:
+    """How many post-upload jobs are pending, dispatched or failed."""
+    return JobQueueStatus.parse_obj(await job_queue_status(db))
+
+
+@router.get("/phase_timings", response_model=PhaseTimings)
+async def get_phase_timings() -> PhaseTimings:
+    """Per-route histograms of the Server-Timing phases, for this worker."""
+    return PhaseTimings.parse_obj({"routes": phase_histograms.snapshot()})
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """Prometheus metrics, merged across every worker process."""
+    return PlainTextResponse(
+        metrics.render(metrics.collect()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
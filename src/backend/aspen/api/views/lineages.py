@@ -3,9 +3,13 @@ import re
 import sqlalchemy as sa
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+from starlette.responses import Response
 
-from aspen.api.deps import get_db
+from aspen.api.deps import get_db, get_settings
 from aspen.api.schemas.lineages import PathogenLineagesResponse
+from aspen.api.settings import APISettings
+from aspen.api.utils.reference_payloads import payload_response, reference_payload
 from aspen.database.models import Pathogen, PathogenLineage
 from aspen.util.lineage import NEXTSTRAIN_LINEAGE_MAP, WHO_LINEAGE_MAP
 
@@ -13,7 +17,11 @@ router = APIRouter()
 
 
 @router.get("/pango", response_model=PathogenLineagesResponse)
-async def list_pango_lineages(db: AsyncSession = Depends(get_db)):
+async def list_pango_lineages(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    settings: APISettings = Depends(get_settings),
+) -> Response:
     """Gets all the Pango lineages.
 
     Note that the returned result is very simple: pretty  much just a list of
@@ -22,22 +30,27 @@ async def list_pango_lineages(db: AsyncSession = Depends(get_db)):
     lineage info. The only real info we have is the names of the lineages,
     so that's all we pull and return.
     """
-    # This is specifically a *pangolin* lineages endpoint, so hardcode an SC2 filter
-    all_lineages_query = sa.select(PathogenLineage.lineage).join(Pathogen).where(Pathogen.slug == "SC2")  # type: ignore
-    result = await db.execute(all_lineages_query)
-    all_lineages = set(result.scalars().all())
-
-    all_lineages.update(
-        [re.sub(r"\.[0-9]+$", "*", lineage) for lineage in all_lineages]
-    )
-    all_lineages.update(WHO_LINEAGE_MAP.keys())
-
-    all_lineages_list = [
-        f"{lineage} / {NEXTSTRAIN_LINEAGE_MAP[lineage]}"
-        if lineage in NEXTSTRAIN_LINEAGE_MAP
-        else lineage
-        for lineage in all_lineages
-    ]
-    all_lineages_list.sort()
-
-    return {"lineages": all_lineages_list}
+
+    async def build() -> PathogenLineagesResponse:
+        # This is specifically a *pangolin* lineages endpoint, so hardcode an SC2 filter
+        all_lineages_query = sa.select(PathogenLineage.lineage).join(Pathogen).where(Pathogen.slug == "SC2")  # type: ignore
+        result = await db.execute(all_lineages_query)
+        all_lineages = set(result.scalars().all())
+
+        all_lineages.update(
+            [re.sub(r"\.[0-9]+$", "*", lineage) for lineage in all_lineages]
+        )
+        all_lineages.update(WHO_LINEAGE_MAP.keys())
+
+        all_lineages_list = [
+            f"{lineage} / {NEXTSTRAIN_LINEAGE_MAP[lineage]}"
+            if lineage in NEXTSTRAIN_LINEAGE_MAP
+            else lineage
+            for lineage in all_lineages
+        ]
+        all_lineages_list.sort()
+
+        return PathogenLineagesResponse(lineages=all_lineages_list)
+
+    payload = await reference_payload(db, ("pango_lineages",), build)
+    return payload_response(request, payload, settings.REFERENCE_DATA_MAX_AGE)
@@ -8,6 +8,7 @@ from sqlalchemy import asc
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.expression import and_, BinaryExpression
 from starlette.requests import Request
+from starlette.responses import Response
 
 from aspen.api.authn import get_auth_user
 from aspen.api.deps import get_db, get_settings
@@ -17,7 +18,9 @@ from aspen.api.schemas.locations import (
     LocationSearchRequest,
 )
 from aspen.api.settings import APISettings
+from aspen.api.utils.reference_payloads import payload_response, reference_payload
 from aspen.database.models import Location, User
+from aspen.database.reference_cache import reference_cache_for
 
 router = APIRouter()
 
@@ -40,25 +43,25 @@ async def list_locations(
     settings: APISettings = Depends(get_settings),
     user: User = Depends(get_auth_user),
     max_location_depth: LocationDepthEnum = Query(default=LocationDepthEnum.LOCATION),
-) -> LocationListResponse:
-
-    # load the locations.
-    all_locations_query = sa.select(Location)  # type: ignore
-    # Find out which columns need to be forced to null based on our max location depth
+) -> Response:
+    # Find out which columns need to be null based on our max location depth
     required_null_columns = LOCATION_DEPTH[
         LOCATION_DEPTH.index(max_location_depth) + 1 :
     ]
-    # Add null filters to our query
-    for col in required_null_columns:
-        all_locations_query = all_locations_query.where(
-            getattr(Location, col) == None  # noqa: E711
-        )
-    result = await db.execute(all_locations_query)
-    response = []
-    for row in result.scalars():
-        response.append(LocationResponse.from_orm(row))
 
-    return LocationListResponse.parse_obj({"locations": response})
+    async def build() -> LocationListResponse:
+        # The locations table is in the reference data cache, so filter it here.
+        response = [
+            LocationResponse.from_orm(row)
+            for row in reference_cache_for(db).locations()
+            if all(getattr(row, col) is None for col in required_null_columns)
+        ]
+        return LocationListResponse.parse_obj({"locations": response})
+
+    payload = await reference_payload(
+        db, ("locations", max_location_depth.value), build
+    )
+    return payload_response(request, payload, settings.REFERENCE_DATA_MAX_AGE)
 
 
 # The idea in this route is that,
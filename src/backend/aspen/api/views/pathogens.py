@@ -1,21 +1,32 @@
-import sqlalchemy as sa
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import Request
+from starlette.responses import Response
 
 from aspen.api.authn import get_auth_user
-from aspen.api.deps import get_db
+from aspen.api.deps import get_db, get_settings
 from aspen.api.schemas.pathogens import PathogenResponse, PathogensResponse
-from aspen.database.models import Pathogen, User
+from aspen.api.settings import APISettings
+from aspen.api.utils.reference_payloads import payload_response, reference_payload
+from aspen.database.models import User
+from aspen.database.reference_cache import reference_cache_for
 
 router = APIRouter()
 
 
 @router.get("/", response_model=PathogensResponse)
 async def list_pathogens(
+    request: Request,
     db: AsyncSession = Depends(get_db),
+    settings: APISettings = Depends(get_settings),
     user: User = Depends(get_auth_user),
-) -> PathogensResponse:
-    query = sa.select(Pathogen)  # type: ignore
-    results = await db.execute(query)
-    pathogens = [PathogenResponse.from_orm(row) for row in results.scalars()]
-    return PathogensResponse(pathogens=pathogens)
+) -> Response:
+    async def build() -> PathogensResponse:
+        pathogens = [
+            PathogenResponse.from_orm(row)
+            for row in reference_cache_for(db).pathogens()
+        ]
+        return PathogensResponse(pathogens=pathogens)
+
+    payload = await reference_payload(db, ("pathogens",), build)
+    return payload_response(request, payload, settings.REFERENCE_DATA_MAX_AGE)
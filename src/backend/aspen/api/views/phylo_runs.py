@@ -27,16 +27,10 @@ from aspen.api.schemas.phylo_runs import (
     PhyloRunUpdateRequest,
 )
 from aspen.api.settings import APISettings
-from aspen.api.utils import (
-    get_matching_repo_ids,
-    get_matching_repo_ids_by_epi_isl,
-    get_missing_and_found_sample_ids,
-    samples_by_identifiers,
-)
+from aspen.api.utils import resolve_sample_identifiers, samples_by_identifiers
 from aspen.database.models import (
     AlignedRepositoryData,
     Group,
-    Location,
     Pathogen,
     PathogenGenome,
     PathogenRepoConfig,
@@ -49,6 +43,8 @@ from aspen.database.models import (
     Workflow,
     WorkflowStatusType,
 )
+from aspen.database.reference_cache import reference_cache_for
+from aspen.util.blocking import run_blocking
 from aspen.util.swipe import NextstrainJob
 
 router = APIRouter()
@@ -82,27 +78,13 @@ async def kick_off_phylo_run(
     user_visible_samples = await db.execute(user_visible_samples_query)
     user_visible_samples = user_visible_samples.unique().scalars().all()
 
-    # Are there any sample ID's that don't match sample table public and private identifiers
-    missing_sample_ids, _ = get_missing_and_found_sample_ids(
-        sample_ids, user_visible_samples
-    )
-
-    # See if these missing_sample_ids match any Gisaid IDs
-    gisaid_ids: Set[str] = await get_matching_repo_ids(
-        db, pathogen, public_repository, pathogen_repo_config, missing_sample_ids
-    )
-
-    # Do we have any samples that are not aspen private or public identifiers or gisaid identifiers?
-    missing_sample_ids = missing_sample_ids - gisaid_ids
-
-    # Do the same, but for epi isls
-    gisaid_ids_from_isls: Set[str]
-    epi_isls: Set[str]
-    gisaid_ids_from_isls, epi_isls = await get_matching_repo_ids_by_epi_isl(
-        db, pathogen, public_repository, missing_sample_ids
+    # Are there any sample ID's that don't match sample table public and private
+    # identifiers, public repository strain names or EPI ISLs?
+    resolved = await resolve_sample_identifiers(
+        db, az, pathogen, public_repository, pathogen_repo_config, sample_ids
     )
-    missing_sample_ids -= epi_isls
-    gisaid_ids |= gisaid_ids_from_isls
+    missing_sample_ids = resolved.missing
+    gisaid_ids: Set[str] = resolved.repo_ids | resolved.repo_ids_from_isls
 
     # Throw an error if we have any sample ID's that didn't match county samples OR gisaid samples.
     if missing_sample_ids:
@@ -149,7 +131,7 @@ async def kick_off_phylo_run(
                 value = value.strftime("%Y-%m-%d")
             if key == "location_id":
                 # Verify it's a real location before starting workflow with it
-                location = await Location.get_by_id(db, value)
+                location = await reference_cache_for(db).get_location(db, value)
                 if location is None:
                     raise ex.BadRequestException(f"location_id {value} not found")
             # Any other key from TemplateArgsRequest schema with a non-falsey
@@ -178,7 +160,7 @@ async def kick_off_phylo_run(
 
     # Step 5 - Kick off the phylo run job.
     job = NextstrainJob(settings)
-    job.run(workflow, "ondemand")
+    await run_blocking("sfn", job.run, workflow, "ondemand")
 
     return PhyloRunResponse.from_orm(workflow)
 
@@ -2,14 +2,19 @@ import re
 
 import sqlalchemy as sa
 from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import aliased, contains_eager
 from starlette.requests import Request
 
 from aspen.api.authz import AuthZSession, get_authz_session
 from aspen.api.deps import get_db, get_pathogen, get_pathogen_repo_config, get_splitio
-from aspen.api.utils import extract_accessions, MetadataTSVStreamer, process_phylo_tree
+from aspen.api.utils import (
+    extract_accessions,
+    MetadataTSVStreamer,
+    process_phylo_tree,
+    process_phylo_tree_json,
+)
 from aspen.database.models import (
     Pathogen,
     PhyloRun,
@@ -32,10 +37,10 @@ async def get_single_phylo_tree(
     pathogen: Pathogen = Depends(get_pathogen),
     splitio: SplitClient = Depends(get_splitio),
     pathogen_repo_config: PathogenRepoConfig = Depends(get_pathogen_repo_config),
-) -> JSONResponse:
+) -> Response:
     # get public repository for a given pathogen
 
-    phylo_tree_data = await process_phylo_tree(
+    phylo_tree_data = await process_phylo_tree_json(
         db,
         az,
         item_id,
@@ -47,7 +52,7 @@ async def get_single_phylo_tree(
         "Content-Type": "application/json",
         "Content-Disposition": f"attachment; filename={item_id}.json",
     }
-    return JSONResponse(content=phylo_tree_data, headers=headers)
+    return Response(content=phylo_tree_data, headers=headers)
 
 
 # supporting function for get_tree_metadata()
@@ -1,14 +1,13 @@
 import datetime
-import threading
-from typing import Any, List, Mapping, MutableSequence, Optional, Set, Type, Union
+from typing import Dict, List, Mapping, Optional, Set, Type, Union
 
 import sentry_sdk
-import sqlalchemy as sa
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
-from sqlalchemy.orm import joinedload, selectinload
-from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy.orm import aliased, joinedload, selectinload
+from starlette.requests import Request
 
 from aspen.api.authn import AuthContext, get_auth_context, get_auth_user
 from aspen.api.authz import AuthZSession, get_authz_session, require_group_privilege
@@ -27,57 +26,97 @@ from aspen.api.schemas.samples import (
     SampleBulkDeleteResponse,
     SampleDeleteResponse,
     SampleResponse,
+    SamplesPageResponse,
     SamplesResponse,
+    SampleUploadResponse,
     SubmissionTemplateRequest,
     UpdateSamplesRequest,
     ValidateIDsRequest,
     ValidateIDsResponse,
 )
 from aspen.api.settings import APISettings
+from aspen.api.timing import timed_phase
 from aspen.api.utils import (
     check_duplicate_samples,
     check_duplicate_samples_in_request,
     collect_submission_information,
     determine_gisaid_status,
     GenBankSubmissionFormTSVStreamer,
-    get_matching_repo_ids,
-    get_matching_repo_ids_by_epi_isl,
-    get_missing_and_found_sample_ids,
     GisaidSubmissionFormCSVStreamer,
+    resolve_sample_identifiers,
     sample_info_to_genbank_rows,
     sample_info_to_gisaid_rows,
     samples_by_identifiers,
 )
+from aspen.api.utils.bulk_samples import (
+    bulk_delete_samples,
+    bulk_insert_samples,
+    bulk_update_samples,
+)
+from aspen.api.utils.job_queue import enqueue_job
+from aspen.api.utils.multipart import iter_lines, MultipartError, MultipartReader
 from aspen.api.utils.pathogens import get_pathogen_repo_config_for_pathogen
+from aspen.api.utils.sample_json import sample_json_query, stream_samples_json
+from aspen.api.utils.sample_list import (
+    apply_sample_filters,
+    encode_cursor,
+    paginate_samples,
+    SampleListFilters,
+    SampleOrderEnum,
+)
+from aspen.api.utils.sample_upload import SampleUpload
 from aspen.database.models import (
     Group,
-    Location,
     Pathogen,
     PathogenRepoConfig,
     PublicRepository,
+    QueuedJobType,
     Sample,
-    UploadedPathogenGenome,
     User,
 )
+from aspen.database.reference_cache import reference_cache_for
 from aspen.util.split import SplitClient
-from aspen.util.swipe import LineageQcJob, PangolinJob
 
 router = APIRouter()
 
 GISAID_REJECTION_TIME = datetime.timedelta(days=4)
 
 
-@router.get("/", response_model=SamplesResponse)
-async def list_samples(
-    db: AsyncSession = Depends(get_db),
-    az: AuthZSession = Depends(get_authz_session),
-    ac: AuthContext = Depends(get_auth_context),
-    pathogen: Pathogen = Depends(get_pathogen),
-) -> SamplesResponse:
+def get_sample_list_filters(
+    lineage: Optional[List[str]] = Query(None),
+    collection_date_start: Optional[datetime.date] = None,
+    collection_date_end: Optional[datetime.date] = None,
+    upload_date_start: Optional[datetime.datetime] = None,
+    upload_date_end: Optional[datetime.datetime] = None,
+    qc_status: Optional[List[str]] = Query(None),
+    location_id: Optional[List[int]] = Query(None),
+) -> SampleListFilters:
+    return SampleListFilters(
+        lineages=lineage,
+        collection_date_start=collection_date_start,
+        collection_date_end=collection_date_end,
+        upload_date_start=upload_date_start,
+        upload_date_end=upload_date_end,
+        qc_statuses=qc_status,
+        location_ids=location_id,
+    )
 
-    # load the samples.
+
+async def get_filtered_samples_query(
+    az: AuthZSession, pathogen: Pathogen, filters: SampleListFilters
+):
     user_visible_samples_query = await az.authorized_query("read", Sample)
-    user_visible_samples_query = user_visible_samples_query.options(  # type: ignore
+    user_visible_samples_query = user_visible_samples_query.filter(  # type: ignore
+        Sample.pathogen_id == pathogen.id
+    )
+    return apply_sample_filters(user_visible_samples_query, filters)
+
+
+async def get_visible_samples_query(
+    az: AuthZSession, pathogen: Pathogen, filters: SampleListFilters
+):
+    user_visible_samples_query = await get_filtered_samples_query(az, pathogen, filters)
+    return user_visible_samples_query.options(  # type: ignore
         selectinload(Sample.uploaded_pathogen_genome),
         selectinload(Sample.submitting_group),
         selectinload(Sample.uploaded_by),
@@ -87,28 +126,96 @@ async def list_samples(
         selectinload(Sample.lineages),
         selectinload(Sample.qc_metrics),
     )
-    user_visible_samples_query = user_visible_samples_query.filter(
-        Sample.pathogen_id == pathogen.id
-    )
-    user_visible_samples_result = await db.execute(user_visible_samples_query)
-    user_visible_samples: List[Sample] = (
-        user_visible_samples_result.unique().scalars().all()
+
+
+def sample_to_response(sample: Sample, ac: AuthContext) -> SampleResponse:
+    sample.gisaid = determine_gisaid_status(
+        sample,
     )
+    sample.show_private_identifier = False
+    # TODO - convert this to an oso check.
+    if sample.submitting_group_id == ac.group.id:  # type: ignore
+        sample.show_private_identifier = True
+    return SampleResponse.from_orm(sample)
+
+
+@router.get("/", response_model=SamplesResponse)
+async def list_samples(
+    db: AsyncSession = Depends(get_db),
+    az: AuthZSession = Depends(get_authz_session),
+    ac: AuthContext = Depends(get_auth_context),
+    pathogen: Pathogen = Depends(get_pathogen),
+    settings: APISettings = Depends(get_settings),
+    filters: SampleListFilters = Depends(get_sample_list_filters),
+) -> Union[SamplesResponse, StreamingResponse]:
+    """Every matching sample in one response. Prefer /page/ for large groups."""
+
+    if settings.SAMPLES_LIST_RENDER_IN_DB:
+        # Postgres renders each sample's JSON, we only pass the bytes along.
+        with timed_phase("query"):
+            sample_json = sample_json_query(
+                await get_filtered_samples_query(az, pathogen, filters),
+                pathogen,
+                ac.group.id,  # type: ignore
+            )
+            rows = await db.stream(sample_json)
+        return StreamingResponse(
+            stream_samples_json(rows), media_type="application/json"
+        )
+
+    # load the samples.
+    with timed_phase("query"):
+        user_visible_samples_query = await get_visible_samples_query(
+            az, pathogen, filters
+        )
+        # Same order as the rendered-in-Postgres path.
+        user_visible_samples_query = user_visible_samples_query.order_by(Sample.id)
+        user_visible_samples_result = await db.execute(user_visible_samples_query)
+        user_visible_samples: List[Sample] = (
+            user_visible_samples_result.unique().scalars().all()
+        )
 
     # populate sample object using pydantic response schema
-    result = SamplesResponse(samples=[])
-    tot_rows = 0
-    for sample in user_visible_samples:
-        tot_rows += 1
-        sample.gisaid = determine_gisaid_status(
-            sample,
+    with timed_phase("validate"):
+        result = SamplesResponse(samples=[])
+        for sample in user_visible_samples:
+            result.samples.append(sample_to_response(sample, ac))
+    return result
+
+
+@router.get("/page/", response_model=SamplesPageResponse)
+async def list_samples_page(
+    db: AsyncSession = Depends(get_db),
+    az: AuthZSession = Depends(get_authz_session),
+    ac: AuthContext = Depends(get_auth_context),
+    pathogen: Pathogen = Depends(get_pathogen),
+    settings: APISettings = Depends(get_settings),
+    filters: SampleListFilters = Depends(get_sample_list_filters),
+    order_by: SampleOrderEnum = Query(default=SampleOrderEnum.ID),
+    descending: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1),
+) -> SamplesPageResponse:
+    """One page of samples. Pass `next_cursor` back as `cursor` to get the next one."""
+    limit = min(limit, settings.SAMPLES_PAGE_SIZE_MAX)
+    with timed_phase("query"):
+        user_visible_samples_query = await get_visible_samples_query(
+            az, pathogen, filters
+        )
+        user_visible_samples_query = paginate_samples(
+            user_visible_samples_query, order_by, descending, cursor, limit
+        )
+        user_visible_samples_result = await db.execute(user_visible_samples_query)
+        user_visible_samples: List[Sample] = (
+            user_visible_samples_result.unique().scalars().all()
         )
-        sample.show_private_identifier = False
-        # TODO - convert this to an oso check.
-        if sample.submitting_group_id == ac.group.id:  # type: ignore
-            sample.show_private_identifier = True
-        sampleinfo = SampleResponse.from_orm(sample)
-        result.samples.append(sampleinfo)
+
+    with timed_phase("validate"):
+        result = SamplesPageResponse(samples=[], next_cursor=None)
+        for sample in user_visible_samples[:limit]:
+            result.samples.append(sample_to_response(sample, ac))
+    if len(user_visible_samples) > limit:
+        result.next_cursor = encode_cursor(order_by, user_visible_samples[limit - 1])
     return result
 
 
@@ -132,23 +239,34 @@ async def get_write_samples_by_ids(
     return results.scalars()
 
 
+async def get_write_sample_groups(
+    db: AsyncSession, az: AuthZSession, sample_ids: List[int]
+) -> Dict[int, Group]:
+    """The submitting group of each sample in `sample_ids` the user can write to,
+    keyed by sample id. Bulk changes only need this much, not the whole sample."""
+    submitting_group = aliased(Group)
+    query = await az.authorized_query("write", Sample)
+    query = (
+        query.with_only_columns(Sample.id, submitting_group)  # type: ignore
+        .join(submitting_group, submitting_group.id == Sample.submitting_group_id)
+        .filter(Sample.id.in_(sample_ids))
+    )
+    results = await db.execute(query)
+    return dict(results.all())
+
+
 @router.delete("/", responses={200: {"model": SampleBulkDeleteResponse}})
 async def delete_samples(
     sample_info: SampleBulkDeleteRequest,
     db: AsyncSession = Depends(get_db),
     az: AuthZSession = Depends(get_authz_session),
 ) -> SampleDeleteResponse:
-    # Make sure this sample exists and is delete-able by the current user.
-    samples_res = await get_write_samples_by_ids(db, az, sample_info.ids)
-    samples = samples_res.all()
-    if len(samples) != len(sample_info.ids):
+    # Make sure these samples exist and are delete-able by the current user.
+    writable = await get_write_sample_groups(db, az, sample_info.ids)
+    if len(writable) != len(sample_info.ids):
         raise ex.NotFoundException("samples not found")
 
-    db_ids = []
-    for sample in samples:
-        db_ids.append(sample.id)
-        await db.delete(sample)
-
+    db_ids = await bulk_delete_samples(db, list(writable))
     await db.commit()
     return SampleBulkDeleteResponse(ids=db_ids)
 
@@ -160,14 +278,11 @@ async def delete_sample(
     az: AuthZSession = Depends(get_authz_session),
 ) -> SampleDeleteResponse:
     # Make sure this sample exists and is delete-able by the current user.
-    sample_db_res = await get_write_samples_by_ids(db, az, [sample_id])
-    try:
-        sample = sample_db_res.one()
-    except NoResultFound:
+    writable = await get_write_sample_groups(db, az, [sample_id])
+    if not writable:
         raise ex.NotFoundException("sample not found")
 
-    sample_db_id = sample.id
-    await db.delete(sample)
+    (sample_db_id,) = await bulk_delete_samples(db, [sample_id])
     await db.commit()
     return SampleDeleteResponse(id=sample_db_id)
 
@@ -179,48 +294,25 @@ async def update_samples(
     az: AuthZSession = Depends(get_authz_session),
     pathogen_repo_config: PathogenRepoConfig = Depends(get_pathogen_repo_config),
 ) -> SamplesResponse:
+    # Later rows for the same sample win, same as before.
+    rows = list({s.id: s for s in update_samples_request.samples}.values())
+    sample_ids_to_update = [row.id for row in rows]
 
-    # reorganize request data to make it easier to update
-    reorganized_request_data = {s.id: s for s in update_samples_request.samples}
-    sample_ids_to_update = list(reorganized_request_data.keys())
-
-    # Make sure these samples exist and are delete-able by the current user.
-    sample_db_res = await get_write_samples_by_ids(db, az, sample_ids_to_update)
-    editable_samples: MutableSequence[Sample] = sample_db_res.all()
-
-    # are there any samples that can't be updated?
-    uneditable_samples = [
-        s for s in sample_ids_to_update if s not in [i.id for i in editable_samples]
-    ]
-    if uneditable_samples:
+    # Make sure these samples exist and are editable by the current user.
+    submitting_groups = await get_write_sample_groups(db, az, sample_ids_to_update)
+    if len(submitting_groups) != len(sample_ids_to_update):
         raise ex.NotFoundException("some samples cannot be updated")
 
-    res = SamplesResponse(samples=[])
-    for sample in editable_samples:
-        update_data = reorganized_request_data[sample.id]
-        for key, value in update_data:
-            if key in ["collection_location", "sequencing_date"]:
-                continue
-            setattr(sample, key, value)
-        # Location id is handled specially
-        if update_data.collection_location:
-            loc = await db.get(Location, update_data.collection_location)
-            if not loc:
-                raise ex.BadRequestException("location is invalid")
-            sample.collection_location = loc
-
-        # Sequencing date is handled specially
-        sample.uploaded_pathogen_genome.sequencing_date = update_data.sequencing_date  # type: ignore
-        # workaround for our response serializer
-        sample.show_private_identifier = True
-
-        sample.generate_public_identifier(
-            pathogen_repo_config.prefix, already_exists=True
-        )
-        res.samples.append(SampleResponse.from_orm(sample))
+    locations = await reference_cache_for(db).get_locations(
+        db, [row.collection_location for row in rows]
+    )
+    if any(row.collection_location not in locations for row in rows):
+        raise ex.BadRequestException("location is invalid")
 
     try:
-        await db.commit()
+        await bulk_update_samples(
+            db, rows, submitting_groups, pathogen_repo_config.prefix, locations
+        )
     except IntegrityError:
         # We're relying on Posgres' group+private_id and group+public_id uniqueness
         # constraints to check whether we have duplicate identifiers.
@@ -228,6 +320,13 @@ async def update_samples(
             "All private and public identifiers must be unique"
         )
 
+    sample_db_res = await get_write_samples_by_ids(db, az, sample_ids_to_update)
+    res = SamplesResponse(samples=[])
+    for sample in sample_db_res.all():
+        # workaround for our response serializer
+        sample.show_private_identifier = True
+        res.samples.append(SampleResponse.from_orm(sample))
+    await db.commit()
     return res
 
 
@@ -247,35 +346,17 @@ async def validate_ids(
     returns a response with list of missing identifiers if any, otherwise will return an empty list
     """
 
-    sample_ids: Set[str] = {item for item in request_data.sample_ids}
-
-    # get all samples from request that the user has permission to use and scope down
-    # the search for matching ID's to groups that the user has read access to.
-    user_visible_samples_query = await samples_by_identifiers(az, pathogen, sample_ids)
-    user_visible_samples_res = await (db.execute(user_visible_samples_query))
-    user_visible_samples = user_visible_samples_res.scalars().all()
-
-    # Are there any sample ID's that don't match sample table public and private identifiers
-    missing_sample_ids, _ = get_missing_and_found_sample_ids(
-        sample_ids, user_visible_samples
-    )
-
-    # See if these missing_sample_ids match any Gisaid identifiers
-    gisaid_ids: Set[str] = await get_matching_repo_ids(
-        db, pathogen, public_repository, pathogen_repo_config, missing_sample_ids
-    )
-
-    # Do we have any samples that are not aspen private or public identifiers or gisaid identifiers?
-    missing_sample_ids -= gisaid_ids
-
-    # Do the same, but for epi isls
-    epi_isls: Set[str]
-    _, epi_isls = await get_matching_repo_ids_by_epi_isl(
-        db, pathogen, public_repository, missing_sample_ids
+    # Matches the identifiers against samples the user can see, then public
+    # repository strain names, then EPI ISLs, all in one go.
+    resolved = await resolve_sample_identifiers(
+        db,
+        az,
+        pathogen,
+        public_repository,
+        pathogen_repo_config,
+        request_data.sample_ids,
     )
-    missing_sample_ids -= epi_isls
-
-    return ValidateIDsResponse(missing_sample_ids=missing_sample_ids)
+    return ValidateIDsResponse(missing_sample_ids=resolved.missing)
 
 
 @router.post("/", response_model=SamplesResponse)
@@ -283,17 +364,12 @@ async def create_samples(
     create_samples_request: List[CreateSampleRequest],
     splitio: SplitClient = Depends(get_splitio),
     db: AsyncSession = Depends(get_db),
-    settings: APISettings = Depends(get_settings),
     user: User = Depends(get_auth_user),
     group: Group = Depends(require_group_privilege("create_sample")),
     pathogen: Pathogen = Depends(get_pathogen),
     pathogen_repo_config: PathogenRepoConfig = Depends(get_pathogen_repo_config),
 ) -> SamplesResponse:
 
-    preferred_lineage_caller = splitio.get_pathogen_treatment(
-        "PATHOGEN_lineage_caller", pathogen
-    )
-
     duplicates_in_request: Union[
         None, Mapping[str, list[str]]
     ] = check_duplicate_samples_in_request(create_samples_request)
@@ -310,101 +386,147 @@ async def create_samples(
             f"Error inserting data, private_identifiers {already_exists['existing_private_ids']} or public_identifiers: {already_exists['existing_public_ids']} already exist in our database, please remove these samples before proceeding with upload.",
         )
 
-    created_samples = []
-    for row in create_samples_request:
-        sample_input = row.sample
-        pathogen_genome_input = row.pathogen_genome
+    locations = await reference_cache_for(db).get_locations(
+        db, [row.sample.location_id for row in create_samples_request]
+    )
 
-        valid_location: Optional[Location] = await Location.get_by_id(
-            db, sample_input.location_id
-        )
-        if not valid_location:
+    for row in create_samples_request:
+        if row.sample.location_id not in locations:
             sentry_sdk.capture_message(
-                f"No valid location for id {sample_input.location_id}"
+                f"No valid location for id {row.sample.location_id}"
             )
             raise ex.BadRequestException("Invalid location id for sample")
 
-        sample_args: Mapping[str, Any] = {
-            "submitting_group": group,
-            "uploaded_by": user,
-            "sample_collected_by": group.name,
-            "sample_collector_contact_address": group.address,
-            "organism": sample_input.organism,
-            "private_identifier": sample_input.private_identifier,
-            "collection_date": sample_input.collection_date,
-            "private": sample_input.private,
-            "public_identifier": sample_input.public_identifier,
-            "authors": sample_input.authors or [group.name],
-            "collection_location": valid_location,
-            "pathogen": pathogen,
-        }
-
-        sample: Sample = Sample(**sample_args)
-        sample.generate_public_identifier(pathogen_repo_config.prefix)
-        uploaded_pathogen_genome: UploadedPathogenGenome = UploadedPathogenGenome(
-            sample=sample,
-            sequence=pathogen_genome_input.sequence,
-            sequencing_date=pathogen_genome_input.sequencing_date,
-        )
-        db.add(sample)
-        db.add(uploaded_pathogen_genome)
-        created_samples.append(sample)
-
     # Write all of our rows to the DB inside our transaction
-    await db.flush()
-
-    # Read the samples back from the DB with all fields populated.
-    new_samples_query = (
-        sa.select(Sample)  # type: ignore
-        .options(  # type: ignore
-            selectinload(Sample.uploaded_pathogen_genome),
-            selectinload(Sample.submitting_group),
-            selectinload(Sample.uploaded_by),
-            selectinload(Sample.collection_location),
-            selectinload(Sample.accessions),
-            selectinload(Sample.qc_metrics),
-            selectinload(Sample.lineages),
-        )
-        .filter(Sample.id.in_([sample.id for sample in created_samples]))
-        .execution_options(populate_existing=True)
+    created_samples = await bulk_insert_samples(
+        db,
+        create_samples_request,
+        group,
+        user,
+        pathogen.id,
+        pathogen_repo_config.prefix,
+        locations,
     )
-    res = await db.execute(new_samples_query)
 
+    # New samples have no accessions, lineages or QC metrics yet, so everything in
+    # the response is either from the request or came back from the inserts.
     pangolin_sample_ids = []  # public_identifier
     lineage_qc_sample_ids = []  # sample PK ids
     result = SamplesResponse(samples=[])
-    for sample in res.unique().scalars().all():
-        pangolin_sample_ids.append(sample.public_identifier)
-        lineage_qc_sample_ids.append(sample.id)
-        sample.gisaid = determine_gisaid_status(
-            sample,
+    for row, created in zip(create_samples_request, created_samples):
+        pangolin_sample_ids.append(created.public_identifier)
+        lineage_qc_sample_ids.append(created.id)
+        result.samples.append(
+            SampleResponse(
+                id=created.id,
+                collection_date=row.sample.collection_date,
+                collection_location=locations[row.sample.location_id],
+                gisaid={"gisaid_id": None, "status": "Not Found"},
+                pathogen=pathogen,
+                private=row.sample.private,
+                private_identifier=row.sample.private_identifier,
+                public_identifier=created.public_identifier,
+                sequencing_date=row.pathogen_genome.sequencing_date,
+                submitting_group=group,
+                uploaded_by=user,
+                upload_date=created.upload_date,
+                lineages=[],
+                qc_metrics=[],
+            )
         )
-        sample.show_private_identifier = True
-        sampleinfo = SampleResponse.from_orm(sample)
-        result.samples.append(sampleinfo)
 
+    enqueue_new_sample_jobs(
+        db, splitio, pathogen, group, pangolin_sample_ids, lineage_qc_sample_ids
+    )
     await db.commit()
 
-    # Asynchronously kick off various on-demand jobs via threads before return
+    return result
+
+
+def enqueue_new_sample_jobs(
+    db: AsyncSession,
+    splitio: SplitClient,
+    pathogen: Pathogen,
+    group: Group,
+    public_identifiers: List[str],
+    sample_ids: List[int],
+) -> None:
+    # Queue up the on-demand jobs for these samples. They're committed along with
+    # the samples, and launched (together with other recent uploads) by the job
+    # dispatcher.
+    preferred_lineage_caller = splitio.get_pathogen_treatment(
+        "PATHOGEN_lineage_caller", pathogen
+    )
 
     # pangolin should only be called for SC2 samples
     # SC2 samples still will get qc_metrics from nextclade job (LingeageQCJob)
     if preferred_lineage_caller == "Pangolin":
-        _pangolin_job = PangolinJob(settings)
-        pangolin_job = threading.Thread(
-            target=_pangolin_job.run,
-            args=(group, pangolin_sample_ids),
-        )
-        pangolin_job.start()
+        enqueue_job(db, QueuedJobType.PANGOLIN, pathogen, group, public_identifiers)
+    enqueue_job(db, QueuedJobType.LINEAGE_QC, pathogen, group, sample_ids)
 
-    _lineage_qc_job = LineageQcJob(settings)
-    lineage_qc_job = threading.Thread(
-        target=_lineage_qc_job.run,
-        args=(group, pathogen.slug, lineage_qc_sample_ids),
-    )
-    lineage_qc_job.start()
 
-    return result
+@router.post("/upload/", response_model=SampleUploadResponse)
+async def upload_samples(
+    request: Request,
+    splitio: SplitClient = Depends(get_splitio),
+    db: AsyncSession = Depends(get_db),
+    user: User = Depends(get_auth_user),
+    group: Group = Depends(require_group_privilege("create_sample")),
+    pathogen: Pathogen = Depends(get_pathogen),
+    pathogen_repo_config: PathogenRepoConfig = Depends(get_pathogen_repo_config),
+    settings: APISettings = Depends(get_settings),
+) -> SampleUploadResponse:
+    """Creates samples from a multipart upload of a `metadata` TSV followed by a
+    `sequences` FASTA file, reading both as they stream in. Nothing is created if
+    any sample has a problem; they're all listed in the error's `row_errors`."""
+    upload = SampleUpload(
+        db,
+        group,
+        user,
+        pathogen,
+        pathogen_repo_config.prefix,
+        settings.SAMPLE_UPLOAD_CHUNK_SIZE,
+    )
+    try:
+        reader = MultipartReader(
+            request.headers.get("content-type", ""), request.stream()
+        )
+        expected_parts = ["metadata", "sequences"]
+        async for part in reader.parts():
+            if not expected_parts or part.name != expected_parts[0]:
+                raise ex.BadRequestException(
+                    "Expected a metadata part followed by a sequences part"
+                )
+            if expected_parts.pop(0) == "metadata":
+                await upload.read_metadata(iter_lines(part))
+            else:
+                await upload.read_sequences(iter_lines(part))
+        if expected_parts:
+            raise ex.BadRequestException(
+                "Expected a metadata part followed by a sequences part"
+            )
+    except MultipartError as err:
+        raise ex.BadRequestException(str(err))
+    except UnicodeDecodeError:
+        raise ex.BadRequestException("Uploaded files have to be UTF-8 text")
+    await upload.finish()
+
+    if upload.errors:
+        await db.rollback()
+        raise ex.BadRequestException(
+            f"{len(upload.errors)} samples could not be uploaded",
+            extra={"row_errors": [error.dict() for error in upload.errors]},
+        )
+    enqueue_new_sample_jobs(
+        db,
+        splitio,
+        pathogen,
+        group,
+        [sample.public_identifier for sample in upload.created],
+        [sample.id for sample in upload.created],
+    )
+    await db.commit()
+    return SampleUploadResponse(samples=upload.created)
 
 
 def get_submission_template_filename(public_repository_name):
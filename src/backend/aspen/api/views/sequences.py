@@ -1,5 +1,6 @@
 import os
 from datetime import datetime
+from typing import List
 from uuid import uuid4
 
 import boto3
@@ -21,9 +22,13 @@ from aspen.api.settings import APISettings
 from aspen.api.utils.fasta_streamer import FastaStreamer
 from aspen.api.utils.pathogens import get_pathogen_repo_config_for_pathogen
 from aspen.database.models import Pathogen
+from aspen.util.blocking import BOTO_TIMEOUTS, run_blocking
 
 router = APIRouter()
 
+# How much FASTA we collect before handing it to the S3 writer.
+S3_WRITE_CHUNK_SIZE = 1024 * 1024
+
 
 def get_fasta_filename(public_repository_name, group_name):
     # get filename depending on public_repository, else default to generic filename with group name
@@ -95,22 +100,37 @@ async def getfastaurl(
     s3_resource = boto3.resource(
         "s3",
         endpoint_url=os.getenv("BOTO_ENDPOINT_URL") or None,
-        config=boto3.session.Config(signature_version="s3v4"),
+        config=boto3.session.Config(signature_version="s3v4", **BOTO_TIMEOUTS),
     )
     s3_client = s3_resource.meta.client
     uuid = uuid4()
     s3_key = f"fasta-url-files/{ac.group.name}/{uuid}.fasta"  # type: ignore
-    s3_write_fh = smart_open.open(
-        f"s3://{s3_bucket}/{s3_key}", "w", transport_params=dict(client=s3_client)
+    # Opening the file starts a multipart upload, and writes upload a part whenever
+    # enough data is buffered, so all of them happen off the event loop.
+    s3_write_fh = await run_blocking(
+        "s3",
+        smart_open.open,
+        f"s3://{s3_bucket}/{s3_key}",
+        "w",
+        transport_params=dict(client=s3_client),
     )
     # Write selected samples to s3
     streamer = FastaStreamer(
         db, az, ac, pathogen, set(sample_ids), downstream_consumer=downstream_consumer
     )
+    chunk: List[str] = []
+    chunk_size = 0
     async for line in streamer.stream():
-        s3_write_fh.write(line)
-    s3_write_fh.close()
-
+        chunk.append(line)
+        chunk_size += len(line)
+        if chunk_size >= S3_WRITE_CHUNK_SIZE:
+            await run_blocking("s3", s3_write_fh.write, "".join(chunk))
+            chunk, chunk_size = [], 0
+    if chunk:
+        await run_blocking("s3", s3_write_fh.write, "".join(chunk))
+    await run_blocking("s3", s3_write_fh.close)
+
+    # Presigning is computed locally, it doesn't call S3.
     presigned_url = s3_client.generate_presigned_url(
         "get_object",
         Params={"Bucket": s3_bucket, "Key": s3_key},
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.api.authn import get_auth_context, get_user_roles, load_auth_user
+from aspen.auth.auth_cache import auth_cache_for, invalidate_auth_cache
+from aspen.database.connection import SqlAlchemyInterface
+from aspen.test_infra.models.usergroup import (
+    group_factory,
+    grouprole_factory,
+    userrole_factory,
+)
+
+# All test coroutines will be treated as marked.
+pytestmark = pytest.mark.asyncio
+
+
+async def test_auth_cache_hits_and_invalidation(
+    async_session: AsyncSession,
+    async_sqlalchemy_interface: SqlAlchemyInterface,
+) -> None:
+    group = group_factory()
+    owner_group = group_factory(name="owner group")
+    user = await userrole_factory(async_session, group, roles=["admin"])
+    async_session.add_all(
+        [group, owner_group]
+        + await grouprole_factory(async_session, owner_group, group)
+    )
+    await async_session.commit()
+
+    auth_cache = auth_cache_for(async_session)
+    request_session = async_sqlalchemy_interface.make_session()
+    auth_user = await load_auth_user(request_session, auth_cache, user.auth0_user_id)
+    assert auth_user is not None
+    assert auth_cache.stats()["misses"] == 1
+
+    # A second request for the same user is served from the cache, attached to its
+    # own session, with all of its roles available.
+    second_session = async_sqlalchemy_interface.make_session()
+    cached_user = await load_auth_user(second_session, auth_cache, user.auth0_user_id)
+    assert cached_user is not None
+    assert auth_cache.stats()["hits"] == 1
+    assert cached_user in second_session
+    user_roles = await get_user_roles(group.id, cached_user, second_session)
+    assert [row.role.name for row in user_roles] == ["admin"]
+
+    # Group roles are cached too.
+    ac = await get_auth_context(group.id, cached_user, second_session, user_roles)
+    ac = await get_auth_context(group.id, cached_user, second_session, user_roles)
+    assert ac.group_roles == [{"group_id": owner_group.id, "role": "viewer"}]
+    assert auth_cache.stats()["hits"] == 2
+
+    await invalidate_auth_cache(second_session, user.auth0_user_id)
+    await load_auth_user(second_session, auth_cache, user.auth0_user_id)
+    assert auth_cache.stats()["misses"] == 3
+
+    await request_session.close()  # type: ignore
+    await second_session.close()  # type: ignore
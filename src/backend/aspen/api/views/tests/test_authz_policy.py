@@ -6,8 +6,13 @@ import sqlalchemy as sa
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from aspen.api.authn import get_auth_context, get_user_roles, setup_userinfo
-from aspen.api.authz import AuthZSession, get_authz_session
+from aspen.api.authn import (
+    AuthContext,
+    get_auth_context,
+    get_user_roles,
+    setup_userinfo,
+)
+from aspen.api.authz import AuthZSession, get_authz_session, SAMPLE_PERMISSIONS
 from aspen.database.models import Group, GroupRole, PhyloRun, PhyloTree, Sample, User
 from aspen.database.models.base import idbase
 from aspen.test_infra.models.location import location_factory
@@ -336,3 +341,72 @@ async def test_groups_write(
     ]
     matrix = [[azs[i], results[i]] for i in range(len(results))]
     await check_matrix(Group, "write", async_session, matrix)
+
+
+async def test_sample_native_filters_match_oso(
+    async_session: AsyncSession,
+    groups: List[Group],
+    users: List[User],
+    appdata: List[PhyloTree],
+    azs: List[AuthZSession],
+):
+    # Every user in our graph, plus some role combinations it doesn't have.
+    contexts = [az.auth_context for az in azs] + [
+        AuthContext(
+            users[0],
+            groups[0],
+            ["viewer"],
+            [
+                {"group_id": groups[2].id, "role": "member"},
+                {"group_id": groups[3].id, "role": "viewer"},
+            ],
+        ),
+        AuthContext(
+            users[1],
+            groups[1],
+            ["admin", "viewer"],
+            [
+                {"group_id": groups[1].id, "role": "viewer"},
+                {"group_id": groups[2].id, "role": "viewer"},
+                {"group_id": groups[2].id, "role": "admin"},
+            ],
+        ),
+        AuthContext(users[2], groups[2], [], []),
+    ]
+    for ac in contexts:
+        az = AuthZSession(async_session, ac)
+        for permission in SAMPLE_PERMISSIONS:
+            native_query = await az.authorized_query(permission, Sample)
+            oso_query = await az.oso_authorized_query(permission, Sample)
+            assert native_query is not None
+            native_ids = (await async_session.execute(native_query)).scalars().all()
+            oso_ids = (await async_session.execute(oso_query)).scalars().all()
+            assert sorted(item.id for item in native_ids) == sorted(
+                {item.id for item in oso_ids}
+            ), f"{permission} for {ac.user_roles} / {ac.group_roles}"
+
+            # Callers narrow these queries down further, and both have to agree on
+            # that too.
+            native_private = native_query.where(Sample.private.is_(True))  # type: ignore
+            oso_private = oso_query.where(Sample.private.is_(True))  # type: ignore
+            assert {
+                item.id
+                for item in (await async_session.execute(native_private)).scalars()
+            } == {
+                item.id for item in (await async_session.execute(oso_private)).scalars()
+            }
+
+
+async def test_native_filters_only_cover_samples(
+    async_session: AsyncSession,
+    azs: List[AuthZSession],
+):
+    az = azs[1]
+    assert az.native_query("read", Sample) is not None
+    assert az.native_query("read", PhyloRun) is None
+    assert az.native_query("create_sample", Group) is None
+    # The caller's groups are worked out once per request.
+    az.native_query("write", Sample)
+    assert az.role_group_ids(SAMPLE_PERMISSIONS["write"][0]) is az.role_group_ids(
+        SAMPLE_PERMISSIONS["read"][0]
+    )
@@ -3,11 +3,19 @@ from typing import Optional
 
 import pytest
 import sqlalchemy as sa
+from fastapi import FastAPI
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
-from aspen.database.models import PathogenGenome, Sample, UploadedPathogenGenome
+from aspen.database.models import (
+    PathogenGenome,
+    QueuedJob,
+    QueuedJobStatus,
+    QueuedJobType,
+    Sample,
+    UploadedPathogenGenome,
+)
 from aspen.test_infra.models.location import location_factory
 from aspen.test_infra.models.pathogen import pathogen_factory
 from aspen.test_infra.models.pathogen_repo_config import (
@@ -93,6 +101,22 @@ async def test_samples_create_different_pathogens(
         for i in samples:
             assert i.pathogen.slug == pathogen.slug
 
+        # Lineage QC for the new samples is queued along with them.
+        queued = (
+            (
+                await async_session.execute(
+                    sa.select(QueuedJob).filter(  # type: ignore
+                        QueuedJob.pathogen_id == pathogen.id,
+                        QueuedJob.job_type == QueuedJobType.LINEAGE_QC,
+                    )
+                )
+            )
+            .scalars()
+            .one()
+        )
+        assert queued.status == QueuedJobStatus.PENDING
+        assert sorted(queued.sample_ids) == sorted(sample.id for sample in samples)
+
 
 async def test_samples_create_pass_no_public_id_country_with_spaces(
     async_session: AsyncSession,
@@ -270,6 +294,256 @@ async def test_samples_create_view_pass_no_public_id(
     assert sample_1.uploaded_pathogen_genome.num_missing_alleles == 1
 
 
+async def test_samples_create_constant_round_trips(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    split_client: SplitClient,
+    query_budget,
+):
+    group = group_factory()
+    user = await userrole_factory(async_session, group)
+    pathogen, default_repo_config = setup_gisaid_and_genbank_repo_configs(
+        async_session, split_client=split_client
+    )
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    async_session.add_all([group, pathogen, location])
+    await async_session.commit()
+    test_date = datetime.datetime.now()
+
+    def upload(first: int, count: int):
+        data = [
+            {
+                "sample": {
+                    "private_identifier": f"private_{i}",
+                    # Every other sample brings its own public identifier.
+                    "public_identifier": f"public_{i}" if i % 2 else None,
+                    "collection_date": format_date(test_date),
+                    "location_id": location.id,
+                    "private": True,
+                },
+                "pathogen_genome": {
+                    "sequence": VALID_SEQUENCE + "N" * i,
+                    "sequencing_date": format_date(test_date),
+                },
+            }
+            for i in range(first, first + count)
+        ]
+        return http_client.post(
+            f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/samples/",
+            json=data,
+            headers={"user_id": user.auth0_user_id},
+        )
+
+    with query_budget(100) as small:
+        res = await upload(0, 2)
+    assert res.status_code == 200
+    # A bigger upload doesn't take any more statements.
+    with query_budget(small.statements, max_repeats=2):
+        res = await upload(2, 40)
+    assert res.status_code == 200
+    created = res.json()["samples"]
+    assert [sample["private_identifier"] for sample in created] == [
+        f"private_{i}" for i in range(2, 42)
+    ]
+
+    await async_session.close()
+    async_session.begin()
+    samples = (
+        (
+            await async_session.execute(
+                sa.select(Sample).options(joinedload(Sample.uploaded_pathogen_genome))  # type: ignore
+            )
+        )
+        .unique()
+        .scalars()
+        .all()
+    )
+    assert len(samples) == 42
+    for sample in samples:
+        i = int(sample.private_identifier.split("_")[1])
+        if i % 2:
+            assert sample.public_identifier == f"public_{i}"
+        else:
+            assert sample.public_identifier == (
+                f"{default_repo_config.prefix}/USA/groupname-{sample.id}"
+                f"/{test_date.year}"
+            )
+        assert sample.uploaded_pathogen_genome.num_missing_alleles == i
+    by_id = {sample.id: sample for sample in samples}
+    for response in created:
+        sample = by_id[response["id"]]
+        assert response["public_identifier"] == sample.public_identifier
+        assert response["upload_date"] is not None
+        assert response["gisaid"] == {"gisaid_id": None, "status": "Not Found"}
+
+
+def wrap_fasta(identifier: str, sequence: str, width: int = 60) -> str:
+    lines = [sequence[i : i + width] for i in range(0, len(sequence), width)]
+    return "\n".join([f">{identifier}", *lines]) + "\n"
+
+
+async def test_samples_upload_streamed(
+    async_session: AsyncSession,
+    api: FastAPI,
+    http_client: AsyncClient,
+    split_client: SplitClient,
+):
+    group = group_factory()
+    user = await userrole_factory(async_session, group)
+    pathogen, default_repo_config = setup_gisaid_and_genbank_repo_configs(
+        async_session, split_client=split_client
+    )
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    async_session.add_all([group, pathogen, location])
+    await async_session.commit()
+    # Make sure samples get inserted across more than one chunk.
+    api.state.aspen_settings.SAMPLE_UPLOAD_CHUNK_SIZE = 2
+
+    metadata = "private_identifier\tpublic_identifier\tcollection_date\tlocation_id\tprivate\tsequencing_date\n"
+    fasta = "; a comment\n"
+    for i in range(5):
+        public_identifier = f"public_{i}" if i == 0 else ""
+        metadata += f"private_{i}\t{public_identifier}\t2022-01-0{i + 1}\t{location.id}\ttrue\t\n"
+        fasta += wrap_fasta(f"private_{i}", VALID_SEQUENCE + "N" * i)
+    res = await http_client.post(
+        f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/samples/upload/",
+        files={
+            "metadata": ("metadata.tsv", metadata.encode(), "text/plain"),
+            "sequences": ("sequences.fasta", fasta.encode(), "text/plain"),
+        },
+        headers={"user_id": user.auth0_user_id},
+    )
+    assert res.status_code == 200, res.text
+    created = res.json()["samples"]
+    assert [sample["private_identifier"] for sample in created] == [
+        f"private_{i}" for i in range(5)
+    ]
+    assert created[0]["public_identifier"] == "public_0"
+    assert created[1]["public_identifier"] == (
+        f"{default_repo_config.prefix}/USA/groupname-{created[1]['id']}"
+        f"/{datetime.date.today().year}"
+    )
+
+    await async_session.close()
+    async_session.begin()
+    samples = (
+        (
+            await async_session.execute(
+                sa.select(Sample)  # type: ignore
+                .options(
+                    joinedload(Sample.uploaded_pathogen_genome).undefer(
+                        PathogenGenome.sequence
+                    )
+                )
+                .order_by(Sample.id)
+            )
+        )
+        .unique()
+        .scalars()
+        .all()
+    )
+    assert [sample.collection_date for sample in samples] == [
+        datetime.date(2022, 1, i + 1) for i in range(5)
+    ]
+    for i, sample in enumerate(samples):
+        genome = sample.uploaded_pathogen_genome
+        assert genome.sequence == VALID_SEQUENCE + "N" * i
+        assert genome.num_missing_alleles == i
+        assert genome.sequencing_date is None
+    queued = (
+        (
+            await async_session.execute(
+                sa.select(QueuedJob).filter(  # type: ignore
+                    QueuedJob.job_type == QueuedJobType.LINEAGE_QC
+                )
+            )
+        )
+        .scalars()
+        .one()
+    )
+    assert sorted(queued.sample_ids) == [sample.id for sample in samples]
+
+
+async def test_samples_upload_reports_row_errors(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    split_client: SplitClient,
+):
+    group = group_factory()
+    user = await userrole_factory(async_session, group)
+    pathogen, _ = setup_gisaid_and_genbank_repo_configs(
+        async_session, split_client=split_client
+    )
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    async_session.add_all([group, pathogen, location])
+    await async_session.commit()
+
+    metadata = "\n".join(
+        [
+            "private_identifier\tcollection_date\tlocation_id\tprivate",
+            f"good\t2022-01-01\t{location.id}\ttrue",
+            f"bad_chars\t2022-01-01\t{location.id}\ttrue",
+            f"too_short\t2022-01-01\t{location.id}\ttrue",
+            f"bad_date\tyesterday\t{location.id}\ttrue",
+            f"bad_location\t2022-01-01\t{location.id + 1000}\ttrue",
+            f"no_sequence\t2022-01-01\t{location.id}\ttrue",
+        ]
+    )
+    fasta = "".join(
+        [
+            wrap_fasta("good", VALID_SEQUENCE),
+            wrap_fasta("bad_chars", VALID_SEQUENCE[:500] + "X" + VALID_SEQUENCE),
+            wrap_fasta("too_short", VALID_SEQUENCE[:999]),
+            wrap_fasta("bad_date", VALID_SEQUENCE),
+            wrap_fasta("bad_location", VALID_SEQUENCE),
+            wrap_fasta("no_metadata", VALID_SEQUENCE),
+        ]
+    )
+    res = await http_client.post(
+        f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/samples/upload/",
+        files={
+            "metadata": ("metadata.tsv", metadata.encode(), "text/plain"),
+            "sequences": ("sequences.fasta", fasta.encode(), "text/plain"),
+        },
+        headers={"user_id": user.auth0_user_id},
+    )
+    assert res.status_code == 400
+    errors = {error["private_identifier"]: error for error in res.json()["row_errors"]}
+    assert set(errors) == {
+        "bad_chars",
+        "too_short",
+        "bad_date",
+        "bad_location",
+        "no_sequence",
+        "no_metadata",
+    }
+    assert errors["bad_date"]["line"] == 5
+    assert errors["bad_date"]["message"].startswith("collection_date")
+    assert errors["no_metadata"]["line"] is None
+
+    # Nothing is created, not even the valid sample.
+    await async_session.close()
+    async_session.begin()
+    assert (await async_session.execute(sa.select(Sample))).scalars().all() == []  # type: ignore
+
+    # The parts have to come in order.
+    res = await http_client.post(
+        f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/samples/upload/",
+        files={
+            "sequences": ("sequences.fasta", fasta.encode(), "text/plain"),
+            "metadata": ("metadata.tsv", metadata.encode(), "text/plain"),
+        },
+        headers={"user_id": user.auth0_user_id},
+    )
+    assert res.status_code == 400
+
+
 async def test_authz_failure(
     async_session: AsyncSession,
     http_client: AsyncClient,
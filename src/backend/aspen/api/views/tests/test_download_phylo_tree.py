@@ -9,6 +9,7 @@ from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from aspen.api.utils.pathogens import get_pathogen_repo_config_for_pathogen
+from aspen.api.utils.phylo_cache import phylo_tree_cache, ProcessedTreeCache
 from aspen.api.views.tests.data.phylo_tree_data import TEST_TREE
 from aspen.api.views.tests.test_list_phylo_runs import make_all_test_data
 from aspen.api.views.tests.test_update_phylo_run_and_tree import make_shared_test_data
@@ -151,3 +152,61 @@ async def test_phylo_tree_no_can_see(
         headers=auth_headers,
     )
     assert result.json() == expected_response
+
+
+async def test_phylo_tree_download_is_cached(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    mock_s3_resource: boto3.resource,
+    split_client: SplitClient,
+):
+    user, group, samples, phylo_run, phylo_tree, pathogen = await make_shared_test_data(
+        async_session
+    )
+    try:
+        mock_s3_resource.meta.client.head_bucket(Bucket=phylo_tree.s3_bucket)
+    except ClientError:
+        mock_s3_resource.create_bucket(Bucket=phylo_tree.s3_bucket)
+    matching_tree_json: Dict = align_json_with_model(deepcopy(TEST_TREE), phylo_tree)
+    mock_s3_resource.Bucket(phylo_tree.s3_bucket).Object(phylo_tree.s3_key).put(
+        Body=json.dumps(matching_tree_json)
+    )
+
+    auth_headers = {"name": user.name, "user_id": user.auth0_user_id}
+    split_client.get_pathogen_treatment.return_value = "GISAID"
+    url = f"/v2/orgs/{group.id}/pathogens/{phylo_tree.pathogen.slug}/phylo_trees/{phylo_tree.entity_id}/download"
+    first = await http_client.get(url, headers=auth_headers)
+    assert phylo_tree_cache.stats()["misses"] == 1
+    second = await http_client.get(url, headers=auth_headers)
+    assert phylo_tree_cache.stats()["memory_hits"] == 1
+    assert second.content == first.content
+
+    # Renaming a sample changes the requester's identifier map, so the cached tree
+    # for the old names isn't used.
+    sample = samples[0]
+    old_name = sample.private_identifier
+    sample.private_identifier = "renamed-sample"
+    await async_session.commit()
+    third = await http_client.get(url, headers=auth_headers)
+    assert phylo_tree_cache.stats()["misses"] == 2
+    assert "renamed-sample" in third.text
+    assert old_name not in third.text
+
+
+async def test_processed_tree_cache_tiers(tmp_path):
+    cache = ProcessedTreeCache(max_bytes=10, disk_dir=str(tmp_path))
+    cache.put("a", b"12345")
+    cache.put("b", b"67890")
+    cache.put("c", b"abcde")
+    # "a" was evicted from memory, but is still on disk.
+    assert cache.get("c") == b"abcde"
+    assert cache.get("a") == b"12345"
+    assert cache.stats()["memory_hits"] == 1
+    assert cache.stats()["disk_hits"] == 1
+
+    memory_only = ProcessedTreeCache(max_bytes=10)
+    memory_only.put("a", b"12345")
+    memory_only.put("b", b"67890")
+    memory_only.put("c", b"abcde")
+    assert memory_only.get("a") is None
+    assert memory_only.stats()["misses"] == 1
@@ -8,3 +8,29 @@ async def test_healthcheck(http_client: AsyncClient) -> None:
     response = await http_client.get("/v2/health", follow_redirects=True)
     assert response.status_code == 200
     assert response.json() == {"healthy": True}
+
+
+async def test_db_pool_status(http_client: AsyncClient) -> None:
+    response = await http_client.get("/v2/health/db_pool")
+    assert response.status_code == 200
+    pool_status = response.json()
+    assert pool_status["checked_out"] == 0
+    assert pool_status["pool_size"] >= 1
+    assert "max_wait_seconds" in pool_status
+
+
+async def test_metrics(http_client: AsyncClient) -> None:
+    await http_client.get("/v2/health/db_pool")
+    response = await http_client.get("/v2/health/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert "# TYPE aspen_http_requests_total counter" in lines
+    assert any(
+        line.startswith(
+            'aspen_http_requests_total{route="get_db_pool_status",method="GET",status="200"}'
+        )
+        for line in lines
+    )
+    assert "# TYPE aspen_db_pool_checkout_wait_seconds histogram" in lines
+    assert "# TYPE aspen_http_requests_in_progress gauge" in lines
@@ -0,0 +1,150 @@
+import datetime
+from types import SimpleNamespace
+from typing import Any, List, Optional
+
+import pytest
+import sqlalchemy as sa
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.api.utils.job_queue import enqueue_job, JobDispatcher
+from aspen.database.connection import SqlAlchemyInterface
+from aspen.database.models import Group, QueuedJob, QueuedJobStatus, QueuedJobType
+from aspen.test_infra.models.pathogen import pathogen_factory
+from aspen.test_infra.models.usergroup import group_factory
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_settings(**overrides):
+    settings = {
+        "JOB_QUEUE_COALESCE_SECONDS": 30,
+        "JOB_QUEUE_MAX_ATTEMPTS": 3,
+        "JOB_QUEUE_BACKOFF_SECONDS": 60,
+    }
+    settings.update(overrides)
+    return SimpleNamespace(**settings)
+
+
+class FakeLauncher:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls: List[Any] = []
+
+    async def __call__(
+        self,
+        job_type: QueuedJobType,
+        group: Optional[Group],
+        pathogen_slug: str,
+        sample_ids: List[Any],
+    ) -> str:
+        self.calls.append((job_type, group, pathogen_slug, sample_ids))
+        if self.fail:
+            raise RuntimeError("step functions is down")
+        return f"arn:execution:{len(self.calls)}"
+
+
+async def queue_uploads(async_session: AsyncSession, age: datetime.timedelta):
+    """Three uploads from two groups, all `age` old."""
+    group1 = group_factory(name="group1", prefix="G1")
+    group2 = group_factory(name="group2", prefix="G2")
+    sc2 = pathogen_factory("SC2", "SARS-Cov-2")
+    jobs = [
+        enqueue_job(async_session, QueuedJobType.LINEAGE_QC, sc2, group1, [1, 2]),
+        enqueue_job(async_session, QueuedJobType.LINEAGE_QC, sc2, group2, [3]),
+        enqueue_job(async_session, QueuedJobType.LINEAGE_QC, sc2, group1, [2, 4]),
+    ]
+    for job in jobs:
+        job.created_at = sa.func.now() - age
+    await async_session.commit()
+    return sc2, jobs
+
+
+async def get_jobs(async_session: AsyncSession) -> List[QueuedJob]:
+    await async_session.close()
+    return (
+        (await async_session.execute(sa.select(QueuedJob).order_by(QueuedJob.id)))  # type: ignore
+        .scalars()
+        .all()
+    )
+
+
+async def test_dispatch_coalesces_uploads(
+    async_session: AsyncSession,
+    async_sqlalchemy_interface: SqlAlchemyInterface,
+):
+    sc2, _ = await queue_uploads(async_session, datetime.timedelta(minutes=5))
+    launcher = FakeLauncher()
+    dispatcher = JobDispatcher(async_sqlalchemy_interface, make_settings(), launcher)  # type: ignore
+
+    assert await dispatcher.dispatch_once() == 1
+    # One execution, for every sample, without a group since two were involved.
+    assert launcher.calls == [(QueuedJobType.LINEAGE_QC, None, "SC2", [1, 2, 3, 4])]
+    for job in await get_jobs(async_session):
+        assert job.status == QueuedJobStatus.DISPATCHED
+        assert job.execution_arn == "arn:execution:1"
+        assert job.dispatched_at is not None
+
+    # Nothing left to do.
+    assert await dispatcher.dispatch_once() == 0
+
+
+async def test_dispatch_waits_for_coalesce_window(
+    async_session: AsyncSession,
+    async_sqlalchemy_interface: SqlAlchemyInterface,
+):
+    await queue_uploads(async_session, datetime.timedelta(seconds=0))
+    launcher = FakeLauncher()
+    dispatcher = JobDispatcher(async_sqlalchemy_interface, make_settings(), launcher)  # type: ignore
+
+    assert await dispatcher.dispatch_once() == 0
+    assert launcher.calls == []
+    for job in await get_jobs(async_session):
+        assert job.status == QueuedJobStatus.PENDING
+
+
+async def test_dispatch_retries_with_backoff(
+    async_session: AsyncSession,
+    async_sqlalchemy_interface: SqlAlchemyInterface,
+):
+    await queue_uploads(async_session, datetime.timedelta(minutes=5))
+    launcher = FakeLauncher(fail=True)
+    dispatcher = JobDispatcher(
+        async_sqlalchemy_interface, make_settings(JOB_QUEUE_MAX_ATTEMPTS=2), launcher  # type: ignore
+    )
+
+    assert await dispatcher.dispatch_once() == 0
+    jobs = await get_jobs(async_session)
+    for job in jobs:
+        assert job.status == QueuedJobStatus.PENDING
+        assert job.attempts == 1
+        assert job.last_error == "step functions is down"
+        # Created 5 minutes ago, and retried a minute from now.
+        assert job.next_attempt_at - job.created_at > datetime.timedelta(minutes=5)
+
+    # Still backing off.
+    assert await dispatcher.dispatch_once() == 0
+    assert len(launcher.calls) == 1
+
+    # Once the backoff is over we try again, and give up after the last attempt.
+    await async_session.execute(
+        sa.update(QueuedJob).values(next_attempt_at=sa.func.now())  # type: ignore
+    )
+    await async_session.commit()
+    assert await dispatcher.dispatch_once() == 0
+    assert len(launcher.calls) == 2
+    for job in await get_jobs(async_session):
+        assert job.status == QueuedJobStatus.FAILED
+        assert job.attempts == 2
+
+
+async def test_job_queue_status(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+):
+    await queue_uploads(async_session, datetime.timedelta(minutes=5))
+    res = await http_client.get("/v2/health/job_queue")
+    assert res.status_code == 200
+    status = res.json()
+    assert status["jobs"] == {"LINEAGE_QC": {"PENDING": 3}}
+    assert status["oldest_pending_seconds"] >= 300
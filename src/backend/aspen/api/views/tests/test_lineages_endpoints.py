@@ -57,3 +57,36 @@ async def test_pango_lineages_list(
     expected = ["Delta", "F*", "F.1", "G.1*", "G.1.1", "H.2.3*", "H.2.3.4", "Omicron"]
 
     assert results == expected
+
+
+async def test_pango_lineages_etag(
+    async_session,
+    http_client,
+):
+    group: Group = group_factory()
+    user: User = await userrole_factory(async_session, group)
+    make_all_test_data(async_session)
+
+    async_session.add(group)
+    await async_session.commit()
+
+    auth_headers = {"user_id": str(user.auth0_user_id)}
+    res = await http_client.get("/v2/lineages/pango", headers=auth_headers)
+    assert res.status_code == 200
+    etag = res.headers["ETag"]
+    assert res.headers["Cache-Control"].startswith("private, max-age=")
+
+    # Unchanged data isn't sent again.
+    res = await http_client.get(
+        "/v2/lineages/pango", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert res.status_code == 304
+    assert res.content == b""
+    assert res.headers["ETag"] == etag
+
+    res = await http_client.get(
+        "/v2/lineages/pango",
+        headers={**auth_headers, "If-None-Match": '"something-else"'},
+    )
+    assert res.status_code == 200
+    assert "F.1" in res.json()["lineages"]
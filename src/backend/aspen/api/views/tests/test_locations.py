@@ -56,6 +56,50 @@ async def test_list_locations(
         ] in locations
 
 
+async def test_list_locations_compressed_and_revalidated(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+):
+    for i in range(50):
+        async_session.add(
+            location_factory("North America", "USA", "California", f"City {i}")
+        )
+    user = user_factory(None)
+    async_session.add(user)
+    await async_session.commit()
+
+    auth_headers = {"user_id": user.auth0_user_id}
+    res = await http_client.get(
+        "/v2/locations/", headers={**auth_headers, "Accept-Encoding": "gzip"}
+    )
+    assert res.status_code == 200
+    assert res.headers["Content-Encoding"] == "gzip"
+    assert res.headers["Vary"] == "Accept-Encoding"
+    assert len(res.json()["locations"]) == 50
+    gzip_etag = res.headers["ETag"]
+
+    res = await http_client.get(
+        "/v2/locations/", headers={**auth_headers, "Accept-Encoding": "identity"}
+    )
+    assert "Content-Encoding" not in res.headers
+    assert len(res.json()["locations"]) == 50
+    assert res.headers["ETag"] != gzip_etag
+
+    # Either representation's ETag revalidates the payload.
+    res = await http_client.get(
+        "/v2/locations/", headers={**auth_headers, "If-None-Match": gzip_etag}
+    )
+    assert res.status_code == 304
+
+    # Each depth is its own payload.
+    res = await http_client.get(
+        "/v2/locations/?max_location_depth=division",
+        headers={**auth_headers, "If-None-Match": gzip_etag},
+    )
+    assert res.status_code == 200
+    assert res.json()["locations"] == []
+
+
 async def test_list_locations_with_depth(
     async_session: AsyncSession,
     http_client: AsyncClient,
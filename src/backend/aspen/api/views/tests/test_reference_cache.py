@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.database.connection import SqlAlchemyInterface
+from aspen.database.reference_cache import (
+    invalidate_reference_cache,
+    reference_cache_for,
+)
+from aspen.test_infra.models.location import location_factory
+from aspen.test_infra.models.pathogen import random_pathogen_factory
+from aspen.test_infra.models.pathogen_repo_config import (
+    setup_gisaid_and_genbank_repo_configs,
+)
+
+# All test coroutines will be treated as marked.
+pytestmark = pytest.mark.asyncio
+
+
+async def test_reference_cache_lookups_without_queries(
+    async_session: AsyncSession,
+    async_sqlalchemy_interface: SqlAlchemyInterface,
+    query_budget,
+) -> None:
+    pathogen, repo_config = setup_gisaid_and_genbank_repo_configs(async_session)
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    async_session.add(location)
+    await async_session.commit()
+
+    engine = async_sqlalchemy_interface.engine
+    cache = reference_cache_for(engine)
+    await cache.load(engine)
+    assert cache.stats()["locations"] == 1
+
+    request_session = async_sqlalchemy_interface.make_session()
+    with query_budget(0):
+        cached_pathogen = await cache.get_pathogen(request_session, pathogen.slug)
+        repo = await cache.get_public_repository(request_session, "GenBank")
+        config = await cache.get_pathogen_repo_config(
+            request_session, cached_pathogen, repo_config.public_repository.name
+        )
+        locations = await cache.get_locations(request_session, [location.id])
+    assert cached_pathogen in request_session
+    assert repo is not None and repo.name == "GenBank"
+    assert config is not None and config.prefix == repo_config.prefix
+    # Merging the config reuses the session's copy of its pathogen.
+    assert config.pathogen is cached_pathogen
+    assert locations[location.id].location == "Santa Barbara County"
+    assert locations[location.id] in request_session
+
+    # Unknown rows fall back to the database, and aren't made up.
+    assert await cache.get_pathogen(request_session, "nope") is None
+    assert await cache.get_location(request_session, location.id + 100) is None
+    await request_session.close()  # type: ignore
+
+
+async def test_reference_cache_refresh_and_invalidation(
+    async_session: AsyncSession,
+    async_sqlalchemy_interface: SqlAlchemyInterface,
+) -> None:
+    setup_gisaid_and_genbank_repo_configs(async_session)
+    await async_session.commit()
+
+    engine = async_sqlalchemy_interface.engine
+    cache = reference_cache_for(engine)
+    await cache.load(engine)
+    assert await cache.refresh_if_changed(engine) is False
+    assert cache.stats()["reloads"] == 1
+
+    # New rows change the signature, so the version check reloads.
+    new_pathogen = random_pathogen_factory()
+    async_session.add(new_pathogen)
+    await async_session.commit()
+    assert await cache.refresh_if_changed(engine) is True
+    assert cache.stats()["pathogens"] == 2
+
+    # A location added since the last load is fetched once, then served from cache.
+    location = location_factory("Europe", "France")
+    async_session.add(location)
+    await async_session.commit()
+    request_session = async_sqlalchemy_interface.make_session()
+    assert await cache.get_location(request_session, location.id) is not None
+    misses = cache.stats()["misses"]
+    assert await cache.get_location(request_session, location.id) is not None
+    assert cache.stats()["misses"] == misses
+
+    # Invalidations reload right away, without waiting for the version check.
+    location.latitude = 46.2
+    await invalidate_reference_cache(async_session)
+    await async_session.commit()
+    assert cache.stale
+    await request_session.close()  # type: ignore
+    request_session = async_sqlalchemy_interface.make_session()
+    reloaded = await cache.get_location(request_session, location.id)
+    assert cache.stats()["reloads"] == 3
+    assert not cache.stale
+    assert reloaded is not None and reloaded.latitude == 46.2
+    await request_session.close()  # type: ignore
@@ -1,9 +1,10 @@
 import datetime
 import json
-from typing import Any, List, Optional, Tuple
+from typing import Any, List, Mapping, Optional, Tuple
 
 import pytest
 import sqlalchemy as sa
+from fastapi import FastAPI
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
@@ -12,11 +13,14 @@ from sqlalchemy.orm.exc import NoResultFound
 from aspen.api.schemas.base import convert_datetime_to_iso_8601
 from aspen.database.models import (
     Accession,
+    Entity,
     Group,
+    LineageType,
     Location,
     Pathogen,
     Sample,
     SampleLineage,
+    SampleMutation,
     SampleQCMetric,
     UploadedPathogenGenome,
     User,
@@ -716,6 +720,208 @@ async def test_samples_view_no_pangolin(
     assert response == expected
 
 
+async def make_paginated_samples(
+    async_session: AsyncSession,
+) -> Tuple[Group, User, Pathogen, List[Sample]]:
+    group = group_factory()
+    user = await userrole_factory(async_session, group)
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    sc2 = pathogen_factory("SC2", "SARS-Cov-2")
+    samples: List[Sample] = []
+    for i in range(5):
+        sample = sample_factory(
+            group,
+            user,
+            location,
+            private_identifier=f"private{i}",
+            public_identifier=f"public{i}",
+            # Two samples per day, so the (collection_date, id) order matters.
+            collection_date=datetime.date(2022, 1, 1 + i // 2),
+            pathogen=sc2,
+        )
+        uploaded_pathogen_genome_factory(sample)
+        sample_qc_metrics_factory(sample, qc_status="good" if i % 2 else "bad")
+        sample_lineage_factory(sample, lineage=f"B.1.{i}")
+        samples.append(sample)
+    async_session.add(group)
+    await async_session.commit()
+    return group, user, sc2, samples
+
+
+async def fetch_all_pages(
+    http_client: AsyncClient, url: str, user: User, params: Mapping[str, Any]
+) -> List[List[int]]:
+    pages: List[List[int]] = []
+    cursor = None
+    while True:
+        page_params = dict(params)
+        if cursor:
+            page_params["cursor"] = cursor
+        res = await http_client.get(
+            url, params=page_params, headers={"user_id": user.auth0_user_id}
+        )
+        assert res.status_code == 200
+        response = res.json()
+        pages.append([sample["id"] for sample in response["samples"]])
+        cursor = response["next_cursor"]
+        if not cursor:
+            return pages
+
+
+async def test_samples_page(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+):
+    group, user, sc2, samples = await make_paginated_samples(async_session)
+    url = f"/v2/orgs/{group.id}/pathogens/{sc2.slug}/samples/page/"
+    ids = [sample.id for sample in samples]
+
+    pages = await fetch_all_pages(http_client, url, user, {"limit": 2})
+    assert pages == [ids[0:2], ids[2:4], ids[4:5]]
+
+    pages = await fetch_all_pages(
+        http_client,
+        url,
+        user,
+        {"limit": 3, "order_by": "collection_date", "descending": "true"},
+    )
+    assert pages == [[ids[4], ids[3], ids[2]], [ids[1], ids[0]]]
+
+    # Page sizes are capped, not rejected.
+    pages = await fetch_all_pages(http_client, url, user, {"limit": 100000})
+    assert pages == [ids]
+
+    # A cursor only makes sense for the order it came from.
+    res = await http_client.get(
+        url,
+        params={"cursor": "garbage"},
+        headers={"user_id": user.auth0_user_id},
+    )
+    assert res.status_code == 400
+
+
+async def test_samples_list_filters(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+):
+    group, user, sc2, samples = await make_paginated_samples(async_session)
+    ids = [sample.id for sample in samples]
+    filters: List[Tuple[Mapping[str, Any], List[int]]] = [
+        ({"lineage": ["B.1.0", "B.1.3"]}, [ids[0], ids[3]]),
+        ({"qc_status": "good"}, [ids[1], ids[3]]),
+        ({"collection_date_start": "2022-01-02"}, ids[2:]),
+        (
+            {
+                "collection_date_start": "2022-01-02",
+                "collection_date_end": "2022-01-02",
+            },
+            ids[2:4],
+        ),
+        ({"upload_date_start": "2000-01-01T00:00:00"}, ids),
+        ({"upload_date_end": "2000-01-01T00:00:00"}, []),
+        ({"location_id": samples[0].location_id}, ids),
+        ({"location_id": samples[0].location_id + 1}, []),
+    ]
+    for params, expected_ids in filters:
+        # The legacy, unpaginated list and the paginated one filter the same way.
+        res = await http_client.get(
+            f"/v2/orgs/{group.id}/pathogens/{sc2.slug}/samples/",
+            params=params,
+            headers={"user_id": user.auth0_user_id},
+        )
+        assert sorted(sample["id"] for sample in res.json()["samples"]) == expected_ids
+        pages = await fetch_all_pages(
+            http_client,
+            f"/v2/orgs/{group.id}/pathogens/{sc2.slug}/samples/page/",
+            user,
+            params,
+        )
+        assert pages[0] == expected_ids
+
+
+async def test_samples_list_rendered_in_db_matches_orm(
+    async_session: AsyncSession,
+    api: FastAPI,
+    http_client: AsyncClient,
+):
+    group = group_factory()
+    other_group = group_factory(name="other group")
+    user = await userrole_factory(async_session, group)
+    roles = await grouprole_factory(async_session, other_group, group, "viewer")
+    location = location_factory(
+        "North America", "USA", "California", 'Santa "Barbara" County'
+    )
+    region_only = location_factory("Europe")
+    sc2 = pathogen_factory("SC2", "SARS-Cov-2")
+    mpx = pathogen_factory("MPX", "MPX")
+    # Identifiers that need escaping, and every optional part present.
+    full = sample_factory(
+        group,
+        user,
+        location,
+        private=True,
+        pathogen=sc2,
+        private_identifier='priv "1" \\ ñ\n\t',
+        public_identifier="public/1",
+    )
+    # No accessions, genome, lineages or QC metrics.
+    sample_factory(
+        group,
+        user,
+        region_only,
+        pathogen=sc2,
+        private_identifier="private2",
+        public_identifier="public2",
+        accessions={},
+    )
+    # Someone else's public sample, so we don't get its private identifier.
+    shared = sample_factory(
+        other_group,
+        user,
+        location,
+        pathogen=sc2,
+        private_identifier="private3",
+        public_identifier="public3",
+    )
+    nextclade = sample_factory(
+        group,
+        user,
+        location,
+        pathogen=mpx,
+        private_identifier="private4",
+        public_identifier="public4",
+    )
+    for sample in (full, shared, nextclade):
+        uploaded_pathogen_genome_factory(sample)
+    sample_qc_metrics_factory(full, qc_score="12.5")
+    sample_qc_metrics_factory(nextclade)
+    sample_lineage_factory(
+        full,
+        lineage_type=LineageType.PANGOLIN,
+        lineage_probability=1.0,
+        raw_lineage_output={"scorpio_call": "B.1.167", "scorpio_support": "0.775"},
+    )
+    sample_lineage_factory(full, lineage="B.1.2", lineage_probability=0.87)
+    sample_lineage_factory(shared, raw_lineage_output={"scorpio_call": None})
+    sample_lineage_factory(nextclade, reference_dataset_tag="2022-11-15T12:00:00Z")
+    async_session.add_all(roles + [group, other_group])
+    await async_session.commit()
+
+    settings = api.state.aspen_settings
+    for pathogen, expected_count in ((sc2, 3), (mpx, 1)):
+        url = f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/samples/"
+        settings.SAMPLES_LIST_RENDER_IN_DB = True
+        rendered = await http_client.get(url, headers={"user_id": user.auth0_user_id})
+        settings.SAMPLES_LIST_RENDER_IN_DB = False
+        built = await http_client.get(url, headers={"user_id": user.auth0_user_id})
+        assert rendered.status_code == built.status_code == 200
+        assert rendered.headers["content-type"] == "application/json"
+        assert len(rendered.json()["samples"]) == expected_count
+        assert rendered.content == built.content
+
+
 # test DELETE samples #
 
 
@@ -796,6 +1002,118 @@ async def test_bulk_delete_sample_success(
     assert rows == 3
 
 
+async def test_bulk_update_and_delete_constant_round_trips(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    split_client: SplitClient,
+    query_budget,
+):
+    pathogen, repo_config = setup_random_repo_configs(
+        async_session, split_client=split_client
+    )
+    group = group_factory()
+    user = await userrole_factory(async_session, group)
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    samples = [
+        sample_factory(
+            group,
+            user,
+            location,
+            pathogen=pathogen,
+            public_identifier=f"path/to/sample_{i}",
+            private_identifier=f"sample_{i}",
+        )
+        for i in range(40)
+    ]
+    for sample in samples:
+        async_session.add(
+            uploaded_pathogen_genome_factory(sample, sequence="ATGCAAAAAA")
+        )
+        async_session.add(sample_qc_metrics_factory(sample))
+        async_session.add(sample_mutations_factory(sample))
+        async_session.add(sample_lineage_factory(sample))
+    async_session.add(group)
+    await async_session.commit()
+    sample_ids = [sample.id for sample in samples]
+    url = f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/samples/"
+    auth_headers = {"user_id": user.auth0_user_id}
+
+    def update(ids: List[int]):
+        return http_client.put(
+            url,
+            json={
+                "samples": [
+                    {
+                        "id": sample_id,
+                        "private_identifier": f"renamed_{sample_id}",
+                        "public_identifier": None,
+                        "private": False,
+                        "collection_location": location.id,
+                        "sequencing_date": "2021-10-10",
+                        "collection_date": "2021-11-11",
+                    }
+                    for sample_id in ids
+                ]
+            },
+            headers=auth_headers,
+        )
+
+    def delete(ids: List[int]):
+        return http_client.request(
+            "DELETE", url, json={"ids": ids}, headers=auth_headers
+        )
+
+    with query_budget(100) as small:
+        res = await update(sample_ids[:2])
+    assert res.status_code == 200
+    with query_budget(small.statements, max_repeats=2):
+        res = await update(sample_ids[2:])
+    assert res.status_code == 200
+    updated = {sample["id"]: sample for sample in res.json()["samples"]}
+    assert set(updated) == set(sample_ids[2:])
+    current_year = datetime.date.today().year
+    for sample_id, sample in updated.items():
+        assert sample["private_identifier"] == f"renamed_{sample_id}"
+        assert sample["public_identifier"] == (
+            f"{repo_config.prefix}/USA/{group.prefix}-{sample_id}/{current_year}"
+        )
+        assert sample["sequencing_date"] == "2021-10-10"
+
+    genome_ids = (
+        (
+            await async_session.execute(
+                sa.select(UploadedPathogenGenome.pathogen_genome_id)  # type: ignore
+            )
+        )
+        .scalars()
+        .all()
+    )
+    with query_budget(100) as small:
+        res = await delete(sample_ids[:2])
+    assert res.status_code == 200
+    with query_budget(small.statements, max_repeats=2):
+        res = await delete(sample_ids[2:])
+    assert res.status_code == 200
+    assert sorted(res.json()["ids"]) == sample_ids[2:]
+
+    # The database cascades clean up everything but lineages, which are orphaned.
+    await async_session.close()
+    async_session.begin()
+    for model, condition in [
+        (Sample, sa.true()),
+        (Entity, Entity.id.in_(genome_ids)),
+        (SampleQCMetric, SampleQCMetric.sample_id.isnot(None)),
+        (SampleMutation, SampleMutation.sample_id.isnot(None)),
+        (SampleLineage, SampleLineage.sample_id.isnot(None)),
+    ]:
+        rows = await async_session.execute(sa.select(model).filter(condition))  # type: ignore
+        assert rows.scalars().all() == [], model
+    lineages = await async_session.execute(sa.select(SampleLineage))  # type: ignore
+    assert len(lineages.scalars().all()) == len(samples)
+
+
 async def test_delete_sample_success(
     async_session: AsyncSession,
     http_client: AsyncClient,
@@ -1377,6 +1695,52 @@ async def test_validation_endpoint(
     assert response["missing_sample_ids"] == []
 
 
+async def test_validation_endpoint_many_identifiers(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    split_client: SplitClient,
+    query_budget,
+):
+    """
+    Test that checking lots of identifiers takes as many statements as a few
+    """
+    (
+        user,
+        group,
+        pathogen,
+        _,
+        sample,
+        gisaid_sample,
+        isl_sample,
+        repo_config,
+    ) = await setup_validation_data(async_session, split_client)
+    known_ids = [
+        sample.public_identifier,
+        sample.private_identifier,
+        f"{repo_config.prefix}/{gisaid_sample.strain}",
+        isl_sample.isl,
+    ]
+    auth_headers = {"user_id": user.auth0_user_id}
+
+    def validate(missing_ids: List[str]):
+        return http_client.post(
+            f"/v2/orgs/{group.id}/pathogens/{pathogen.slug}/samples/validate_ids/",
+            json={"sample_ids": known_ids + missing_ids},
+            headers=auth_headers,
+        )
+
+    with query_budget(100) as small:
+        res = await validate(["missing_0"])
+    assert res.status_code == 200
+    assert res.json()["missing_sample_ids"] == ["missing_0"]
+
+    missing_ids = [f"missing_{i}" for i in range(5000)]
+    with query_budget(small.statements):
+        res = await validate(missing_ids)
+    assert res.status_code == 200
+    assert sorted(res.json()["missing_sample_ids"]) == sorted(missing_ids)
+
+
 async def test_validation_endpoint_missing_identifier(
     async_session: AsyncSession, http_client: AsyncClient, split_client: SplitClient
 ):
@@ -1413,3 +1777,56 @@ async def test_validation_endpoint_missing_identifier(
     assert res.status_code == 200
     response = res.json()
     assert response["missing_sample_ids"] == ["this_is_missing"]
+
+
+async def test_samples_list_query_budget(
+    async_session: AsyncSession,
+    http_client: AsyncClient,
+    query_budget,
+):
+    group, user, sc2, samples = await make_paginated_samples(async_session)
+    url = f"/v2/orgs/{group.id}/pathogens/{sc2.slug}/samples/"
+
+    # The number of statements can't depend on the number of samples (N+1).
+    with query_budget(30, max_repeats=len(samples) - 1) as profile:
+        res = await http_client.get(url, headers={"user_id": user.auth0_user_id})
+    assert res.status_code == 200
+    assert len(res.json()["samples"]) == len(samples)
+    assert res.headers["X-Query-Profile"].startswith("statements=")
+    assert profile.n_plus_one_suspects(len(samples)) == []
+
+
+@pytest.mark.parametrize(
+    "render_in_db,expected_phases",
+    [
+        (True, ("authn", "authz", "deps", "query", "db")),
+        (False, ("authn", "authz", "deps", "query", "validate", "serialize", "db")),
+    ],
+)
+async def test_samples_list_server_timing(
+    async_session: AsyncSession,
+    api: FastAPI,
+    http_client: AsyncClient,
+    render_in_db: bool,
+    expected_phases: Tuple[str, ...],
+):
+    api.state.aspen_settings.SAMPLES_LIST_RENDER_IN_DB = render_in_db
+    group, user, sc2, samples = await make_paginated_samples(async_session)
+    url = f"/v2/orgs/{group.id}/pathogens/{sc2.slug}/samples/"
+
+    res = await http_client.get(url, headers={"user_id": user.auth0_user_id})
+    assert res.status_code == 200
+    phases = {
+        metric.split(";")[0].strip(): metric
+        for metric in res.headers["Server-Timing"].split(",")
+    }
+    for phase in expected_phases:
+        assert phase in phases
+    assert "statements" in phases["db"]
+    assert phases["total"].startswith("total;dur=")
+
+    res = await http_client.get("/v2/health/phase_timings")
+    assert res.status_code == 200
+    list_samples = res.json()["routes"]["list_samples"]
+    assert list_samples["total"]["count"] >= 1
+    assert list_samples["query"]["buckets"]["+Inf"] == list_samples["query"]["count"]
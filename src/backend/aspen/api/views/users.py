@@ -16,7 +16,9 @@ from aspen.api.schemas.usergroup import (
     UserUpdateRequest,
 )
 from aspen.auth.auth0_management import Auth0Client
+from aspen.auth.auth_cache import invalidate_auth_cache
 from aspen.database.models import User
+from aspen.util.blocking import run_blocking
 
 router = APIRouter()
 
@@ -57,10 +59,16 @@ async def update_user_info(
             if attribute in auth0_attributes:
                 auth0_update_items[attribute] = value
 
+    await invalidate_auth_cache(db, user.auth0_user_id)
     await db.commit()
 
     if user.auth0_user_id and len(auth0_update_items) > 0:
-        auth0_client.update_user(user.auth0_user_id, **auth0_update_items)
+        await run_blocking(
+            "auth0",
+            auth0_client.update_user,
+            user.auth0_user_id,
+            **auth0_update_items,
+        )
     set_user_groups(user)
     return UserMeResponse.from_orm(user)
 
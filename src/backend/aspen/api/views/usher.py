@@ -5,9 +5,12 @@ from fastapi import APIRouter, Depends
 from pydantic import parse_obj_as
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.requests import Request
+from starlette.responses import Response
 
-from aspen.api.deps import get_db, get_pathogen
+from aspen.api.deps import get_db, get_pathogen, get_settings
 from aspen.api.schemas.usher import UsherTreeVersion, UsherTreeVersionsResponse
+from aspen.api.settings import APISettings
+from aspen.api.utils.reference_payloads import payload_response, reference_payload
 from aspen.database.models import Pathogen, UsherOption
 
 router = APIRouter()
@@ -17,11 +20,16 @@ router = APIRouter()
 async def get_tree_versions(
     request: Request,
     db: AsyncSession = Depends(get_db),
+    settings: APISettings = Depends(get_settings),
     pathogen: Pathogen = Depends(get_pathogen),
-) -> UsherTreeVersionsResponse:
-    options = await db.execute(
-        sa.select(UsherOption).where(UsherOption.pathogen == pathogen).order_by(UsherOption.priority.asc())  # type: ignore
-    )
-    return UsherTreeVersionsResponse(
-        usher_options=parse_obj_as(List[UsherTreeVersion], options.scalars().all())
-    )
+) -> Response:
+    async def build() -> UsherTreeVersionsResponse:
+        options = await db.execute(
+            sa.select(UsherOption).where(UsherOption.pathogen == pathogen).order_by(UsherOption.priority.asc())  # type: ignore
+        )
+        return UsherTreeVersionsResponse(
+            usher_options=parse_obj_as(List[UsherTreeVersion], options.scalars().all())
+        )
+
+    payload = await reference_payload(db, ("usher_options", pathogen.id), build)
+    return payload_response(request, payload, settings.REFERENCE_DATA_MAX_AGE)
@@ -0,0 +1,190 @@
+"""Short-lived, per-worker cache of the data that goes into an AuthContext.
+
+Every authenticated request resolves the same user (with their group memberships
+and roles), and then the roles other groups have granted to their group. Those rows
+change a handful of times a day, so we keep them for a short TTL. Anything that
+changes memberships should call `invalidate_auth_cache`, which clears this worker's
+cache right away and tells the other workers to do the same via a Postgres NOTIFY.
+"""
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import asyncpg
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from aspen.database.models import User
+
+AUTH_CACHE_CHANNEL = "aspen_auth_cache"
+# Notification payload that invalidates every entry.
+INVALIDATE_ALL = "*"
+DEFAULT_TTL = 60
+
+
+class AuthContextCache:
+    def __init__(self, ttl: float = DEFAULT_TTL, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        # user key -> (expiry, detached User with user_roles/group/role loaded)
+        self._users: Dict[str, Tuple[float, User]] = {}
+        # grantee group id -> (expiry, [{"group_id": ..., "role": ...}])
+        self._group_roles: Dict[int, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def user_key(auth0_user_id: Optional[str], user_id: Optional[str]) -> str:
+        if auth0_user_id:
+            return f"auth0:{auth0_user_id}"
+        return f"id:{user_id}"
+
+    def _get(self, store: Dict, key: Any) -> Any:
+        with self._lock:
+            entry = store.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            store.pop(key, None)
+            self.misses += 1
+            return None
+
+    def _put(self, store: Dict, key: Any, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            store.pop(key, None)
+            while len(store) >= self.max_size:
+                # dicts keep insertion order, so this drops the oldest entry.
+                store.pop(next(iter(store)))
+            store[key] = (time.monotonic() + self.ttl, value)
+
+    def get_user(self, key: str) -> Optional[User]:
+        return self._get(self._users, key)
+
+    def put_user(self, key: str, user: User) -> None:
+        self._put(self._users, key, user)
+
+    def get_group_roles(self, group_id: int) -> Optional[List[Dict[str, Any]]]:
+        return self._get(self._group_roles, group_id)
+
+    def put_group_roles(self, group_id: int, group_roles: List[Dict[str, Any]]):
+        self._put(self._group_roles, group_id, group_roles)
+
+    def invalidate_user(self, auth0_user_id: str) -> None:
+        with self._lock:
+            self.invalidations += 1
+            for key, (_, user) in list(self._users.items()):
+                if user.auth0_user_id == auth0_user_id:
+                    del self._users[key]
+
+    def invalidate_group(self, group_id: int) -> None:
+        with self._lock:
+            self.invalidations += 1
+            self._group_roles.pop(group_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += 1
+            self._users.clear()
+            self._group_roles.clear()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "users": len(self._users),
+            "group_roles": len(self._group_roles),
+        }
+
+
+# One cache per engine. In production that means one per worker (see `get_engine`);
+# it also guarantees cached rows always come from the database they're used with.
+_caches: "weakref.WeakKeyDictionary[Engine, AuthContextCache]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _engine_for(session: Union[AsyncSession, Session]) -> Engine:
+    bind = session.bind
+    return getattr(bind, "sync_engine", bind)
+
+
+def auth_cache_for(
+    session: Union[AsyncSession, Session], ttl: float = DEFAULT_TTL
+) -> AuthContextCache:
+    engine = _engine_for(session)
+    cache = _caches.get(engine)
+    if cache is None:
+        cache = AuthContextCache(ttl)
+        _caches[engine] = cache
+    return cache
+
+
+def handle_invalidation(payload: str) -> None:
+    """Applies an invalidation message to every cache in this process."""
+    for cache in list(_caches.values()):
+        if payload == INVALIDATE_ALL:
+            cache.clear()
+        elif payload.startswith("group:"):
+            cache.invalidate_group(int(payload[len("group:") :]))
+        else:
+            cache.invalidate_user(payload)
+
+
+def _payload(auth0_user_id: Optional[str], group_id: Optional[int]) -> str:
+    if auth0_user_id:
+        return auth0_user_id
+    if group_id:
+        return f"group:{group_id}"
+    return INVALIDATE_ALL
+
+
+async def invalidate_auth_cache(
+    db: AsyncSession,
+    auth0_user_id: Optional[str] = None,
+    group_id: Optional[int] = None,
+) -> None:
+    """Drop cached auth data for a user, a group, or (with no arguments) everyone.
+
+    The NOTIFY is transactional, so other workers hear about it when `db` commits.
+    """
+    payload = _payload(auth0_user_id, group_id)
+    handle_invalidation(payload)
+    await db.execute(sa.select(sa.func.pg_notify(AUTH_CACHE_CHANNEL, payload)))
+
+
+def invalidate_auth_cache_sync(
+    db: Session,
+    auth0_user_id: Optional[str] = None,
+    group_id: Optional[int] = None,
+) -> None:
+    """Same as `invalidate_auth_cache`, for scripts that use sync sessions."""
+    payload = _payload(auth0_user_id, group_id)
+    handle_invalidation(payload)
+    db.execute(sa.select(sa.func.pg_notify(AUTH_CACHE_CHANNEL, payload)))
+
+
+async def listen_for_invalidations(db_dsn: str) -> asyncpg.Connection:
+    """Opens a dedicated connection that applies invalidations sent by other processes."""
+    url = make_url(db_dsn).set(drivername="postgresql")
+    conn = await asyncpg.connect(url.render_as_string(hide_password=False))
+    await conn.add_listener(
+        AUTH_CACHE_CHANNEL,
+        lambda _conn, _pid, _channel, payload: handle_invalidation(payload),
+    )
+    return conn
+
+
+def auth_cache_stats() -> Dict[str, float]:
+    totals: Dict[str, float] = {}
+    for cache in list(_caches.values()):
+        for key, value in cache.stats().items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
@@ -1,4 +1,8 @@
+import hashlib
+import threading
 import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 
 import requests
 from auth0.v3.authentication.token_verifier import (
@@ -9,26 +13,145 @@ from auth0.v3.authentication.token_verifier import (
 from auth0.v3.exceptions import TokenValidationError
 
 
-class InsecureJwksFetcher(JwksFetcher):
-    def _fetch_jwks(self, force=False):
-        has_expired = self._cache_date + self._cache_ttl < time.time()
+class CachedJwksFetcher(JwksFetcher):
+    """JWKS fetcher that's meant to be shared by every request in the process.
 
-        if not force and not has_expired:
-            # Return from cache
-            self._cache_is_fresh = False
-            return self._cache_value
+    The key set is refreshed when the TTL runs out, or when a token shows up with a
+    `kid` we haven't seen (ie: the signing keys were rotated). Unknown-kid refreshes
+    are rate limited so a stream of garbage tokens can't turn into a stream of JWKS
+    downloads, and a failed refresh keeps serving the keys we already have.
+    """
 
-        # Invalidate cache and fetch fresh data
-        self._cache_value = {}
-        response = requests.get(self._jwks_url, verify=False)
+    MIN_REFRESH_INTERVAL = 30
 
-        if response.ok:
-            # Update cache
-            jwks = response.json()
-            self._cache_value = self._parse_jwks(jwks)
-            self._cache_is_fresh = True
-            self._cache_date = time.time()
-        return self._cache_value
+    def __init__(
+        self,
+        jwks_url: str,
+        cache_ttl: int = JwksFetcher.CACHE_TTL,
+        verify_tls: bool = True,
+    ):
+        super().__init__(jwks_url, cache_ttl)
+        self._verify_tls = verify_tls
+        self._lock = threading.Lock()
+        self.fetch_count = 0
+
+    def _download_jwks(self) -> Dict[str, Any]:
+        self.fetch_count += 1
+        response = requests.get(self._jwks_url, verify=self._verify_tls, timeout=10)
+        response.raise_for_status()
+        return self._parse_jwks(response.json())
+
+    def _refresh(self) -> None:
+        try:
+            self._cache_value = self._download_jwks()
+        except (requests.RequestException, ValueError, KeyError):
+            # Keep whatever keys we already have, and try again after the interval.
+            pass
+        self._cache_date = time.time()
+
+    def get_key(self, key_id):
+        with self._lock:
+            now = time.time()
+            if self._cache_date + self._cache_ttl < now:
+                self._refresh()
+            elif (
+                key_id not in self._cache_value
+                and self._cache_date + self.MIN_REFRESH_INTERVAL < now
+            ):
+                self._refresh()
+            keys = self._cache_value
+        if key_id in keys:
+            return keys[key_id]
+        raise TokenValidationError(
+            'RSA Public Key with ID "{}" was not found.'.format(key_id)
+        )
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of token digests -> verified claims, kept until the token expires.
+
+    Once a token's signature and claims have been verified, we don't need to redo
+    the RSA verification every time the same client sends it again.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, Tuple[float, Dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(id_token: str, issuer: str, audience: str) -> str:
+        return hashlib.sha256(f"{issuer}|{audience}|{id_token}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def put(self, key: str, claims: Dict[str, Any]) -> None:
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Process-wide caches, shared by every request this worker handles.
+_signature_verifiers: Dict[str, AsymmetricSignatureVerifier] = {}
+_signature_verifiers_lock = threading.Lock()
+verified_tokens = VerifiedTokenCache()
+
+
+def get_signature_verifier(
+    jwks_url: str, verify_tls: bool = True
+) -> AsymmetricSignatureVerifier:
+    with _signature_verifiers_lock:
+        sv = _signature_verifiers.get(jwks_url)
+        if sv is None:
+            # Adapted from https://github.com/auth0/auth0-python#id-token-validation
+            sv = AsymmetricSignatureVerifier(jwks_url)
+            sv._fetcher = CachedJwksFetcher(jwks_url, verify_tls=verify_tls)
+            _signature_verifiers[jwks_url] = sv
+        return sv
+
+
+def verify_token(
+    id_token: str,
+    jwks_url: str,
+    issuer: str,
+    audience: str,
+    verify_tls: bool = True,
+) -> Dict[str, Any]:
+    cache_key = VerifiedTokenCache.key(id_token, issuer, audience)
+    payload = verified_tokens.get(cache_key)
+    if payload is not None:
+        return payload
+
+    sv = get_signature_verifier(jwks_url, verify_tls)
+    payload = sv.verify_signature(id_token)
+    tv = TokenVerifier(signature_verifier=sv, issuer=issuer, audience=audience)
+    tv._verify_payload(payload)
+    verified_tokens.put(cache_key, payload)
+    return payload
 
 
 def validate_auth_header(auth_header, domain, client_id):
@@ -47,15 +170,10 @@ def validate_auth_header(auth_header, domain, client_id):
     if "genepinet.localdev" in domain:
         jwks_url = f"https://{domain}/.well-known/openid-configuration/jwks"
         issuer = f"https://{domain}"
-        # Adapted from https://github.com/auth0/auth0-python#id-token-validation
-        sv = AsymmetricSignatureVerifier(jwks_url)
-        sv._fetcher = InsecureJwksFetcher(jwks_url)
+        verify_tls = False
     else:
         jwks_url = f"https://{domain}/.well-known/jwks.json"
         issuer = f"https://{domain}/"
-        sv = AsymmetricSignatureVerifier(jwks_url)
+        verify_tls = True
 
-    payload = sv.verify_signature(id_token)
-    tv = TokenVerifier(signature_verifier=sv, issuer=issuer, audience=client_id)
-    tv._verify_payload(payload)
-    return payload
+    return verify_token(id_token, jwks_url, issuer, client_id, verify_tls)
@@ -7,6 +7,7 @@ from sqlalchemy.orm import contains_eager
 from sqlalchemy.orm.exc import NoResultFound
 
 from aspen.auth.auth0_management import Auth0Client
+from aspen.auth.auth_cache import invalidate_auth_cache
 from aspen.database.models import Group, GroupRole, Role, User, UserRole
 
 
@@ -102,3 +103,6 @@ class RoleManager:
                 )
                 continue
             db.add(await cls.generate_user_role(db, user, db_group, role_name))
+
+        # Make sure no worker keeps serving this user's old memberships.
+        await invalidate_auth_cache(db, user.auth0_user_id)
@@ -0,0 +1,133 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, Generator
+
+import jwt
+import pytest
+from auth0.v3.exceptions import TokenValidationError
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from aspen.auth import device_auth
+from aspen.auth.device_auth import CachedJwksFetcher, verify_token
+
+ISSUER = "https://auth.test/"
+AUDIENCE = "test-client-id"
+
+
+class JwksStandIn:
+    """A local JWKS endpoint that counts how often it gets downloaded."""
+
+    def __init__(self):
+        self.keys: Dict[str, Any] = {}
+        self.downloads = 0
+        self.server = HTTPServer(("127.0.0.1", 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/.well-known/jwks.json"
+
+    def add_key(self, kid: str):
+        private_key = rsa.generate_private_key(
+            public_exponent=65537, key_size=2048, backend=default_backend()
+        )
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+        jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+        self.keys[kid] = (private_key, jwk)
+
+    def sign(self, kid: str, **claims) -> str:
+        now = int(time.time())
+        payload = {
+            "iss": ISSUER,
+            "aud": AUDIENCE,
+            "sub": "auth0|user",
+            "iat": now,
+            "exp": now + 3600,
+        }
+        payload.update(claims)
+        return jwt.encode(
+            payload, self.keys[kid][0], algorithm="RS256", headers={"kid": kid}
+        )
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.downloads += 1
+                body = json.dumps(
+                    {"keys": [jwk for _, jwk in stand_in.keys.values()]}
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture()
+def jwks() -> Generator[JwksStandIn, None, None]:
+    stand_in = JwksStandIn()
+    stand_in.add_key("key-1")
+    stand_in.thread.start()
+    device_auth._signature_verifiers.clear()
+    device_auth.verified_tokens.clear()
+    yield stand_in
+    stand_in.server.shutdown()
+
+
+def test_jwks_is_fetched_once(jwks: JwksStandIn) -> None:
+    for i in range(5):
+        token = jwks.sign("key-1", sub=f"auth0|user{i}")
+        assert (
+            verify_token(token, jwks.url, ISSUER, AUDIENCE)["sub"] == f"auth0|user{i}"
+        )
+    assert jwks.downloads == 1
+
+
+def test_verified_tokens_skip_verification(jwks: JwksStandIn) -> None:
+    token = jwks.sign("key-1")
+    verify_token(token, jwks.url, ISSUER, AUDIENCE)
+    hits = device_auth.verified_tokens.hits
+    assert verify_token(token, jwks.url, ISSUER, AUDIENCE)["sub"] == "auth0|user"
+    assert device_auth.verified_tokens.hits == hits + 1
+
+
+def test_unknown_kid_refreshes_jwks(
+    jwks: JwksStandIn, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(CachedJwksFetcher, "MIN_REFRESH_INTERVAL", 0)
+    verify_token(jwks.sign("key-1"), jwks.url, ISSUER, AUDIENCE)
+    # Rotate keys - the new kid isn't in our cached key set yet.
+    jwks.add_key("key-2")
+    payload = verify_token(jwks.sign("key-2"), jwks.url, ISSUER, AUDIENCE)
+    assert payload["sub"] == "auth0|user"
+    assert jwks.downloads == 2
+
+
+def test_unknown_kid_refreshes_are_rate_limited(jwks: JwksStandIn) -> None:
+    verify_token(jwks.sign("key-1"), jwks.url, ISSUER, AUDIENCE)
+    jwks.add_key("key-2")
+    for _ in range(3):
+        with pytest.raises(TokenValidationError):
+            verify_token(jwks.sign("key-2"), jwks.url, ISSUER, AUDIENCE)
+    assert jwks.downloads == 1
+
+
+def test_expired_and_invalid_tokens_are_rejected(jwks: JwksStandIn) -> None:
+    expired = jwks.sign("key-1", exp=int(time.time()) - 3600)
+    with pytest.raises(TokenValidationError):
+        verify_token(expired, jwks.url, ISSUER, AUDIENCE)
+    wrong_audience = jwks.sign("key-1", aud="someone-else")
+    with pytest.raises(TokenValidationError):
+        verify_token(wrong_audience, jwks.url, ISSUER, AUDIENCE)
+    # Failed verifications are never cached.
+    with pytest.raises(TokenValidationError):
+        verify_token(wrong_audience, jwks.url, ISSUER, AUDIENCE)
@@ -13,6 +13,7 @@ from aspen.config.docker_compose import DockerComposeConfig
 from aspen.database.connection import enable_profiling, get_db_uri, init_db
 from aspen.database.models import *  # noqa: F401, F403
 from aspen.database.schema import create_tables_and_schema
+from aspen.util.sequence import backfill_sequences
 
 
 @cli.group()
@@ -89,6 +90,24 @@ def import_data(s3_path, db_uri):
         proc.stdin.close()
 
 
+@db.command("backfill-sequences")
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+@click.option(
+    "--compress/--no-compress",
+    default=False,
+    help="Also rewrite every sequence in compressed form",
+)
+@click.pass_context
+def backfill_sequences_command(ctx, batch_size, compress):
+    """Recompute sequence statistics (and optionally compress sequences) in bulk."""
+    session = ctx.obj["ENGINE"].make_session()
+    try:
+        updated = backfill_sequences(session, batch_size, compress)
+    finally:
+        session.close()
+    print(f"Updated {updated} sequences")
+
+
 @db.command("interact")
 @click.option(
     "--connect/--no-connect", default=False, help="Connect to the db immediately"
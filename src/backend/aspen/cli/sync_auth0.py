@@ -11,6 +11,7 @@ from sqlalchemy.orm import joinedload
 from sqlalchemy.orm.session import Session
 
 from aspen.auth.auth0_management import Auth0Client, Auth0Org, Auth0User
+from aspen.auth.auth_cache import invalidate_auth_cache_sync
 from aspen.config.config import Config
 from aspen.database.connection import (
     get_db_uri,
@@ -116,6 +117,10 @@ class RoleManager:
                     UserRole(user=user, role=self.rolemap[role_name], group=db_group)
                 )
 
+            if (roles_to_delete or roles_to_add) and not self.dry_run:
+                # Tell the API workers to drop their cached copy of this user's roles.
+                invalidate_auth_cache_sync(self.db, user.auth0_user_id)
+
 
 class ObjectManager:
     db_auth0_id_field: Optional[str] = None
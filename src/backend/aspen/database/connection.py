@@ -1,19 +1,63 @@
 from __future__ import annotations
 
 import logging
+import threading
 import time
 from contextlib import contextmanager
-from typing import Generator, TYPE_CHECKING
+from typing import Any, Dict, Generator, TYPE_CHECKING
 
 from sqlalchemy import event
 from sqlalchemy.engine import create_engine, Engine
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from aspen.util.metrics import REGISTRY
 
 if TYPE_CHECKING:
     from aspen.config.config import Config
 
 
+POOL_CHECKOUT_WAIT = REGISTRY.histogram(
+    "aspen_db_pool_checkout_wait_seconds",
+    "Time spent waiting to check out a pooled db connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+
+
+class PoolWaitStats:
+    """Running totals of how long callers waited to check out a pooled connection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        POOL_CHECKOUT_WAIT.observe(wait)
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait times, so we can size the
+    pool from real numbers instead of guesses."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.wait_stats.record(time.perf_counter() - start)
+
+
 class SqlAlchemyInterface:
     def __init__(self, engine: Engine, use_async: bool = False):
         self._engine = engine
@@ -32,11 +76,29 @@ class SqlAlchemyInterface:
     def make_session(self) -> Session:
         return self._session_maker()
 
+    def pool_status(self) -> Dict[str, Any]:
+        pool = self._engine.pool
+        status: Dict[str, Any] = {
+            "pool_size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+        }
+        wait_stats = getattr(pool, "wait_stats", None)
+        if wait_stats:
+            status["checkouts"] = wait_stats.checkouts
+            status["total_wait_seconds"] = wait_stats.total_wait
+            status["max_wait_seconds"] = wait_stats.max_wait
+        return status
+
 
 def init_async_db(db_uri: str, **kwargs) -> SqlAlchemyInterface:
-    engine = create_async_engine(
-        db_uri, echo=False, pool_size=5, max_overflow=5, future=True, **kwargs
-    )
+    kwargs.setdefault("echo", False)
+    kwargs.setdefault("pool_size", 5)
+    kwargs.setdefault("max_overflow", 5)
+    kwargs.setdefault("poolclass", InstrumentedAsyncPool)
+    engine = create_async_engine(db_uri, future=True, **kwargs)
     return SqlAlchemyInterface(engine, use_async=True)
 
 
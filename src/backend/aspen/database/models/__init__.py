@@ -58,6 +58,11 @@ from aspen.database.models.usergroup import (  # noqa: F401
     UserRole,
 )
 from aspen.database.models.usher import UsherOption  # noqa: F401
+from aspen.database.models.job_queue import (  # noqa: F401
+    QueuedJob,
+    QueuedJobStatus,
+    QueuedJobType,
+)
 from aspen.database.models.workflow import (  # noqa: F401
     Workflow,
     WorkflowInputs,
@@ -0,0 +1,95 @@
+"""A durable queue of on-demand jobs waiting to be launched on Step Functions."""
+import enum
+
+import enumtables
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    func,
+    Index,
+    Integer,
+    JSON,
+    String,
+    text,
+)
+from sqlalchemy.orm import relationship
+
+from aspen.database.models.base import base, idbase
+from aspen.database.models.enum import Enum
+from aspen.database.models.pathogens import Pathogen
+from aspen.database.models.usergroup import Group
+
+
+class QueuedJobType(enum.Enum):
+    PANGOLIN = "PANGOLIN"
+    LINEAGE_QC = "LINEAGE_QC"
+
+
+# Create the enumeration table
+# Pass your enum class and the SQLAlchemy declarative base to enumtables.EnumTable
+_QueuedJobTypeTable = enumtables.EnumTable(
+    QueuedJobType,
+    base,
+    tablename="queued_job_types",
+)
+
+
+class QueuedJobStatus(enum.Enum):
+    PENDING = "PENDING"
+    DISPATCHED = "DISPATCHED"
+    FAILED = "FAILED"
+
+
+# Create the enumeration table
+# Pass your enum class and the SQLAlchemy declarative base to enumtables.EnumTable
+_QueuedJobStatusTable = enumtables.EnumTable(
+    QueuedJobStatus,
+    base,
+    tablename="queued_job_statuses",
+)
+
+
+class QueuedJob(idbase):  # type: ignore
+    """Samples that need a job run on them. Rows are added in the same transaction
+    as the samples, and the job dispatcher launches every pending row for a
+    pathogen + job type as one execution."""
+
+    __tablename__ = "queued_jobs"
+    __table_args__ = (
+        Index(
+            "ix_queued_jobs_pending",
+            "next_attempt_at",
+            postgresql_where=text("status = 'PENDING'"),
+        ),
+    )
+
+    job_type = Column(
+        Enum(QueuedJobType),
+        ForeignKey(_QueuedJobTypeTable.item_id),
+        nullable=False,
+    )
+    status = Column(
+        Enum(QueuedJobStatus),
+        ForeignKey(_QueuedJobStatusTable.item_id),
+        nullable=False,
+        default=QueuedJobStatus.PENDING,
+    )
+    pathogen_id = Column(Integer, ForeignKey(Pathogen.id), nullable=False)
+    pathogen: Pathogen = relationship(Pathogen)  # type: ignore
+    group_id = Column(Integer, ForeignKey(Group.id), nullable=True)
+    group: Group = relationship(Group)  # type: ignore
+    sample_ids = Column(
+        JSON,
+        nullable=False,
+        comment="The sample identifiers the job takes: public identifiers for pangolin, sample ids for lineage qc.",
+    )
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+    next_attempt_at = Column(DateTime, nullable=False, server_default=func.now())
+    dispatched_at = Column(DateTime, nullable=True)
+    execution_arn = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+
+    def __repr__(self):
+        return f"QueuedJob <{self.job_type} {self.status} {self.id}>"
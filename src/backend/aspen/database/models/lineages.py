@@ -97,7 +97,7 @@ class SampleLineage(idbase):  # type: ignore
         ),
     )
 
-    sample_id = Column(Integer, ForeignKey("samples.id"))
+    sample_id = Column(Integer, ForeignKey("samples.id", ondelete="SET NULL"))
     sample = relationship("Sample", back_populates="lineages")  # type: ignore
     lineage_type = Column(
         Enum(LineageType),
@@ -146,7 +146,12 @@ class SampleQCMetric(idbase):  # type: ignore
         ),
     )
 
-    sample_id = Column(Integer, ForeignKey("samples.id"), nullable=False, unique=True)
+    sample_id = Column(
+        Integer,
+        ForeignKey("samples.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True,
+    )
     sample = relationship("Sample", back_populates="qc_metrics")  # type: ignore
     # What tool/method was used to produce this object of QC metrics.
     qc_caller = Column(
@@ -36,7 +36,12 @@ class SampleMutation(idbase):  # type: ignore
         ),
     )
 
-    sample_id = Column(Integer, ForeignKey("samples.id"), nullable=False, unique=True)
+    sample_id = Column(
+        Integer,
+        ForeignKey("samples.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True,
+    )
     sample = relationship("Sample", back_populates="mutations")  # type: ignore
     # What tool/method was used to produce this object of SampleMutation.
     mutations_caller = Column(
@@ -41,7 +41,7 @@ _TreeTypeTable = enumtables.EnumTable(
 PhyloTreeSamples = Table(
     "phylo_tree_samples",
     base.metadata,  # type: ignore
-    Column("sample_id", ForeignKey(Sample.id), primary_key=True),
+    Column("sample_id", ForeignKey(Sample.id, ondelete="CASCADE"), primary_key=True),
     Column(
         "phylo_tree_id",
         ForeignKey(f"{_PHYLO_TREE_TABLENAME}.entity_id"),
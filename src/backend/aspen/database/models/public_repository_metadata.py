@@ -2,6 +2,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     PrimaryKeyConstraint,
     String,
@@ -19,6 +20,8 @@ class PublicRepositoryMetadata(base):  # type: ignore
     __tablename__ = "public_repository_metadata"
     __table_args__ = (
         PrimaryKeyConstraint("pathogen_id", "strain", "public_repository_id"),
+        # Users look samples up by EPI ISL as well as by strain name.
+        Index("ix_public_repository_metadata_isl", "isl"),
     )
 
     pathogen_id = Column(
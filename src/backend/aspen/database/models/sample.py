@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime
 from re import sub
-from typing import Optional, TYPE_CHECKING
+from typing import Optional, Tuple, TYPE_CHECKING
 
 from sqlalchemy import (
     Boolean,
@@ -10,6 +10,7 @@ from sqlalchemy import (
     Date,
     ForeignKey,
     func,
+    Index,
     Integer,
     JSON,
     String,
@@ -43,6 +44,13 @@ class Sample(idbase, DictMixin):  # type: ignore
             # To avoid overlapping above unique index, explicitly set `name` here
             name="uq_samples_submitting_group_id_public_identifier",
         ),
+        # Keyset pagination of the sample list walks (collection_date, id).
+        Index(
+            "ix_samples_pathogen_id_collection_date_id",
+            "pathogen_id",
+            "collection_date",
+            "id",
+        ),
     )
 
     submitting_group_id = Column(
@@ -208,30 +216,31 @@ class Sample(idbase, DictMixin):  # type: ignore
     mutations = relationship("SampleMutation", back_populates="sample", cascade="delete, delete-orphan, merge, save-update")  # type: ignore
     qc_metrics = relationship("SampleQCMetric", back_populates="sample", cascade="delete, delete-orphan, merge, save-update")  # type: ignore
 
+    @staticmethod
+    def public_identifier_affixes(
+        prefix: str, collection_location: Location, submitting_group: Group
+    ) -> Tuple[str, str]:
+        """What goes before and after the sample id in a generated public
+        identifier."""
+        FORBIDDEN_NAME_CHARACTERS_REGEX = "[^a-zA-Z0-9._/-]"
+        prefix = sub(FORBIDDEN_NAME_CHARACTERS_REGEX, "", prefix)
+        country = sub(FORBIDDEN_NAME_CHARACTERS_REGEX, "", collection_location.country)
+        group_prefix = sub(FORBIDDEN_NAME_CHARACTERS_REGEX, "", submitting_group.prefix)
+        current_year: str = datetime.today().strftime("%Y")
+        return f"{prefix}/{country}/{group_prefix}-", f"/{current_year}"
+
     def generate_public_identifier(self, prefix, already_exists=False):
         # If we don't have an explicit public identifier, generate one from
         # our current model context
         if self.public_identifier:
             return
 
-        FORBIDDEN_NAME_CHARACTERS_REGEX = "[^a-zA-Z0-9._/-]"
-        prefix = sub(FORBIDDEN_NAME_CHARACTERS_REGEX, "", prefix)
-        country = sub(
-            FORBIDDEN_NAME_CHARACTERS_REGEX, "", self.collection_location.country
-        )
-        print(country)
-        group_prefix = sub(
-            FORBIDDEN_NAME_CHARACTERS_REGEX, "", self.submitting_group.prefix
+        before_id, after_id = self.public_identifier_affixes(
+            prefix, self.collection_location, self.submitting_group
         )
-        current_year: str = datetime.today().strftime("%Y")
         if already_exists:
-            id = self.id
-            self.public_identifier = (
-                f"{prefix}/{country}/{group_prefix}-{id}/{current_year}"
-            )
+            self.public_identifier = f"{before_id}{self.id}{after_id}"
         else:
             self.public_identifier = func.concat(
-                f"{prefix}/{country}/{group_prefix}-",
-                text("currval('aspen.samples_id_seq')"),
-                f"/{current_year}",
+                before_id, text("currval('aspen.samples_id_seq')"), after_id
             )
@@ -9,6 +9,7 @@ from sqlalchemy import (
     func,
     Integer,
     String,
+    TypeDecorator,
     UniqueConstraint,
 )
 from sqlalchemy.orm import backref, deferred, relationship
@@ -16,17 +17,51 @@ from sqlalchemy.orm import backref, deferred, relationship
 from aspen.database.models.base import idbase
 from aspen.database.models.entity import Entity, EntityType
 from aspen.database.models.sample import Sample
+from aspen.util.sequence import decompress_sequence, encode_sequence, sequence_stats
+
+
+class SequenceString(TypeDecorator):
+    """A sequence, optionally stored compressed (see aspen.util.sequence).
+
+    Compressed values are decoded as they're loaded, so callers always see the
+    plain sequence, whichever way a row happens to be stored.
+    """
+
+    impl = String
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return encode_sequence(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress_sequence(value)
+
+
+def _sequence_stats(context):
+    # All three stats columns are computed for the same row, so only work them out once.
+    sequence = context.current_parameters["sequence"]
+    cached = getattr(context, "_aspen_sequence_stats", None)
+    if cached is None or cached[0] is not sequence:
+        cached = (sequence, sequence_stats(sequence))
+        context._aspen_sequence_stats = cached
+    return cached[1]
 
 
 class PathogenGenome(Entity):
     __tablename__ = "pathogen_genomes"
 
-    entity_id = Column(Integer, ForeignKey(Entity.id), primary_key=True)
-    sequence = deferred(Column(String, nullable=False), raiseload=True)
+    entity_id = Column(
+        Integer, ForeignKey(Entity.id, ondelete="CASCADE"), primary_key=True
+    )
+    sequence = deferred(Column(SequenceString, nullable=False), raiseload=True)
 
     # statistics for the pathogen genome
     def calculate_num_unambiguous_sites(self):
-        return sum((1 for i in self.current_parameters["sequence"] if i in ("ACTGU")))
+        return _sequence_stats(self).num_unambiguous_sites
 
     num_unambiguous_sites = Column(
         Integer,
@@ -36,7 +71,7 @@ class PathogenGenome(Entity):
     )
 
     def calculate_num_missing_alleles(self):
-        return sum((1 for i in self.current_parameters["sequence"] if i == "N"))
+        return _sequence_stats(self).num_missing_alleles
 
     num_missing_alleles = Column(
         Integer,
@@ -49,9 +84,7 @@ class PathogenGenome(Entity):
     )
 
     def calculate_num_mixed(self):
-        return sum(
-            (1 for i in self.current_parameters["sequence"] if i not in ("ACTGUN-"))
-        )
+        return _sequence_stats(self).num_mixed
 
     num_mixed = Column(
         Integer,
@@ -70,9 +103,16 @@ class UploadedPathogenGenome(PathogenGenome):
     __mapper_args__ = {"polymorphic_identity": EntityType.UPLOADED_PATHOGEN_GENOME}
 
     pathogen_genome_id = Column(
-        Integer, ForeignKey(PathogenGenome.entity_id), primary_key=True
+        Integer,
+        ForeignKey(PathogenGenome.entity_id, ondelete="CASCADE"),
+        primary_key=True,
+    )
+    sample_id = Column(
+        Integer,
+        ForeignKey(Sample.id, ondelete="CASCADE"),
+        unique=True,
+        nullable=False,
     )
-    sample_id = Column(Integer, ForeignKey(Sample.id), unique=True, nullable=False)
     # The default value of cascade is "save-update, merge", so if we want to enable "delete", we
     # need to include the other options as well to maintain backwards compatibility.
     sample = relationship(  # type: ignore
@@ -117,10 +157,17 @@ class AlignedPathogenGenome(PathogenGenome):
     __mapper_args__ = {"polymorphic_identity": EntityType.ALIGNED_PATHOGEN_GENOME}
 
     pathogen_genome_id = Column(
-        Integer, ForeignKey(PathogenGenome.entity_id), primary_key=True
+        Integer,
+        ForeignKey(PathogenGenome.entity_id, ondelete="CASCADE"),
+        primary_key=True,
     )
 
-    sample_id = Column(Integer, ForeignKey(Sample.id), unique=True, nullable=False)
+    sample_id = Column(
+        Integer,
+        ForeignKey(Sample.id, ondelete="CASCADE"),
+        unique=True,
+        nullable=False,
+    )
     sample = relationship(  # type: ignore
         Sample,
         back_populates="aligned_pathogen_genome",
@@ -139,7 +186,7 @@ class AlignedPeptides(idbase):  # type: ignore
             name="uq_aligned_peptides_s3_bucket_key",
         ),
     )
-    sample_id = Column(Integer, ForeignKey("samples.id"))
+    sample_id = Column(Integer, ForeignKey("samples.id", ondelete="SET NULL"))
     sample = relationship("Sample", back_populates="aligned_peptides")  # type: ignore
 
     s3_bucket = Column(String, nullable=False)
@@ -1,4 +1,5 @@
 import pytest
+import sqlalchemy as sa
 from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.orm import undefer
 
@@ -7,6 +8,7 @@ from aspen.test_infra.models.location import location_factory
 from aspen.test_infra.models.pathogen import random_pathogen_factory
 from aspen.test_infra.models.sample import sample_factory
 from aspen.test_infra.models.usergroup import group_factory, user_factory
+from aspen.util import sequence as sequence_utils
 
 
 def test_uploaded_pathogen_genome(session):
@@ -49,3 +51,68 @@ def test_uploaded_pathogen_genome(session):
         .one()
     )
     uploaded_pathogen_genome.sequence
+
+
+def test_sequence_stats_and_compression(session, monkeypatch):
+    group = group_factory()
+    uploaded_by_user = user_factory(group)
+    pathogen = random_pathogen_factory()
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    plain_sample = sample_factory(
+        group, uploaded_by_user, location, pathogen=pathogen, public_identifier="a"
+    )
+    compressed_sample = sample_factory(
+        group,
+        uploaded_by_user,
+        location,
+        pathogen=pathogen,
+        public_identifier="b",
+        private_identifier="b",
+    )
+    sequence = ">header\nACGTNNNRY-\nACGU"
+    session.add_all(
+        (
+            group,
+            UploadedPathogenGenome(sample=plain_sample, sequence=sequence),
+        )
+    )
+    session.flush()
+    # Newly written sequences are compressed once the setting is on, and both
+    # forms read back as the plain sequence.
+    monkeypatch.setattr(sequence_utils, "COMPRESS_SEQUENCES", True)
+    session.add(UploadedPathogenGenome(sample=compressed_sample, sequence=sequence))
+    session.commit()
+
+    stored = session.execute(
+        sa.text(
+            "SELECT sequence, num_unambiguous_sites, num_missing_alleles, num_mixed"
+            " FROM aspen.pathogen_genomes ORDER BY entity_id"
+        )
+    ).all()
+    assert stored[0] == (sequence, 8, 3, 11)
+    assert stored[1][0].startswith(sequence_utils.COMPRESSED_PREFIX)
+    assert stored[1][1:] == (8, 3, 11)
+
+    session.expire_all()
+    genomes = (
+        session.query(UploadedPathogenGenome)
+        .options(undefer(UploadedPathogenGenome.sequence))
+        .all()
+    )
+    assert [genome.sequence for genome in genomes] == [sequence, sequence]
+
+    # The backfill recomputes stats and compresses everything in place.
+    session.execute(
+        sa.text("UPDATE aspen.pathogen_genomes SET num_unambiguous_sites = 0")
+    )
+    session.commit()
+    assert sequence_utils.backfill_sequences(session, batch_size=1, compress=True) == 2
+    stored = session.execute(
+        sa.text("SELECT sequence, num_unambiguous_sites FROM aspen.pathogen_genomes")
+    ).all()
+    for stored_sequence, num_unambiguous_sites in stored:
+        assert sequence_utils.decompress_sequence(stored_sequence) == sequence
+        assert stored_sequence.startswith(sequence_utils.COMPRESSED_PREFIX)
+        assert num_unambiguous_sites == 8
@@ -46,7 +46,7 @@ _WorkflowStatusTypeTable = enumtables.EnumTable(
 WorkflowInputs = Table(
     "workflow_inputs",
     base.metadata,  # type: ignore
-    Column("entity_id", ForeignKey(Entity.id), primary_key=True),
+    Column("entity_id", ForeignKey(Entity.id, ondelete="CASCADE"), primary_key=True),
     Column("workflow_id", ForeignKey(f"{_WORKFLOW_TABLENAME}.id"), primary_key=True),
 )
 
@@ -0,0 +1,124 @@
+"""Request-scoped SQL profiling.
+
+`profile_queries()` starts collecting every statement run (by any engine) in the
+current context, until it exits. Statements are grouped by a normalized
+fingerprint -- literals, bind parameters and IN lists collapsed -- so a handler that
+runs the same query once per row (the classic N+1) stands out as one fingerprint
+with a very high count, instead of thousands of slightly different statements.
+"""
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Dict, Generator, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Every profile that's collecting in this context. Profiles can nest (e.g. a test's
+# query budget around a request that's being profiled by our middleware).
+_active_profiles: ContextVar[Tuple["QueryProfile", ...]] = ContextVar(
+    "active_query_profiles", default=()
+)
+
+_NORMALIZERS = [
+    (re.compile(r"--[^\n]*"), ""),
+    (re.compile(r"/\*.*?\*/", re.S), ""),
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    # asyncpg ($1), psycopg2 (%(name)s / %s) and sqlalchemy text (:name) params.
+    (re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):\w+"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\s+"), " "),
+    # IN (?, ?, ?) and multi-row VALUES (?, ?), (?, ?) vary in length.
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(?)"),
+    (re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+"), "(?)"),
+]
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(statement: str) -> str:
+    for pattern, replacement in _NORMALIZERS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+class QueryProfile:
+    def __init__(self):
+        self.statements = 0
+        self.total_time = 0.0
+        # fingerprint -> [count, total seconds]
+        self._fingerprints: Dict[str, List[Any]] = {}
+
+    def record(self, statement: str, duration: float) -> None:
+        self.statements += 1
+        self.total_time += duration
+        stats = self._fingerprints.setdefault(fingerprint(statement), [0, 0.0])
+        stats[0] += 1
+        stats[1] += duration
+
+    def top(self, limit: int = 5) -> List[Dict[str, Any]]:
+        ranked = sorted(
+            self._fingerprints.items(), key=lambda item: item[1][0], reverse=True
+        )
+        return [
+            {"fingerprint": sql, "count": count, "time_ms": round(seconds * 1000, 2)}
+            for sql, (count, seconds) in ranked[:limit]
+        ]
+
+    def n_plus_one_suspects(self, threshold: int) -> List[Dict[str, Any]]:
+        """Fingerprints that ran at least `threshold` times."""
+        return [
+            entry
+            for entry in self.top(len(self._fingerprints))
+            if entry["count"] >= threshold
+        ]
+
+    def summary(self, n_plus_one_threshold: int, top: int = 5) -> Dict[str, Any]:
+        return {
+            "statements": self.statements,
+            "db_time_ms": round(self.total_time * 1000, 2),
+            "distinct_statements": len(self._fingerprints),
+            "top": self.top(top),
+            "n_plus_one_suspects": self.n_plus_one_suspects(n_plus_one_threshold),
+        }
+
+    def header_value(self, n_plus_one_threshold: int) -> str:
+        suspects = len(self.n_plus_one_suspects(n_plus_one_threshold))
+        return (
+            f"statements={self.statements}; "
+            f"db_ms={self.total_time * 1000:.1f}; "
+            f"n_plus_one={suspects}"
+        )
+
+
+@contextmanager
+def profile_queries() -> Generator[QueryProfile, None, None]:
+    profile = QueryProfile()
+    token = _active_profiles.set(_active_profiles.get() + (profile,))
+    try:
+        yield profile
+    finally:
+        _active_profiles.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _active_profiles.get():
+        context._aspen_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_aspen_query_start", None)
+    if start is None:
+        return
+    duration = time.perf_counter() - start
+    for profile in _active_profiles.get():
+        profile.record(statement, duration)
+
+
+def install_query_profiler() -> None:
+    """Hooks every engine (sync, or the sync half of an async one). Until something
+    calls profile_queries() the hooks only check a context var."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
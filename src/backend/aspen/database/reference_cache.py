@@ -0,0 +1,361 @@
+"""Per-worker cache of the reference tables that almost every request looks up.
+
+Pathogens, public repositories, pathogen repo configs and locations only change
+when the import workflows run, a few times a year, but the API resolves some of them
+on every request. `ReferenceDataCache` keeps a detached copy of all of them (loaded
+when the worker starts) and hands out session-local copies with
+`session.merge(obj, load=False)`, which doesn't touch the database.
+
+The cache is kept up to date three ways:
+
+- the workflows that change these tables call `invalidate_reference_cache_sync`,
+  which tells every worker (via a Postgres NOTIFY) to reload before its next lookup;
+- `run_refresher` periodically compares a signature of the tables (a sum of row
+  hashes) with the one that was loaded, and reloads when they differ;
+- a lookup that misses, e.g. a location added since the last load, falls back to the
+  database and caches what it finds.
+"""
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import asyncpg
+import sqlalchemy as sa
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload, Session
+
+from aspen.database.models import (
+    Location,
+    Pathogen,
+    PathogenLineage,
+    PathogenRepoConfig,
+    PublicRepository,
+    UsherOption,
+)
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_CACHE_CHANNEL = "aspen_reference_cache"
+CACHED_MODELS = (Pathogen, PublicRepository, PathogenRepoConfig, Location)
+# Tables we don't keep rows for, but whose payloads are memoized per data version
+# (see `get_payload`).
+VERSIONED_MODELS = CACHED_MODELS + (PathogenLineage, UsherOption)
+
+
+def _table_signature(model: Any) -> Any:
+    # Sum of a hash of every row, so any insert, delete or update changes it. These
+    # tables are small enough for that to take a few milliseconds.
+    row = model.__table__.alias("signature_row")
+    return (
+        sa.select(
+            sa.func.sum(sa.func.hashtext(sa.literal_column("signature_row::text")))
+        )
+        .select_from(row)
+        .scalar_subquery()
+    )
+
+
+# One row, with one column per table.
+SIGNATURE_QUERY = sa.select(  # type: ignore
+    *[_table_signature(model) for model in VERSIONED_MODELS]
+)
+
+
+class ReferenceDataCache:
+    def __init__(self) -> None:
+        # Detached rows. Repo configs have their pathogen and public_repository loaded.
+        self._pathogens: Dict[str, Pathogen] = {}
+        self._repositories: Dict[str, PublicRepository] = {}
+        self._repo_configs: Dict[Tuple[int, str], PathogenRepoConfig] = {}
+        self._locations: Dict[int, Location] = {}
+        # (key, params) -> whatever a view built from this version of the data.
+        self._payloads: Dict[Any, Any] = {}
+        self.signature: Optional[Tuple[Any, ...]] = None
+        # Bumped by every load.
+        self.version = 0
+        self.stale = True
+        # Bumped by every invalidation, so one that arrives mid-load isn't lost.
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._load_lock: Optional[asyncio.Lock] = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.invalidations = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.invalidations += 1
+            self._generation += 1
+            self.stale = True
+
+    async def load(self, engine: AsyncEngine) -> None:
+        """Replaces the cached rows with a fresh copy of every table."""
+        with self._lock:
+            generation = self._generation
+        # Load in a throwaway session, so the cached copies are never attached to
+        # (or modified by) any one request.
+        async with AsyncSession(engine, expire_on_commit=False) as loader:
+            signature = tuple((await loader.execute(SIGNATURE_QUERY)).one())
+            pathogens = (await loader.execute(sa.select(Pathogen))).scalars().all()  # type: ignore
+            repositories = (await loader.execute(sa.select(PublicRepository))).scalars().all()  # type: ignore
+            repo_configs = (
+                (
+                    await loader.execute(
+                        sa.select(PathogenRepoConfig).options(  # type: ignore
+                            joinedload(PathogenRepoConfig.public_repository),
+                            joinedload(PathogenRepoConfig.pathogen),
+                        )
+                    )
+                )
+                .scalars()
+                .all()
+            )
+            locations = (await loader.execute(sa.select(Location))).scalars().all()  # type: ignore
+        with self._lock:
+            self._pathogens = {pathogen.slug: pathogen for pathogen in pathogens}
+            self._repositories = {repo.name: repo for repo in repositories}
+            self._repo_configs = {
+                (config.pathogen_id, config.public_repository.name): config
+                for config in repo_configs
+            }
+            self._locations = {location.id: location for location in locations}
+            self._payloads = {}
+            self.signature = signature
+            self.version += 1
+            self.reloads += 1
+            if generation == self._generation:
+                self.stale = False
+
+    async def ensure_loaded(self, engine: AsyncEngine) -> None:
+        if not self.stale:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            # Another request may have reloaded while we waited for the lock.
+            if self.stale:
+                await self.load(engine)
+
+    async def refresh_if_changed(self, engine: AsyncEngine) -> bool:
+        """Reloads if the tables' signature changed since we loaded them."""
+        async with engine.connect() as conn:
+            signature = tuple((await conn.execute(SIGNATURE_QUERY)).one())
+        if signature == self.signature and not self.stale:
+            return False
+        self.invalidate()
+        await self.ensure_loaded(engine)
+        return True
+
+    def _get(self, store: Dict, key: Any) -> Any:
+        with self._lock:
+            value = store.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def _put(self, store: Dict, key: Any, value: Any) -> None:
+        with self._lock:
+            store[key] = value
+
+    def pathogens(self) -> List[Pathogen]:
+        """Every cached pathogen, detached. Don't modify them."""
+        with self._lock:
+            return sorted(self._pathogens.values(), key=lambda row: row.id)
+
+    def locations(self) -> List[Location]:
+        """Every cached location, detached. Don't modify them."""
+        with self._lock:
+            return sorted(self._locations.values(), key=lambda row: row.id)
+
+    def get_payload(self, key: Any) -> Any:
+        with self._lock:
+            return self._payloads.get(key)
+
+    def put_payload(self, key: Any, version: int, payload: Any) -> None:
+        """Memoizes something built from data version `version`, until the next
+        load. It's dropped if the data was reloaded while it was being built."""
+        with self._lock:
+            if version == self.version:
+                self._payloads[key] = payload
+
+    async def get_pathogen(
+        self, session: AsyncSession, slug: str
+    ) -> Optional[Pathogen]:
+        await self.ensure_loaded(session.bind)
+        pathogen = self._get(self._pathogens, slug)
+        if pathogen is None:
+            async with AsyncSession(session.bind, expire_on_commit=False) as loader:
+                pathogen = (
+                    await loader.execute(sa.select(Pathogen).where(Pathogen.slug == slug))  # type: ignore
+                ).scalar_one_or_none()
+            if pathogen is None:
+                return None
+            self._put(self._pathogens, slug, pathogen)
+        return await session.merge(pathogen, load=False)
+
+    async def get_public_repository(
+        self, session: AsyncSession, name: str
+    ) -> Optional[PublicRepository]:
+        await self.ensure_loaded(session.bind)
+        repo = self._get(self._repositories, name)
+        if repo is None:
+            async with AsyncSession(session.bind, expire_on_commit=False) as loader:
+                repo = (
+                    await loader.execute(sa.select(PublicRepository).filter_by(name=name))  # type: ignore
+                ).scalar_one_or_none()
+            if repo is None:
+                return None
+            self._put(self._repositories, name, repo)
+        return await session.merge(repo, load=False)
+
+    async def get_pathogen_repo_config(
+        self, session: AsyncSession, pathogen: Pathogen, repository_name: str
+    ) -> Optional[PathogenRepoConfig]:
+        await self.ensure_loaded(session.bind)
+        key = (pathogen.id, repository_name)
+        config = self._get(self._repo_configs, key)
+        if config is None:
+            async with AsyncSession(session.bind, expire_on_commit=False) as loader:
+                config = (
+                    await loader.execute(
+                        sa.select(PathogenRepoConfig)  # type: ignore
+                        .join(PathogenRepoConfig.public_repository)
+                        .options(
+                            contains_eager(PathogenRepoConfig.public_repository),
+                            joinedload(PathogenRepoConfig.pathogen),
+                        )
+                        .where(
+                            PathogenRepoConfig.pathogen_id == pathogen.id,
+                            PublicRepository.name == repository_name,
+                        )
+                    )
+                ).scalar_one_or_none()
+            if config is None:
+                return None
+            self._put(self._repo_configs, key, config)
+        return await session.merge(config, load=False)
+
+    async def get_locations(
+        self, session: AsyncSession, location_ids: Iterable[int]
+    ) -> Dict[int, Location]:
+        """The locations that exist out of `location_ids`, attached to `session`.
+        Any we don't have cached are looked up with a single query."""
+        await self.ensure_loaded(session.bind)
+        cached: Dict[int, Location] = {}
+        missing = set()
+        with self._lock:
+            for location_id in set(location_ids) - {None}:
+                location = self._locations.get(location_id)
+                if location is None:
+                    missing.add(location_id)
+                else:
+                    cached[location_id] = location
+            self.hits += len(cached)
+            self.misses += len(missing)
+        if missing:
+            async with AsyncSession(session.bind, expire_on_commit=False) as loader:
+                found = (
+                    (await loader.execute(sa.select(Location).where(Location.id.in_(missing))))  # type: ignore
+                    .scalars()
+                    .all()
+                )
+            with self._lock:
+                for location in found:
+                    self._locations[location.id] = location
+                    cached[location.id] = location
+        return {
+            location_id: await session.merge(location, load=False)
+            for location_id, location in cached.items()
+        }
+
+    async def get_location(
+        self, session: AsyncSession, location_id: int
+    ) -> Optional[Location]:
+        return (await self.get_locations(session, [location_id])).get(location_id)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "invalidations": self.invalidations,
+            "pathogens": len(self._pathogens),
+            "public_repositories": len(self._repositories),
+            "pathogen_repo_configs": len(self._repo_configs),
+            "locations": len(self._locations),
+            "payloads": len(self._payloads),
+        }
+
+
+# One cache per engine, like the auth cache: in production that's one per worker.
+_caches: "weakref.WeakKeyDictionary[Engine, ReferenceDataCache]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def reference_cache_for(
+    bind: Union[AsyncSession, AsyncEngine, Session, Engine]
+) -> ReferenceDataCache:
+    """The cache for the engine behind a session (or the engine itself)."""
+    if isinstance(bind, (AsyncSession, Session)):
+        bind = bind.bind
+    engine = getattr(bind, "sync_engine", bind)
+    cache = _caches.get(engine)
+    if cache is None:
+        cache = ReferenceDataCache()
+        _caches[engine] = cache
+    return cache
+
+
+def handle_invalidation(payload: str = "") -> None:
+    """Marks every cache in this process stale."""
+    for cache in list(_caches.values()):
+        cache.invalidate()
+
+
+async def invalidate_reference_cache(db: AsyncSession) -> None:
+    """Makes every worker reload its reference data. The NOTIFY is transactional,
+    so other workers hear about it when `db` commits."""
+    handle_invalidation()
+    await db.execute(sa.select(sa.func.pg_notify(REFERENCE_CACHE_CHANNEL, "")))
+
+
+def invalidate_reference_cache_sync(db: Session) -> None:
+    """Same as `invalidate_reference_cache`, for workflows that use sync sessions."""
+    handle_invalidation()
+    db.execute(sa.select(sa.func.pg_notify(REFERENCE_CACHE_CHANNEL, "")))
+
+
+async def listen_for_invalidations(conn: asyncpg.Connection) -> None:
+    """Applies invalidations sent by other processes, on an existing LISTEN
+    connection."""
+    await conn.add_listener(
+        REFERENCE_CACHE_CHANNEL,
+        lambda _conn, _pid, _channel, payload: handle_invalidation(payload),
+    )
+
+
+async def run_refresher(engine: AsyncEngine, interval: float) -> None:
+    """Checks the tables' signature every `interval` seconds until cancelled."""
+    cache = reference_cache_for(engine)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await cache.refresh_if_changed(engine):
+                logger.info("Reference data changed, reloaded the cache")
+        except Exception:
+            logger.exception("Could not refresh the reference data cache")
+
+
+def reference_cache_stats() -> Dict[str, float]:
+    totals: Dict[str, float] = {}
+    for cache in list(_caches.values()):
+        for key, value in cache.stats().items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
@@ -0,0 +1,40 @@
+import sqlalchemy as sa
+
+from aspen.database.query_profile import (
+    fingerprint,
+    install_query_profiler,
+    profile_queries,
+)
+
+
+def test_fingerprint():
+    assert fingerprint(
+        "SELECT * FROM aspen.samples WHERE id IN ($1, $2, $3) AND name = 'x'"
+    ) == fingerprint("SELECT *  FROM aspen.samples\nWHERE id IN ($1) AND name = 'y'")
+    assert fingerprint("SELECT 1 -- comment") == "SELECT ?"
+    assert fingerprint(
+        "INSERT INTO t (a, b) VALUES (%(a_1)s, %(b_1)s), (%(a_2)s, %(b_2)s)"
+    ) == ("INSERT INTO t (a, b) VALUES (?)")
+    assert fingerprint("SELECT '[]'::jsonb, :param") == "SELECT ?::jsonb, ?"
+
+
+def test_profile_queries():
+    install_query_profiler()
+    engine = sa.create_engine("sqlite://")
+    with engine.connect() as conn:
+        conn.execute(sa.text("SELECT 1"))  # Not profiled.
+        with profile_queries() as outer:
+            for i in range(12):
+                conn.execute(sa.text("SELECT :i"), {"i": i})
+            with profile_queries() as inner:
+                conn.execute(sa.text("SELECT 'x', 'y'"))
+    assert outer.statements == 13
+    assert inner.statements == 1
+    assert outer.top(1)[0]["fingerprint"] == "SELECT ?"
+    assert outer.top(1)[0]["count"] == 12
+    assert [s["count"] for s in outer.n_plus_one_suspects(10)] == [12]
+    assert inner.n_plus_one_suspects(10) == []
+    summary = outer.summary(10)
+    assert summary["statements"] == 13
+    assert summary["distinct_statements"] == 2
+    assert outer.header_value(10).startswith("statements=13; db_ms=")
@@ -0,0 +1,39 @@
+from contextlib import contextmanager
+from typing import Callable, ContextManager, Generator, Optional
+
+import pytest
+
+from aspen.database.query_profile import (
+    install_query_profiler,
+    profile_queries,
+    QueryProfile,
+)
+
+
+@pytest.fixture()
+def query_budget() -> Callable[..., ContextManager[QueryProfile]]:
+    """Fails the test if the code inside the block runs more than `max_statements`
+    statements, or (with `max_repeats`) any one statement more than that many times.
+
+        with query_budget(10, max_repeats=2):
+            res = await http_client.get(...)
+    """
+    install_query_profiler()
+
+    @contextmanager
+    def budget(
+        max_statements: int, max_repeats: Optional[int] = None
+    ) -> Generator[QueryProfile, None, None]:
+        with profile_queries() as profile:
+            yield profile
+        assert profile.statements <= max_statements, (
+            f"Ran {profile.statements} statements, budget is {max_statements}."
+            f" Most frequent: {profile.top()}"
+        )
+        if max_repeats is not None:
+            repeated = profile.n_plus_one_suspects(max_repeats + 1)
+            assert (
+                not repeated
+            ), f"Statements repeated more than {max_repeats} times: {repeated}"
+
+    return budget
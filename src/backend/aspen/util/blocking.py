@@ -0,0 +1,194 @@
+"""Bounded thread pools for the blocking network calls our async code has to make.
+
+boto3 (S3, Step Functions) and the Auth0 management client only have synchronous
+APIs. Calling them directly from an async handler stalls every other request on
+the worker until they return, so they go through `run_blocking` instead, which runs
+them on a small per-service thread pool:
+
+    data = await run_blocking("s3", read_object, bucket, key)
+
+Each pool has a fixed number of threads, a limit on how many calls may be queued
+or running at once (beyond which we fail fast with `BlockingPoolFull` instead of
+queueing forever) and a timeout for how long the caller waits. A call that times
+out keeps its thread until the library gives up, which is why our boto clients also
+get connect/read timeouts (see `BOTO_TIMEOUTS`).
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from aspen.util.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Passed to boto3.session.Config, so a hung connection can't hold a thread forever.
+BOTO_TIMEOUTS: Dict[str, Any] = {
+    "connect_timeout": 5,
+    "read_timeout": 60,
+    "retries": {"max_attempts": 3},
+}
+
+CALLS = REGISTRY.counter(
+    "aspen_blocking_calls_total",
+    "Blocking calls run on a thread pool, by outcome",
+    ["pool", "outcome"],
+)
+CALL_DURATION = REGISTRY.histogram(
+    "aspen_blocking_call_duration_seconds",
+    "Time blocking calls spent running on their pool's threads",
+    ["pool"],
+)
+QUEUE_WAIT = REGISTRY.histogram(
+    "aspen_blocking_call_queue_seconds",
+    "Time blocking calls waited for a free thread",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+PENDING = REGISTRY.gauge(
+    "aspen_blocking_calls_pending",
+    "Blocking calls queued or running",
+    ["pool"],
+)
+
+
+class BlockingCallError(Exception):
+    pass
+
+
+class BlockingPoolFull(BlockingCallError):
+    pass
+
+
+class BlockingCallTimeout(BlockingCallError):
+    pass
+
+
+class BlockingPool:
+    def __init__(
+        self, name: str, max_workers: int, max_pending: int, timeout: float
+    ) -> None:
+        self.name = name
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"blocking-{name}"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _release(self, _: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+        PENDING.dec(pool=self.name)
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        with self._lock:
+            if self._pending >= self.max_pending:
+                CALLS.inc(pool=self.name, outcome="rejected")
+                raise BlockingPoolFull(
+                    f"Too many {self.name} calls in progress, try again later"
+                )
+            self._pending += 1
+        PENDING.inc(pool=self.name)
+        queued_at = time.perf_counter()
+
+        def call() -> T:
+            start = time.perf_counter()
+            QUEUE_WAIT.observe(start - queued_at, pool=self.name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                CALL_DURATION.observe(time.perf_counter() - start, pool=self.name)
+
+        future = self._executor.submit(call)
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(
+        self,
+        fn: Callable[..., T],
+        *args: Any,
+        timeout: Optional[float] = None,
+        **kwargs: Any,
+    ) -> T:
+        future = self.submit(fn, *args, **kwargs)
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            CALLS.inc(pool=self.name, outcome="timeout")
+            raise BlockingCallTimeout(
+                f"{self.name} call took longer than {timeout} seconds"
+            )
+        except Exception:
+            CALLS.inc(pool=self.name, outcome="error")
+            raise
+        CALLS.inc(pool=self.name, outcome="ok")
+        return result
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+_pool_settings: Dict[str, Any] = {"max_workers": 8, "max_pending": 64, "timeout": 60}
+_pools: Dict[str, BlockingPool] = {}
+_pools_lock = threading.Lock()
+
+
+def configure_blocking_pools(
+    max_workers: int, max_pending: int, timeout: float
+) -> None:
+    """Settings for every pool; pools that already exist are replaced."""
+    with _pools_lock:
+        _pool_settings.update(
+            max_workers=max_workers, max_pending=max_pending, timeout=timeout
+        )
+        old_pools = list(_pools.values())
+        _pools.clear()
+    for pool in old_pools:
+        pool.shutdown()
+
+
+def get_blocking_pool(name: str) -> BlockingPool:
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = BlockingPool(name, **_pool_settings)
+        return _pools[name]
+
+
+async def run_blocking(
+    pool: str,
+    fn: Callable[..., T],
+    *args: Any,
+    timeout: Optional[float] = None,
+    **kwargs: Any,
+) -> T:
+    """Runs fn(*args, **kwargs) on the named pool and waits for its result."""
+    return await get_blocking_pool(pool).run(fn, *args, timeout=timeout, **kwargs)
+
+
+def _log_failure(pool: str, future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        CALLS.inc(pool=pool, outcome="error")
+        logger.error("Background %s call failed", pool, exc_info=future.exception())
+    else:
+        CALLS.inc(pool=pool, outcome="ok")
+
+
+def submit_blocking(
+    pool: str, fn: Callable[..., Any], *args: Any, **kwargs: Any
+) -> Optional[Future]:
+    """Fire and forget: runs fn on the named pool without waiting for it. Failures,
+    including being turned away by a full pool, are logged rather than raised."""
+    try:
+        future = get_blocking_pool(pool).submit(fn, *args, **kwargs)
+    except BlockingPoolFull:
+        logger.exception("Could not start background %s call", pool)
+        return None
+    future.add_done_callback(lambda f: _log_failure(pool, f))
+    return future
@@ -0,0 +1,400 @@
+"""A small Prometheus-style metrics registry that works across worker processes.
+
+Metrics are created once at import time (`REGISTRY.counter(...)` etc.) and updated
+from anywhere in the process. `render()` produces the Prometheus text exposition
+format.
+
+gunicorn runs several worker processes, and a scrape only reaches one of them. When
+METRICS_DIR is set, every worker periodically dumps its metrics to
+METRICS_DIR/<pid>.json (see `run_reporter`), and whichever worker serves the
+scrape merges all of those files: counters and histograms are summed, and gauges
+are summed or maxed (per metric) over the workers that are still alive. gunicorn's
+child_exit hook calls `mark_process_dead`, which drops a dead worker's gauges but
+keeps its counts, so counters never go backwards when a worker is recycled.
+"""
+import asyncio
+import bisect
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR_ENV = "METRICS_DIR"
+
+# Request latency style buckets, in seconds.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def dump(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = [
+                [list(key), self._dump_value(value)]
+                for key, value in self._values.items()
+            ]
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": samples,
+        }
+
+    def _dump_value(self, value: Any) -> Any:
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        multiprocess_mode: str = "sum",
+    ):
+        if multiprocess_mode not in ("sum", "max"):
+            raise ValueError(f"Unknown multiprocess_mode {multiprocess_mode}")
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess_mode = multiprocess_mode
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def dump(self) -> Dict[str, Any]:
+        return {**super().dump(), "mode": self.multiprocess_mode}
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            # Per-bucket (not cumulative) counts, the last one being +Inf, then sum.
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def _dump_value(self, value: Any) -> Any:
+        return [list(value[0]), value[1]]
+
+    def dump(self) -> Dict[str, Any]:
+        return {**super().dump(), "buckets": list(self.buckets)}
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Re-registering (e.g. the module got reloaded) returns the original.
+                if type(existing) is not type(metric):
+                    raise ValueError(f"{metric.name} is already a {existing.type}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        multiprocess_mode: str = "sum",
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, multiprocess_mode))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def dump(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.dump() for metric in metrics}
+
+    def clear(self) -> None:
+        """Resets every value, keeping the metrics themselves. For tests."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+
+def metrics_dir() -> Optional[str]:
+    return os.environ.get(METRICS_DIR_ENV) or None
+
+
+def _process_file(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"{pid}.json")
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    # Write + rename, so readers never see a half written file.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as fh:
+        json.dump(data, fh)
+    os.replace(tmp_path, path)
+
+
+def write_process_metrics(
+    directory: Optional[str] = None, registry: Registry = REGISTRY
+) -> None:
+    """Dumps this process' metrics into the shared metrics dir, if there is one."""
+    directory = directory or metrics_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    pid = os.getpid()
+    _write_json(
+        _process_file(directory, pid),
+        {"pid": pid, "alive": True, "metrics": registry.dump()},
+    )
+
+
+def mark_process_dead(pid: int, directory: Optional[str] = None) -> None:
+    """Drops a dead worker's gauges. Its counters and histograms stay, so the
+    merged totals don't go backwards."""
+    directory = directory or metrics_dir()
+    if not directory:
+        return
+    path = _process_file(directory, pid)
+    try:
+        with open(path) as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return
+    data["alive"] = False
+    data["metrics"] = {
+        name: metric
+        for name, metric in data["metrics"].items()
+        if metric["type"] != "gauge"
+    }
+    _write_json(path, data)
+
+
+def clear_metrics_dir(directory: Optional[str] = None) -> None:
+    """Removes the files left behind by a previous run of the server."""
+    directory = directory or metrics_dir()
+    if not directory or not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename.endswith(".json") or filename.endswith(".tmp"):
+            os.remove(os.path.join(directory, filename))
+
+
+def _read_dumps(directory: str) -> List[Dict[str, Any]]:
+    dumps = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as fh:
+                dumps.append(json.load(fh)["metrics"])
+        except (OSError, ValueError, KeyError):
+            # A worker may be replacing its file right now; it'll be there next time.
+            logger.warning("Could not read metrics file %s", filename)
+    return dumps
+
+
+def merge(dumps: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {}
+    for dump in dumps:
+        for name, metric in dump.items():
+            if name not in merged:
+                merged[name] = {
+                    **{k: v for k, v in metric.items() if k != "samples"},
+                    "values": {},
+                }
+            values = merged[name]["values"]
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                if key not in values:
+                    values[key] = copy.deepcopy(value)
+                elif metric["type"] == "histogram":
+                    counts, total = values[key]
+                    values[key] = [
+                        [a + b for a, b in zip(counts, value[0])],
+                        total + value[1],
+                    ]
+                elif metric.get("mode") == "max":
+                    values[key] = max(values[key], value)
+                else:
+                    values[key] += value
+    return merged
+
+
+def collect(registry: Registry = REGISTRY) -> Dict[str, Any]:
+    """Every worker's metrics (or just ours, without a metrics dir), merged."""
+    directory = metrics_dir()
+    if not directory:
+        return merge([registry.dump()])
+    write_process_metrics(directory, registry)
+    return merge(_read_dumps(directory))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(merged: Dict[str, Any]) -> str:
+    """Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        labelnames = metric["labelnames"]
+        lines.append(f"# HELP {name} {_escape(metric['help'])}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for labels, value in sorted(metric["values"].items()):
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(labelnames, labels)} {_number(value)}")
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], float("inf")], counts):
+                cumulative += count
+                bucket_labels = _labels(
+                    [*labelnames, "le"], [*labels, _number(float(bound))]
+                )
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labelnames, labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labelnames, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+EVENT_LOOP_LAG = REGISTRY.gauge(
+    "aspen_event_loop_lag_seconds",
+    "How late the event loop woke up our last timer (worst worker)",
+    multiprocess_mode="max",
+)
+EVENT_LOOP_LAG_HISTOGRAM = REGISTRY.histogram(
+    "aspen_event_loop_lag_distribution_seconds",
+    "How late the event loop woke up our timers",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+
+async def run_reporter(interval: float = 1.0, flush_every: int = 5) -> None:
+    """Samples event loop lag every `interval` seconds, and writes our metrics to
+    the metrics dir every `flush_every` samples. Runs until cancelled."""
+    samples = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.perf_counter() - start - interval)
+            EVENT_LOOP_LAG.set(lag)
+            EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
+            samples += 1
+            if samples % flush_every == 0:
+                try:
+                    write_process_metrics()
+                except OSError:
+                    logger.exception("Could not write metrics")
+    finally:
+        try:
+            write_process_metrics()
+        except OSError:
+            logger.exception("Could not write metrics")
@@ -0,0 +1,140 @@
+import base64
+import os
+import zlib
+from typing import NamedTuple
+
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+# Set COMPRESS_SEQUENCES=true to store newly written sequences compressed. Reads
+# always handle both forms, so this can be switched on (or off) at any time.
+COMPRESS_SEQUENCES = os.environ.get("COMPRESS_SEQUENCES", "").lower() == "true"
+
+# Compressed sequences are stored as this prefix + base64(zlib(sequence)). "~" never
+# shows up in a FASTA file, so anything without the prefix is a plain sequence.
+COMPRESSED_PREFIX = "~z1:"
+
+
+class SequenceStats(NamedTuple):
+    num_unambiguous_sites: int
+    num_missing_alleles: int
+    num_mixed: int
+
+
+def _site_classes() -> bytes:
+    # Maps every byte to the kind of site it represents: u(nambiguous), n (missing),
+    # - (gap) or m(ixed). Anything we don't recognize counts as mixed.
+    table = bytearray(b"m" * 256)
+    for base in b"ACTGU":
+        table[base] = ord("u")
+    table[ord("N")] = ord("n")
+    table[ord("-")] = ord("-")
+    return bytes(table)
+
+
+SITE_CLASSES = _site_classes()
+
+
+def sequence_stats(sequence: str) -> SequenceStats:
+    """Counts unambiguous, missing and mixed sites in a single pass over the sequence.
+
+    Every character is translated to its site class in C, then we just count the
+    classes, rather than looping over the characters in Python once per statistic.
+    """
+    # latin-1 keeps one byte per character; anything it can't encode becomes "?",
+    # which counts as mixed, same as the original character would.
+    sites = sequence.encode("latin-1", "replace").translate(SITE_CLASSES)
+    num_unambiguous_sites = sites.count(b"u")
+    num_missing_alleles = sites.count(b"n")
+    num_mixed = (
+        len(sites) - num_unambiguous_sites - num_missing_alleles - sites.count(b"-")
+    )
+    return SequenceStats(num_unambiguous_sites, num_missing_alleles, num_mixed)
+
+
+def is_compressed(value: str) -> bool:
+    return value.startswith(COMPRESSED_PREFIX)
+
+
+def compress_sequence(sequence: str) -> str:
+    if is_compressed(sequence):
+        return sequence
+    compressed = zlib.compress(sequence.encode("utf-8"), 9)
+    return COMPRESSED_PREFIX + base64.b64encode(compressed).decode("ascii")
+
+
+def decompress_sequence(value: str) -> str:
+    if not is_compressed(value):
+        return value
+    compressed = base64.b64decode(value[len(COMPRESSED_PREFIX) :])
+    return zlib.decompress(compressed).decode("utf-8")
+
+
+def encode_sequence(sequence: str) -> str:
+    """The form a sequence should be stored in, per COMPRESS_SEQUENCES."""
+    if COMPRESS_SEQUENCES:
+        return compress_sequence(sequence)
+    return sequence
+
+
+# Just the columns we need, with a plain String `sequence` so we see (and write)
+# exactly what's stored.
+_pathogen_genomes = sa.table(
+    "pathogen_genomes",
+    sa.column("entity_id", sa.Integer),
+    sa.column("sequence", sa.String),
+    sa.column("num_unambiguous_sites", sa.Integer),
+    sa.column("num_missing_alleles", sa.Integer),
+    sa.column("num_mixed", sa.Integer),
+    schema="aspen",
+)
+
+
+def backfill_sequences(
+    session: Session, batch_size: int = 1000, compress: bool = False
+) -> int:
+    """Recomputes the stats for every stored sequence, optionally compressing them.
+
+    Rows are walked in primary key order, batch_size at a time, and each batch is
+    written back with one executemany UPDATE and committed, so this can be stopped
+    and re-run at any point. Returns the number of rows updated.
+    """
+    table = _pathogen_genomes
+    updated = 0
+    last_id = 0
+    while True:
+        rows = session.execute(
+            sa.select(table.c.entity_id, table.c.sequence)
+            .where(table.c.entity_id > last_id)
+            .order_by(table.c.entity_id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return updated
+        values = []
+        for entity_id, stored in rows:
+            sequence = decompress_sequence(stored)
+            stats = sequence_stats(sequence)
+            values.append(
+                {
+                    "b_entity_id": entity_id,
+                    "b_sequence": compress_sequence(sequence) if compress else stored,
+                    "b_num_unambiguous_sites": stats.num_unambiguous_sites,
+                    "b_num_missing_alleles": stats.num_missing_alleles,
+                    "b_num_mixed": stats.num_mixed,
+                }
+            )
+        session.execute(
+            table.update()
+            .where(table.c.entity_id == sa.bindparam("b_entity_id"))
+            .values(
+                sequence=sa.bindparam("b_sequence"),
+                num_unambiguous_sites=sa.bindparam("b_num_unambiguous_sites"),
+                num_missing_alleles=sa.bindparam("b_num_missing_alleles"),
+                num_mixed=sa.bindparam("b_num_mixed"),
+            ),
+            values,
+        )
+        session.commit()
+        updated += len(rows)
+        last_id = rows[-1].entity_id
@@ -1,12 +1,26 @@
 import datetime
 import json
 import re
+from functools import lru_cache
 from typing import List, Optional
 
 from boto3 import Session
+from botocore.config import Config
 
 from aspen.api.settings import Settings
 from aspen.database.models import Group, PhyloRun
+from aspen.util.blocking import BOTO_TIMEOUTS
+
+
+@lru_cache(maxsize=None)
+def _sfn_client(region: str, endpoint_url: Optional[str]):
+    # boto3 clients are thread safe, so every job shares one.
+    session = Session(region_name=region)
+    return session.client(
+        service_name="stepfunctions",
+        endpoint_url=endpoint_url,
+        config=Config(**BOTO_TIMEOUTS),
+    )
 
 
 class SwipeJob:
@@ -39,11 +53,7 @@ class SwipeJob:
             "RunSPOTVcpu": sfn_params["RunSPOTVcpu"],
         }
 
-        session = Session(region_name=settings.AWS_REGION)
-        client = session.client(
-            service_name="stepfunctions",
-            endpoint_url=settings.BOTO_ENDPOINT_URL or None,
-        )
+        client = _sfn_client(settings.AWS_REGION, settings.BOTO_ENDPOINT_URL or None)
 
         execution_name = re.sub(r"[^0-9a-zA-Z-]", r"-", execution_name)
 
@@ -58,13 +68,16 @@ class PangolinJob(SwipeJob):
     def get_sfn_config(self):
         return self.settings.AWS_PANGOLIN_SFN_PARAMETERS
 
-    def run(self, group: Group, sample_ids: List[str]):
+    def run(self, group: Optional[Group], sample_ids: List[str]):
         extra_params = {
             "samples": sample_ids,
         }
         now = datetime.datetime.now()
         output_suffix = f"/{str(now)}"
-        execution_name = f"{group.prefix}-ondemand-pangolin-{str(now)}"
+        group_prefix = ""
+        if group is not None:
+            group_prefix = f"{group.prefix}-"
+        execution_name = f"{group_prefix}ondemand-pangolin-{str(now)}"
         return self._start(execution_name, output_suffix, extra_params)
 
 
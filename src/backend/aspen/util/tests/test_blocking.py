@@ -0,0 +1,111 @@
+import asyncio
+import time
+from typing import List
+
+import pytest
+
+from aspen.util.blocking import (
+    BlockingCallTimeout,
+    BlockingPool,
+    BlockingPoolFull,
+    run_blocking,
+    submit_blocking,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+# Stand-ins for S3 and Step Functions that block their thread for a while, like a
+# slow network call would.
+def slow_s3_read(bucket: str, key: str) -> bytes:
+    time.sleep(0.3)
+    return f"{bucket}/{key}".encode()
+
+
+def slow_start_execution(name: str) -> dict:
+    time.sleep(0.3)
+    return {"executionArn": name}
+
+
+class LagMonitor:
+    """Measures how late the event loop runs a timer that should fire every 10ms."""
+
+    def __init__(self) -> None:
+        self.lags: List[float] = []
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            self.lags.append(time.perf_counter() - start - 0.01)
+
+    async def __aenter__(self) -> "LagMonitor":
+        self._task = asyncio.create_task(self._run())
+        await asyncio.sleep(0)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._task.cancel()  # type: ignore
+        try:
+            await self._task  # type: ignore
+        except asyncio.CancelledError:
+            pass
+
+    @property
+    def max_lag(self) -> float:
+        return max(self.lags, default=0.0)
+
+
+async def test_blocking_calls_dont_block_the_loop() -> None:
+    async with LagMonitor() as monitor:
+        results = await asyncio.gather(
+            run_blocking("s3", slow_s3_read, "bucket", "tree.json"),
+            run_blocking("s3", slow_s3_read, "bucket", "other.json"),
+            run_blocking("sfn", slow_start_execution, "run-1"),
+        )
+    assert results == [
+        b"bucket/tree.json",
+        b"bucket/other.json",
+        {"executionArn": "run-1"},
+    ]
+    assert monitor.max_lag < 0.1
+
+    # Calling the same thing directly holds up the loop for the whole call.
+    async with LagMonitor() as monitor:
+        slow_s3_read("bucket", "tree.json")
+        await asyncio.sleep(0.02)
+    assert monitor.max_lag >= 0.25
+
+
+async def test_timeout() -> None:
+    pool = BlockingPool("test-timeout", max_workers=1, max_pending=4, timeout=0.05)
+    with pytest.raises(BlockingCallTimeout):
+        await pool.run(slow_s3_read, "bucket", "key")
+    # A longer timeout for just this call.
+    assert await pool.run(slow_s3_read, "bucket", "key", timeout=5) == b"bucket/key"
+    pool.shutdown()
+
+
+async def test_pool_full() -> None:
+    pool = BlockingPool("test-full", max_workers=1, max_pending=1, timeout=5)
+    first = asyncio.create_task(pool.run(slow_s3_read, "bucket", "key"))
+    await asyncio.sleep(0)
+    with pytest.raises(BlockingPoolFull):
+        await pool.run(slow_s3_read, "bucket", "key")
+    assert await first == b"bucket/key"
+    # Once the first call is done there's room again.
+    assert await pool.run(slow_s3_read, "bucket", "key") == b"bucket/key"
+    pool.shutdown()
+
+
+async def test_submit_blocking_logs_failures(caplog) -> None:
+    def fail() -> None:
+        raise RuntimeError("no step functions here")
+
+    future = submit_blocking("test-submit", fail)
+    assert future is not None
+    with pytest.raises(RuntimeError):
+        await asyncio.wrap_future(future)
+    await asyncio.sleep(0.01)
+    assert "Background test-submit call failed" in caplog.text
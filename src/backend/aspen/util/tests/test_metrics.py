@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from aspen.util import metrics
+
+
+def make_registry():
+    registry = metrics.Registry()
+    requests = registry.counter("requests_total", "Requests", ["route"])
+    in_flight = registry.gauge("in_flight", "In flight")
+    lag = registry.gauge("lag_seconds", "Lag", multiprocess_mode="max")
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    return registry, requests, in_flight, lag, latency
+
+
+def test_render():
+    registry, requests, in_flight, lag, latency = make_registry()
+    requests.inc(route="list_samples")
+    requests.inc(2, route="list_samples")
+    requests.inc(route='weird"route')
+    in_flight.inc()
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5)
+
+    text = metrics.render(metrics.merge([registry.dump()]))
+    lines = text.splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{route="list_samples"} 3.0' in lines
+    assert 'requests_total{route="weird\\"route"} 1.0' in lines
+    assert "in_flight 1.0" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_sum 5.55" in lines
+    assert "latency_seconds_count 3" in lines
+
+
+def test_labels_are_checked():
+    registry, requests, *_ = make_registry()
+    with pytest.raises(ValueError):
+        requests.inc(path="/")
+
+
+def test_merge_across_processes(tmp_path):
+    directory = str(tmp_path)
+    dead_pid = os.getpid() + 1
+
+    # A worker that has since died.
+    registry, requests, in_flight, lag, latency = make_registry()
+    requests.inc(4, route="list_samples")
+    in_flight.inc(2)
+    lag.set(3.0)
+    latency.observe(0.5)
+    metrics._write_json(
+        metrics._process_file(directory, dead_pid),
+        {"pid": dead_pid, "alive": True, "metrics": registry.dump()},
+    )
+    metrics.mark_process_dead(dead_pid, directory)
+
+    # And us.
+    registry, requests, in_flight, lag, latency = make_registry()
+    requests.inc(route="list_samples")
+    in_flight.inc()
+    lag.set(0.25)
+    latency.observe(0.05)
+    metrics.write_process_metrics(directory, registry)
+
+    merged = metrics.merge(metrics._read_dumps(directory))
+    # Counts survive the dead worker, its gauges don't.
+    assert merged["requests_total"]["values"] == {("list_samples",): 5.0}
+    assert merged["in_flight"]["values"] == {(): 1.0}
+    assert merged["lag_seconds"]["values"] == {(): 0.25}
+    assert merged["latency_seconds"]["values"] == {(): [[1, 1, 0], 0.55]}
+
+    metrics.clear_metrics_dir(directory)
+    assert os.listdir(directory) == []
@@ -1,7 +1,11 @@
 import csv
 import datetime
+import functools
 import io
-from typing import Dict, List, Optional, Union
+import re
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 
 import arrow
 import click
@@ -15,6 +19,7 @@ from aspen.database.connection import (
 )
 from aspen.database.models import Pathogen, PublicRepository, PublicRepositoryMetadata
 from aspen.workflows.shared_utils.database import (
+    copy_rows,
     create_temp_table,
     drop_temp_table,
     mv_table_contents,
@@ -70,53 +75,123 @@ def format_values(value: str) -> Optional[str]:
     return None
 
 
+# Nearly every date in these dumps is YYYY, YYYY-MM or YYYY-MM-DD.
+SIMPLE_DATE_RE = re.compile(r"^(\d{4})(?:-(\d{1,2})(?:-(\d{1,2}))?)?$")
+
+
+@functools.lru_cache(maxsize=65536)
+def normalize_date(value: str) -> Optional[str]:
+    """Turns a metadata date into a timestamp string Postgres can parse, or None if
+    it isn't a (complete enough) date. Matches what `arrow.get` used to give us,
+    but without running arrow's parser for the common formats. Dumps repeat the
+    same few thousand dates millions of times, hence the memo."""
+    match = SIMPLE_DATE_RE.match(value)
+    try:
+        if match:
+            year, month, day = match.groups()
+            parsed = datetime.datetime(int(year), int(month or 1), int(day or 1))
+        else:
+            parsed = arrow.get(value).to("UTC").naive
+    except (arrow.parser.ParserError, ValueError):
+        return None  # Date isn't parseable
+    return parsed.isoformat(sep=" ")
+
+
+class PhaseTimer:
+    """Accumulates wall time per named phase, for the import summary."""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = (
+                self.timings.get(name, 0.0) + time.perf_counter() - start
+            )
+
+
+def metadata_rows(
+    data: Iterable[Dict[str, str]],
+    fields_to_import: Dict[str, str],
+    columns: List[str],
+    pathogen_id: int,
+    repository_id: int,
+    timer: PhaseTimer,
+) -> Iterator[List[Optional[Union[str, int]]]]:
+    """Transforms metadata rows into temp table rows, in `columns` order."""
+    file_fields = {
+        table_field: file_field for file_field, table_field in fields_to_import.items()
+    }
+    data_iter = iter(data)
+    while True:
+        with timer.phase("parse"):
+            row = next(data_iter, None)
+            if row is None:
+                return
+            table_row: List[Optional[Union[str, int]]] = []
+            for column in columns:
+                if column == "date":
+                    table_row.append(normalize_date(row["date"].strip()))
+                elif column == "pathogen_id":
+                    table_row.append(pathogen_id)
+                elif column == "public_repository_id":
+                    table_row.append(repository_id)
+                else:
+                    table_row.append(format_values(row[file_fields[column]]))
+        yield table_row
+
+
 def write_table(metadata_fh, pathogen_slug: str, public_repository_name: str):
     data = csv.DictReader(metadata_fh, delimiter="\t")
 
     interface: SqlAlchemyInterface = init_db(get_db_uri(Config()))
     fields_to_import = get_fields_to_import(public_repository_name)
+    timer = PhaseTimer()
 
-    num_rows = 0
     with session_scope(interface) as session:
         pathogen = session.query(Pathogen).filter(Pathogen.slug == pathogen_slug).one()  # type: ignore
         repository = session.query(PublicRepository).filter(PublicRepository.name == public_repository_name).one()  # type: ignore
 
         dest_table = PublicRepositoryMetadata.__table__
         temp_table = create_temp_table(session, dest_table)
+        columns = [col.name for col in temp_table.columns]
+
+        # We stream into a temporary table and then swap table contents with public_repository_metadata.
+        # Rows are transformed as COPY asks for them, so memory use doesn't depend on the size of the dump.
+        with timer.phase("copy"):
+            num_rows = copy_rows(
+                session,
+                temp_table,
+                columns,
+                metadata_rows(
+                    data,
+                    fields_to_import,
+                    columns,
+                    pathogen.id,
+                    repository.id,
+                    timer,
+                ),
+            )
+        # Parsing happens inside the COPY, so report the two separately.
+        timer.timings["copy"] -= timer.timings.get("parse", 0.0)
+        print(f"{datetime.datetime.now()} - {num_rows} inserted -- complete!")
 
-        objects: List[
-            Dict[str, Union[Optional[str], Optional[int], Optional[datetime.datetime]]]
-        ] = []
-        # We insert into a temporary table and then swap table contents with public_repository_metadata
-        for row in data:
-            num_rows += 1
-            # add this row to the db
-            metadata_fields: Dict[
-                str, Union[Optional[str], Optional[int], Optional[datetime.datetime]]
-            ] = {
-                table_field: format_values(row[file_field])
-                for file_field, table_field in fields_to_import.items()
-            }
-            if num_rows % 20000 == 0:
-                session.execute(temp_table.insert(), objects)
-                print(f"{datetime.datetime.now()} - {num_rows} inserted")
-                objects = []
-            try:
-                metadata_fields["date"] = arrow.get(row["date"]).datetime
-            except arrow.parser.ParserError:
-                metadata_fields["date"] = None  # Date isn't parseable
-            metadata_fields["pathogen_id"] = pathogen.id
-            metadata_fields["public_repository_id"] = repository.id
-            objects.append(metadata_fields)
-        if objects:
-            session.execute(temp_table.insert(), objects)
-            print(f"{datetime.datetime.now()} - {num_rows} inserted -- complete!")
         # Replace all the gisaid metadata info with the latest import.
-        mv_table_contents(session, temp_table, dest_table, [(PublicRepositoryMetadata.pathogen_id == pathogen.id), (PublicRepositoryMetadata.public_repository_id == repository.id)])  # type: ignore
-        drop_temp_table(session, temp_table)
-        session.commit()
+        with timer.phase("swap"):
+            mv_table_contents(session, temp_table, dest_table, [(PublicRepositoryMetadata.pathogen_id == pathogen.id), (PublicRepositoryMetadata.public_repository_id == repository.id)])  # type: ignore
+            drop_temp_table(session, temp_table)
+            session.commit()
 
         print(f"Successfully imported {num_rows}")
+        print(
+            "Timings (seconds): "
+            + ", ".join(f"{name}={secs:.1f}" for name, secs in timer.timings.items())
+        )
+        print(f"Date cache: {normalize_date.cache_info()}")
 
 
 if __name__ == "__main__":
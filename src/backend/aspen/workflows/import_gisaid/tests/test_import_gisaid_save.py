@@ -0,0 +1,73 @@
+import datetime
+import io
+
+import pytest
+
+from aspen.database.models import PublicRepositoryMetadata
+from aspen.test_infra.models.pathogen import random_pathogen_factory
+from aspen.test_infra.models.repo_metadata import repo_metadata_factory
+from aspen.test_infra.models.repository import public_repo_factory
+from aspen.workflows.import_gisaid.save import normalize_date, write_table
+
+METADATA_TSV = """strain\tpango_lineage\tgisaid_epi_isl\tregion\tcountry\tdivision\tlocation\tdate
+hCoV-19/USA/CA-1/2021\tB.1.1\tEPI_ISL_1\tNorth America\tUSA\tCalifornia\tAlameda County\t2021-05-03
+hCoV-19/USA/CA-2/2021\tB.1.2\tEPI_ISL_2\tNorth America\tUSA\tCalifornia\t\t2021-05
+hCoV-19/USA/CA-3/2021\t"B.1.3"\tEPI_ISL_3\tNorth America\tUSA\tCalifornia\t \t2021-05-XX
+"""
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("2021-05-03", "2021-05-03 00:00:00"),
+        ("2021-5-3", "2021-05-03 00:00:00"),
+        ("2021-05", "2021-05-01 00:00:00"),
+        ("2021", "2021-01-01 00:00:00"),
+        ("2021-05-03T10:00:00", "2021-05-03 10:00:00"),
+        ("2021-05-XX", None),
+        ("2021-02-30", None),
+        ("?", None),
+        ("", None),
+    ],
+)
+def test_normalize_date(value, expected):
+    assert normalize_date(value) == expected
+
+
+def test_write_table(mocker, session, postgres_database):
+    pathogen = random_pathogen_factory()
+    repository = public_repo_factory("GISAID")
+    # This row should be replaced by the import.
+    session.add(repo_metadata_factory(pathogen, repository, strain="stale"))
+    session.commit()
+    mocker.patch(
+        "aspen.config.config.Config.DATABASE_URI",
+        new_callable=mocker.PropertyMock,
+        return_value=postgres_database.as_uri(),
+    )
+
+    write_table(io.StringIO(METADATA_TSV), pathogen.slug, "GISAID")
+
+    # start new transaction
+    session.close()
+    session.begin()
+    rows = {
+        row.strain: row
+        for row in session.query(PublicRepositoryMetadata).filter(
+            PublicRepositoryMetadata.pathogen_id == pathogen.id
+        )
+    }
+    assert set(rows) == {
+        "hCoV-19/USA/CA-1/2021",
+        "hCoV-19/USA/CA-2/2021",
+        "hCoV-19/USA/CA-3/2021",
+    }
+    first = rows["hCoV-19/USA/CA-1/2021"]
+    assert first.lineage == "B.1.1"
+    assert first.isl == "EPI_ISL_1"
+    assert first.location == "Alameda County"
+    assert first.date == datetime.datetime(2021, 5, 3)
+    assert rows["hCoV-19/USA/CA-2/2021"].date == datetime.datetime(2021, 5, 1)
+    assert rows["hCoV-19/USA/CA-2/2021"].location is None
+    assert rows["hCoV-19/USA/CA-3/2021"].date is None
+    assert rows["hCoV-19/USA/CA-3/2021"].location is None
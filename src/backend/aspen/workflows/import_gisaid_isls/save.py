@@ -33,10 +33,6 @@ def save(pathogen_slug, public_repository):
     interface: SqlAlchemyInterface = init_db(get_db_uri(config))
 
     with session_scope(interface) as session:
-        # Note: the syntax of the literal_column() is purposefully done so the resulting
-        # PostgreSQL expression will have single-quotes around it, since we are
-        # SELECTing on a string literal (this is done in order to give every row in this subquery
-        # the value 'GISAID_ISL' in the 'accession_type' column.)
         pathogen_obj = session.execute(sa.select(Pathogen).where(Pathogen.slug == pathogen_slug)).scalars().one()  # type: ignore
         pathogen_repo_config_obj = (
             session.execute(
@@ -54,26 +50,49 @@ def save(pathogen_slug, public_repository):
         prefix = f"^{pathogen_repo_config_obj.prefix}/"
 
         if public_repository == "GISAID":
-            accession_type = AccessionType.GISAID_ISL.value
+            accession_type = AccessionType.GISAID_ISL
 
         if public_repository == "GenBank":
-            accession_type = AccessionType.GENBANK.value
+            accession_type = AccessionType.GENBANK
 
+        # Samples are the small side here, so each sample's strain name (its public
+        # identifier minus our prefix) is looked up through the metadata table's
+        # (pathogen_id, strain, public_repository_id) primary key.
+        strain = func.regexp_replace(Sample.public_identifier, prefix, "", "i")
+        # Note: the syntax of the literal_column() is purposefully done so the resulting
+        # PostgreSQL expression will have single-quotes around it, since we are
+        # SELECTing on a string literal (this is done in order to give every row in this subquery
+        # the value 'GISAID_ISL' in the 'accession_type' column.)
         subquery = (
             sa.select(
                 Sample.id,
-                literal_column(f"'{accession_type}'").label("accession_type"),
+                literal_column(f"'{accession_type.value}'").label("accession_type"),
                 PublicRepositoryMetadata.isl,
             )
             .select_from(Sample)
             .join(
                 PublicRepositoryMetadata,
-                func.regexp_replace(Sample.public_identifier, prefix, "", "i")
-                == PublicRepositoryMetadata.strain,
+                sa.and_(
+                    PublicRepositoryMetadata.pathogen_id == pathogen_obj.id,
+                    PublicRepositoryMetadata.public_repository_id
+                    == pathogen_repo_config_obj.public_repository_id,
+                    PublicRepositoryMetadata.strain == strain,
+                ),
+            )
+            .outerjoin(
+                Accession,
+                sa.and_(
+                    Accession.sample_id == Sample.id,
+                    Accession.accession_type == accession_type,
+                ),
             )
             .where(
                 Sample.pathogen_id == pathogen_obj.id,
-                PublicRepositoryMetadata.pathogen_id == pathogen_obj.id,
+                PublicRepositoryMetadata.isl != None,
+                # Only samples without an accession yet, or whose accession changed.
+                # Rewriting every accession every night is most of the work
+                # otherwise, and bloats the table for nothing.
+                Accession.accession.is_distinct_from(PublicRepositoryMetadata.isl),
             )
             .subquery()
         )
@@ -92,6 +111,7 @@ def save(pathogen_slug, public_repository):
         session.commit()
 
         print(f"Successfully imported {result.rowcount} ISLs!")
+        return result.rowcount
 
 
 @click.command("save")
@@ -0,0 +1,81 @@
+from aspen.database.models import Accession, AccessionType
+from aspen.test_infra.models.gisaid_accession import gisaid_accession_factory
+from aspen.test_infra.models.location import location_factory
+from aspen.test_infra.models.pathogen import random_pathogen_factory
+from aspen.test_infra.models.pathogen_repo_config import pathogen_repo_config_factory
+from aspen.test_infra.models.repo_metadata import repo_metadata_factory
+from aspen.test_infra.models.repository import public_repo_factory
+from aspen.test_infra.models.sample import sample_factory
+from aspen.test_infra.models.usergroup import group_factory, user_factory
+from aspen.workflows.import_gisaid_isls.save import save
+
+
+def test_save_only_touches_changed_accessions(mocker, session, postgres_database):
+    pathogen = random_pathogen_factory()
+    gisaid = public_repo_factory("GISAID")
+    genbank = public_repo_factory("GenBank")
+    group = group_factory()
+    user = user_factory(group)
+    location = location_factory(
+        "North America", "USA", "California", "Santa Barbara County"
+    )
+    public_identifiers = [
+        # Our prefix is stripped before matching, whatever its case.
+        "hCoV-19/USA/CA-1/2021",
+        "USA/CA-2/2021",
+        "HCOV-19/USA/CA-3/2021",
+        # Only in GenBank's metadata, so it doesn't get a GISAID accession.
+        "USA/CA-4/2021",
+    ]
+    samples = [
+        sample_factory(
+            group,
+            user,
+            location,
+            pathogen=pathogen,
+            private_identifier=f"private_{i}",
+            public_identifier=public_identifier,
+        )
+        for i, public_identifier in enumerate(public_identifiers)
+    ]
+    session.add_all(samples)
+    session.add(pathogen_repo_config_factory("hCoV-19", pathogen, gisaid))
+    for i in range(1, 4):
+        session.add(
+            repo_metadata_factory(
+                pathogen, gisaid, strain=f"USA/CA-{i}/2021", isl=f"EPI_ISL_{i}"
+            )
+        )
+    session.add(
+        repo_metadata_factory(pathogen, genbank, strain="USA/CA-4/2021", isl="OK1")
+    )
+    session.flush()
+    # One stale accession, and one that's already up to date.
+    session.add(gisaid_accession_factory(samples[1], "EPI_ISL_OLD"))
+    session.add(gisaid_accession_factory(samples[2], "EPI_ISL_3"))
+    session.commit()
+    sample_ids = [sample.id for sample in samples]
+    mocker.patch(
+        "aspen.config.config.Config.DATABASE_URI",
+        new_callable=mocker.PropertyMock,
+        return_value=postgres_database.as_uri(),
+    )
+
+    assert save(pathogen.slug, "GISAID") == 2
+
+    # start new transaction
+    session.close()
+    session.begin()
+    accessions = {
+        accession.sample_id: accession.accession
+        for accession in session.query(Accession).filter(
+            Accession.accession_type == AccessionType.GISAID_ISL
+        )
+    }
+    assert accessions == {
+        sample_ids[0]: "EPI_ISL_1",
+        sample_ids[1]: "EPI_ISL_2",
+        sample_ids[2]: "EPI_ISL_3",
+    }
+    # Nothing left to do on the next run.
+    assert save(pathogen.slug, "GISAID") == 0
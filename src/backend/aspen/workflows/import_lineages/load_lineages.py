@@ -13,6 +13,7 @@ from aspen.database.connection import (
     SqlAlchemyInterface,
 )
 from aspen.database.models import Pathogen, PathogenLineage
+from aspen.database.reference_cache import invalidate_reference_cache_sync
 from aspen.util.pathogen_configs import get_lineage_urls
 from aspen.workflows.shared_utils.database import (
     create_temp_table,
@@ -124,6 +125,8 @@ def load_lineages_data(pathogen_slug, lineages: list[str]) -> None:
             raise RuntimeError("Something went wrong loading DB. Abort!")
             # This exception will bubble up, end session, cause rollback.
 
+        # Tell the API workers to serve the new lineages.
+        invalidate_reference_cache_sync(session)
         session.commit()
 
 
@@ -19,6 +19,7 @@ from aspen.database.connection import (
     SqlAlchemyInterface,
 )
 from aspen.database.models import Location
+from aspen.database.reference_cache import invalidate_reference_cache_sync
 
 
 def load_latlongs(fh: io.TextIOBase):
@@ -120,6 +121,8 @@ def import_ncov_latlongs(session, latlong_file):
         if num_committed > 1000:
             num_committed = 0
             session.commit()
+    # Tell the API workers now, rather than at their next version check.
+    invalidate_reference_cache_sync(session)
     session.commit()
 
 
@@ -17,6 +17,7 @@ from aspen.database.connection import (
     SqlAlchemyInterface,
 )
 from aspen.database.models import Location, Pathogen, PublicRepositoryMetadata
+from aspen.database.reference_cache import invalidate_reference_cache_sync
 
 
 def get_metadata_query(pathogen_slug, division=True, location=True):
@@ -112,6 +113,8 @@ def save(pathogen_slug: str):
         )
         run_insert_select(session, all_countries)
 
+        # Tell the API workers to pick up the new locations.
+        invalidate_reference_cache_sync(session)
         session.commit()
 
     print("Successfully imported locations!")
@@ -12,6 +12,7 @@ from aspen.database.connection import (
     SqlAlchemyInterface,
 )
 from aspen.database.models import Pathogen, PathogenLineage
+from aspen.database.reference_cache import invalidate_reference_cache_sync
 from aspen.workflows.shared_utils.database import (
     create_temp_table,
     drop_temp_table,
@@ -146,6 +147,8 @@ def load_lineages_data(lineages: list[str]) -> None:
             raise RuntimeError("Something went wrong loading DB. Abort!")
             # This exception will bubble up, end session, cause rollback.
 
+        # Tell the API workers to serve the new lineages.
+        invalidate_reference_cache_sync(session)
         session.commit()
 
 
@@ -1,11 +1,13 @@
 import csv
 import io
+import json
 from datetime import datetime
-from typing import Dict, IO, Optional, Set
+from typing import Any, Dict, IO, Iterator, List, Optional, Set, Tuple
 
 import click
 import sqlalchemy as sa
 from Bio import SeqIO
+from sqlalchemy.dialects.postgresql import insert, JSONB
 from sqlalchemy.orm.session import Session
 
 from aspen.config.config import Config
@@ -26,6 +28,7 @@ from aspen.database.models import (
     SampleQCMetric,
 )
 from aspen.workflows.nextclade.utils import extract_dataset_info
+from aspen.workflows.shared_utils.database import copy_rows
 
 # TODO, create an enum table for below and standard nextclade QC overallStatus
 INVALID_RESULT_STATUS = "invalid"
@@ -64,143 +67,25 @@ def cli(
     print("Beginning to save Nextclade results to DB.")
     # Track info about the dataset that was used to produce results being saved
     dataset_info = extract_dataset_info(nextclade_tag_fh)
-    # Set of sample_ids for all samples we expect will be in aligned fasta.
-    aligned_fasta_expected: Set[int] = set()
-
-    # This can be a lot of samples, so batch up commits as we go.
-    COMMIT_CHUNK_SIZE = 1000  # This number has worked fine in manual running.
-    entry_count_so_far = 0  # Final value will be total count.
 
     interface: SqlAlchemyInterface = init_db(get_db_uri(Config()))
     with session_scope(interface) as session:
-        nextclade_csv: csv.DictReader = csv.DictReader(nextclade_fh, delimiter=";")
-        for row in nextclade_csv:
-            entry_count_so_far += 1
-            # For entire workflow, we use sample id primary keys for names.
-            sample_id = int(row["seqName"])
-            sample_q = sa.select(Sample).where(Sample.id == sample_id)
-            sample = session.execute(sample_q).scalars().one()
-
-            is_result_valid = is_nextclade_result_valid(row)
-            # We always record QC info for any sample run, even if invalid.
-            qc_score: Optional[str] = row["qc.overallScore"]
-            qc_status = row["qc.overallStatus"]
-            if is_result_valid:
-                # If valid result, we expect it will have an aligned sequence
-                aligned_fasta_expected.add(sample_id)
-            else:
-                # If result was invalid, mark QC info accordingly
-                qc_score = None
-                qc_status = INVALID_RESULT_STATUS
-
-            existing_qc_metric_q = (
-                sa.select(SampleQCMetric)
-                .join(SampleQCMetric.sample)
-                .filter(
-                    SampleQCMetric.sample == sample,
-                    SampleQCMetric.qc_caller == QCMetricCaller.NEXTCLADE,
-                )
-            )
-            qc_metric = session.execute(existing_qc_metric_q).scalars().one_or_none()
-            if qc_metric is None:
-                qc_metric = SampleQCMetric(
-                    sample=sample,
-                    qc_caller=QCMetricCaller.NEXTCLADE,
-                    qc_score=qc_score,
-                    qc_status=qc_status,
-                    raw_qc_output={key: value for key, value in row.items()},
-                    qc_software_version=nextclade_version,
-                    reference_dataset_name=dataset_info["name"],
-                    reference_sequence_accession=dataset_info["accession"],
-                    reference_dataset_tag=dataset_info["tag"],
-                )
-            else:
-                qc_metric.qc_score = qc_score
-                qc_metric.qc_status = qc_status
-                qc_metric.raw_qc_output = {key: value for key, value in row.items()}
-                qc_metric.qc_software_version = nextclade_version
-                qc_metric.reference_dataset_name = dataset_info["name"]
-                qc_metric.reference_sequence_accession = dataset_info["accession"]
-                qc_metric.reference_dataset_tag = dataset_info["tag"]
-            session.add(qc_metric)
-
-            # If run was invalid, we still set mutation, but all mutation data saved will be empty strings
-            existing_mutation_q = (
-                sa.select(SampleMutation)
-                .join(SampleMutation.sample)
-                .filter(
-                    SampleMutation.sample == sample,
-                    SampleMutation.mutations_caller == MutationsCaller.NEXTCLADE,
-                )
-            )
-            mutation = session.execute(existing_mutation_q).scalars().one_or_none()
-
-            if mutation is None:
-                mutation = SampleMutation(
-                    sample=sample,
-                    mutations_caller=MutationsCaller.NEXTCLADE,
-                    substitutions=row["substitutions"],
-                    insertions=row["insertions"],
-                    deletions=row["deletions"],
-                    aa_substitutions=row["aaSubstitutions"],
-                    aa_insertions=row["aaInsertions"],
-                    aa_deletions=row["aaDeletions"],
-                    reference_sequence_accession=dataset_info["accession"],
-                )
-            else:
-                mutation.substitutions = row["substitutions"]
-                mutation.insertions = row["insertions"]
-                mutation.deletions = row["deletions"]
-                mutation.aa_substitutions = row["aaSubstitutions"]
-                mutation.aa_insertions = row["aaInsertions"]
-                mutation.aa_deletions = row["aaDeletions"]
-                mutation.reference_sequence_accession = dataset_info["accession"]
-            session.add(mutation)
-
-            # If SC2 (covid) we use Pangolin, not Nextclade.
-            if pathogen_slug != "SC2":
-                # lineage will return FAILED if sample did not match well against reference
-                lineage = get_lineage_from_row(row, is_result_valid)
-
-                existing_sample_lineage_q = (
-                    sa.select(SampleLineage)
-                    .join(SampleLineage.sample)
-                    .filter(
-                        SampleLineage.sample == sample,
-                        SampleLineage.lineage_type == LineageType.NEXTCLADE,
-                    )
-                )
-
-                sample_lineage = (
-                    session.execute(existing_sample_lineage_q).scalars().one_or_none()
-                )
-
-                if sample_lineage is None:
-                    sample_lineage = SampleLineage(
-                        sample=sample,
-                        lineage_type=LineageType.NEXTCLADE,
-                        lineage_software_version=nextclade_version,
-                        lineage=lineage,
-                        reference_dataset_name=dataset_info["name"],
-                        reference_sequence_accession=dataset_info["accession"],
-                        reference_dataset_tag=dataset_info["tag"],
-                    )
-                else:
-                    sample_lineage.lineage_software_version = nextclade_version
-                    sample_lineage.lineage = lineage
-                    sample_lineage.reference_dataset_name = dataset_info["name"]
-                    sample_lineage.reference_sequence_accession = dataset_info[
-                        "accession"
-                    ]
-                    sample_lineage.reference_dataset_tag = dataset_info["tag"]
-                session.add(sample_lineage)
-
-            if entry_count_so_far % COMMIT_CHUNK_SIZE == 0:
-                session.commit()
-        # Don't forget to commit the last chunk of entries that remain!
+        # Set of sample_ids for all samples we expect will be in aligned fasta.
+        aligned_fasta_expected, staged_count, counts = save_nextclade_results(
+            session,
+            nextclade_fh,
+            dataset_info,
+            nextclade_version,
+            save_lineages=(pathogen_slug != "SC2"),
+        )
         session.commit()
         print("Finished saving Nextclade CSV results to DB.")
-        print(f"Total count of samples run and saved: {entry_count_so_far}")
+        print(f"Total count of samples run and saved: {staged_count}")
+        for table_name, table_counts in counts.items():
+            print(
+                f"{table_name}: {table_counts['inserted']} inserted, "
+                f"{table_counts['updated']} updated"
+            )
 
         # Now that CSV saving is done, we handle saving aligned sequence data
         ids_in_aligned_fasta = save_aligned_genomes(
@@ -228,6 +113,218 @@ def cli(
             )
 
 
+def _staging_table() -> sa.Table:
+    """One row per Nextclade CSV row, already reduced to the values we save."""
+    return sa.Table(
+        "nextclade_results_staging",
+        sa.MetaData(),
+        sa.Column("row_number", sa.Integer, nullable=False),
+        sa.Column("sample_id", sa.Integer, nullable=False),
+        sa.Column("qc_score", sa.String),
+        sa.Column("qc_status", sa.String, nullable=False),
+        sa.Column("raw_qc_output", JSONB),
+        sa.Column("lineage", sa.String, nullable=False),
+        sa.Column("substitutions", sa.String),
+        sa.Column("insertions", sa.String),
+        sa.Column("deletions", sa.String),
+        sa.Column("aa_substitutions", sa.String),
+        sa.Column("aa_insertions", sa.String),
+        sa.Column("aa_deletions", sa.String),
+        prefixes=["TEMPORARY"],
+        postgresql_on_commit="DROP",
+    )
+
+
+STAGING_COLUMNS = [
+    "row_number",
+    "sample_id",
+    "qc_score",
+    "qc_status",
+    "raw_qc_output",
+    "lineage",
+    "substitutions",
+    "insertions",
+    "deletions",
+    "aa_substitutions",
+    "aa_insertions",
+    "aa_deletions",
+]
+
+
+def _staging_rows(
+    nextclade_fh: io.TextIOBase, aligned_fasta_expected: Set[int]
+) -> Iterator[Tuple]:
+    nextclade_csv: csv.DictReader = csv.DictReader(nextclade_fh, delimiter=";")
+    for row_number, row in enumerate(nextclade_csv):
+        # For entire workflow, we use sample id primary keys for names.
+        sample_id = int(row["seqName"])
+        is_result_valid = is_nextclade_result_valid(row)
+        # We always record QC info for any sample run, even if invalid.
+        qc_score: Optional[str] = row["qc.overallScore"]
+        qc_status = row["qc.overallStatus"]
+        if is_result_valid:
+            # If valid result, we expect it will have an aligned sequence
+            aligned_fasta_expected.add(sample_id)
+        else:
+            # If result was invalid, mark QC info accordingly
+            qc_score = None
+            qc_status = INVALID_RESULT_STATUS
+        # lineage will return FAILED if sample did not match well against reference
+        lineage = get_lineage_from_row(row, is_result_valid)
+        # If run was invalid, we still set mutation, but all mutation data saved will be empty strings
+        yield (
+            row_number,
+            sample_id,
+            qc_score,
+            qc_status,
+            json.dumps(row),
+            lineage,
+            row["substitutions"],
+            row["insertions"],
+            row["deletions"],
+            row["aaSubstitutions"],
+            row["aaInsertions"],
+            row["aaDeletions"],
+        )
+
+
+def _upsert(
+    session: Session,
+    table: sa.Table,
+    staged: Any,
+    values: Dict[str, Any],
+    conflict_columns: List[str],
+) -> Dict[str, int]:
+    """INSERT ... SELECT ... ON CONFLICT DO UPDATE for every staged sample at once.
+
+    `xmax` is 0 for freshly inserted rows and non-zero for rows we updated, which
+    lets us report both counts from the one statement.
+    """
+    insert_stmt = insert(table).from_select(
+        list(values.keys()), sa.select(*values.values()).select_from(staged)
+    )
+    upsert = (
+        insert_stmt.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={
+                name: insert_stmt.excluded[name]
+                for name in values
+                if name not in conflict_columns
+            },
+        )
+        .returning(sa.literal_column("xmax = 0").label("inserted"))
+        .cte("upserted")
+    )
+    inserted, updated = session.execute(
+        sa.select(
+            sa.func.count().filter(upsert.c.inserted),
+            sa.func.count().filter(sa.not_(upsert.c.inserted)),
+        )
+    ).one()
+    return {"inserted": inserted, "updated": updated}
+
+
+def save_nextclade_results(
+    session: Session,
+    nextclade_fh: io.TextIOBase,
+    dataset_info: Dict[str, str],
+    nextclade_version: str,
+    save_lineages: bool = True,
+) -> Tuple[Set[int], int, Dict[str, Dict[str, int]]]:
+    """Saves QC metrics, mutations and (optionally) lineages from a Nextclade CSV.
+
+    The CSV is COPYed into a temp staging table, then each destination table gets
+    a single upsert joined against it, so the number of round trips doesn't
+    grow with the number of samples. Rows for sample ids that don't exist are
+    skipped. If a sample appears more than once, its last row wins.
+
+    Returns the sample ids we expect in the aligned FASTA, the number of CSV rows
+    staged, and rows inserted/updated per table.
+    """
+    aligned_fasta_expected: Set[int] = set()
+    staging = _staging_table()
+    staging.create(session.connection())
+    staged_count = copy_rows(
+        session,
+        staging,
+        STAGING_COLUMNS,
+        _staging_rows(nextclade_fh, aligned_fasta_expected),
+    )
+    # Latest row for each sample that actually exists.
+    staged = (
+        sa.select(staging)
+        .join(Sample.__table__, Sample.__table__.c.id == staging.c.sample_id)
+        .distinct(staging.c.sample_id)
+        .order_by(staging.c.sample_id, staging.c.row_number.desc())
+        .subquery("staged")
+    )
+
+    counts: Dict[str, Dict[str, int]] = {}
+    qc_metrics = SampleQCMetric.__table__
+    counts[qc_metrics.name] = _upsert(
+        session,
+        qc_metrics,
+        staged,
+        {
+            "sample_id": staged.c.sample_id,
+            "qc_caller": sa.literal(
+                QCMetricCaller.NEXTCLADE, qc_metrics.c.qc_caller.type
+            ),
+            "qc_score": staged.c.qc_score,
+            "qc_status": staged.c.qc_status,
+            "raw_qc_output": staged.c.raw_qc_output,
+            "qc_software_version": sa.literal(nextclade_version),
+            "reference_dataset_name": sa.literal(dataset_info["name"]),
+            "reference_sequence_accession": sa.literal(dataset_info["accession"]),
+            "reference_dataset_tag": sa.literal(dataset_info["tag"]),
+        },
+        ["sample_id", "qc_caller"],
+    )
+
+    mutations = SampleMutation.__table__
+    counts[mutations.name] = _upsert(
+        session,
+        mutations,
+        staged,
+        {
+            "sample_id": staged.c.sample_id,
+            "mutations_caller": sa.literal(
+                MutationsCaller.NEXTCLADE, mutations.c.mutations_caller.type
+            ),
+            "substitutions": staged.c.substitutions,
+            "insertions": staged.c.insertions,
+            "deletions": staged.c.deletions,
+            "aa_substitutions": staged.c.aa_substitutions,
+            "aa_insertions": staged.c.aa_insertions,
+            "aa_deletions": staged.c.aa_deletions,
+            "reference_sequence_accession": sa.literal(dataset_info["accession"]),
+        },
+        ["sample_id", "mutations_caller"],
+    )
+
+    # If SC2 (covid) we use Pangolin, not Nextclade.
+    if save_lineages:
+        lineages = SampleLineage.__table__
+        counts[lineages.name] = _upsert(
+            session,
+            lineages,
+            staged,
+            {
+                "sample_id": staged.c.sample_id,
+                "lineage_type": sa.literal(
+                    LineageType.NEXTCLADE, lineages.c.lineage_type.type
+                ),
+                "lineage_software_version": sa.literal(nextclade_version),
+                "lineage": staged.c.lineage,
+                "reference_dataset_name": sa.literal(dataset_info["name"]),
+                "reference_sequence_accession": sa.literal(dataset_info["accession"]),
+                "reference_dataset_tag": sa.literal(dataset_info["tag"]),
+            },
+            ["sample_id", "lineage_type"],
+        )
+    return aligned_fasta_expected, staged_count, counts
+
+
 def is_nextclade_result_valid(nextclade_csv_row: Dict[str, str]) -> bool:
     """Not all sequences succeed in run. Results with errors should be ignored.
 
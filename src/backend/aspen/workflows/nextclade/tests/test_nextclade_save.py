@@ -92,6 +92,9 @@ def test_nextclade_save_new_entries(mocker, session, postgres_database):
     )
 
     assert result.exit_code == 0
+    assert "sample_qc_metrics: 2 inserted, 0 updated" in result.output
+    assert "sample_mutations: 2 inserted, 0 updated" in result.output
+    assert "sample_lineages: 2 inserted, 0 updated" in result.output
 
     # start new transaction
     session.close()
@@ -196,6 +199,10 @@ def test_nextclade_save_overwrite(mocker, session, postgres_database):
     )
 
     assert result.exit_code == 0
+    # Sample 1 already had results, sample 2 didn't.
+    assert "sample_qc_metrics: 1 inserted, 1 updated" in result.output
+    assert "sample_mutations: 1 inserted, 1 updated" in result.output
+    assert "sample_lineages: 1 inserted, 1 updated" in result.output
 
     # start new transaction
     session.close()
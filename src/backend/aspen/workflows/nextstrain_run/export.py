@@ -2,11 +2,22 @@ import csv
 import io
 import json
 import re
-from typing import Any, Dict, IO, Iterable, List, Mapping, MutableMapping, Optional, Set
+from typing import (
+    Any,
+    Dict,
+    IO,
+    Iterable,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+)
 
 import click
 import sqlalchemy as sa
-from sqlalchemy.orm import aliased, joinedload, with_polymorphic
+from sqlalchemy.orm import joinedload, selectinload, with_polymorphic
 
 from aspen.config.config import Config
 from aspen.database.connection import (
@@ -19,6 +30,7 @@ from aspen.database.connection import (
 from aspen.database.models import (
     Accession,
     AccessionType,
+    AlignedPathogenGenome,
     AlignedRepositoryData,
     Entity,
     Group,
@@ -28,6 +40,7 @@ from aspen.database.models import (
     PathogenLineage,
     PhyloRun,
     Sample,
+    UploadedPathogenGenome,
 )
 from aspen.database.models.workflow import WorkflowStatusType
 from aspen.util.lineage import expand_lineage_wildcards
@@ -214,22 +227,17 @@ def export_run_config(
             session.commit()
         group: Group = phylo_run.group
 
-        # Fetch all of a group's samples.
-        county_samples: List[PathogenGenome] = []
-        if sequence_type == "aligned":
-            county_samples = get_aligned_county_samples(
-                session, group, phylo_run.pathogen
-            )
-        else:
-            county_samples = get_county_samples(session, group, phylo_run.pathogen)
-
         # get the aligned upstream run info.
         aligned_repo_data: AlignedRepositoryData = [
             inp for inp in phylo_run.inputs if isinstance(inp, AlignedRepositoryData)
         ][0]
 
+        # Stream all of a group's samples straight into the output files.
+        county_sample_batches = iter_county_sample_batches(
+            session, group, phylo_run.pathogen, sequence_type
+        )
         num_sequences = write_sequences_files(
-            session, sequence_type, county_samples, sequences_fh, metadata_fh
+            session, sequence_type, county_sample_batches, sequences_fh, metadata_fh
         )
 
         selected_samples: List[PathogenGenome] = [
@@ -269,36 +277,68 @@ def export_run_config(
         }
 
 
-def get_county_samples(session, group: Group, pathogen: Pathogen):
-    # Get all samples for the group
-    all_samples: Iterable[Sample] = (
-        session.query(Sample)
-        .filter(Sample.submitting_group_id == group.id)
-        .filter(Sample.pathogen_id == pathogen.id)
-        .options(
-            joinedload(Sample.uploaded_pathogen_genome, innerjoin=True).undefer(
-                PathogenGenome.sequence
-            )
-        )
-    )
-    pathogen_genomes = [sample.uploaded_pathogen_genome for sample in all_samples]
-    return pathogen_genomes
+# Number of samples we hold in memory at once while exporting.
+EXPORT_BATCH_SIZE = 1000
 
 
-def get_aligned_county_samples(session, group: Group, pathogen: Pathogen):
-    # Get all samples for the group
-    all_samples: Iterable[Sample] = (
-        session.query(Sample)
-        .filter(Sample.submitting_group_id == group.id)
-        .filter(Sample.pathogen_id == pathogen.id)
-        .options(
-            joinedload(Sample.aligned_pathogen_genome, innerjoin=True).undefer(
-                PathogenGenome.sequence
+def iter_county_sample_batches(
+    session: Session,
+    group: Group,
+    pathogen: Pathogen,
+    sequence_type: str,
+    batch_size: Optional[int] = None,
+) -> Iterator[List[Tuple[Sample, str]]]:
+    """Yields a group's (sample, sequence) pairs, `batch_size` at a time.
+
+    Sequences come off a server-side cursor, and each batch's samples are loaded
+    (with everything the metadata file needs) only once that batch is reached.
+    Everything from a batch is expunged from the session before the next one is
+    loaded, so memory use doesn't grow with the size of the group. Objects that
+    were already in the session (the phylo run's inputs, say) are left alone.
+    """
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    already_loaded = set(session.identity_map.keys())
+    genome_model = UploadedPathogenGenome
+    if sequence_type == "aligned":
+        genome_model = AlignedPathogenGenome
+    sequences_query = (
+        sa.select(genome_model.sample_id, genome_model.sequence)  # type: ignore
+        .join(Sample, Sample.id == genome_model.sample_id)  # type: ignore
+        .where(Sample.submitting_group_id == group.id)
+        .where(Sample.pathogen_id == pathogen.id)
+        .order_by(genome_model.sample_id)
+        .execution_options(stream_results=True, max_row_buffer=batch_size)
+    )
+    sequences = session.execute(sequences_query)
+    for rows in sequences.partitions(batch_size):
+        samples_query = (
+            sa.select(Sample)  # type: ignore
+            .where(Sample.id.in_([row.sample_id for row in rows]))  # type: ignore
+            .options(
+                joinedload(Sample.collection_location),
+                joinedload(Sample.submitting_group),
+                selectinload(Sample.uploaded_pathogen_genome),
+                selectinload(Sample.lineages),
+                selectinload(Sample.accessions),
             )
         )
-    )
-    pathogen_genomes = [sample.aligned_pathogen_genome[0] for sample in all_samples]
-    return pathogen_genomes
+        samples = {
+            sample.id: sample
+            for sample in session.execute(samples_query).unique().scalars()
+        }
+        yield [(samples[row.sample_id], row.sequence) for row in rows]
+        for sample in samples.values():
+            _expunge_sample(session, sample, already_loaded)
+
+
+def _expunge_sample(session: Session, sample: Sample, keep: Set[Any]) -> None:
+    # Locations and groups are shared between samples, so they stay put.
+    related = [sample.uploaded_pathogen_genome, *sample.lineages, *sample.accessions]
+    for obj in [sample, *related]:
+        if obj is None or obj not in session:
+            continue
+        if sa.inspect(obj).identity_key not in keep:
+            session.expunge(obj)
 
 
 def get_phylo_run(session, phylo_run_id):
@@ -509,60 +549,46 @@ def populate_aligned_row(sample, sequence):
 
 
 def write_sequences_files(
-    session, sequence_type: str, pathogen_genomes, sequences_fh, metadata_fh
+    session,
+    sequence_type: str,
+    sample_batches: Iterable[Iterable[Tuple[Sample, str]]],
+    sequences_fh,
+    metadata_fh,
 ):
-    # Create a list of the inputted pathogen genomes that are uploaded pathogen genomes
+    """Writes FASTA + metadata TSV rows for each (sample, sequence) as it arrives."""
     num_sequences = 0
-    sequences = {sequence for sequence in pathogen_genomes}
-
-    sample_ids = {sequence.sample_id for sequence in sequences}
-
-    sample_id_to_sample: Mapping[int, Sample] = {
-        sample.id: sample
-        for sample in session.query(Sample)
-        .filter(Sample.id.in_(sample_ids))
-        .options(joinedload(Sample.collection_location))
-        .options(joinedload(Sample.lineages))
-    }
-    aliased(Entity)
-
-    aspen_samples: Set[str] = set()
     csv_fields = NCOV_CSV_FIELDS
     if sequence_type == "aligned":
         csv_fields = GENBANK_CSV_FIELDS
     metadata_csv_fh = csv.DictWriter(metadata_fh, csv_fields, delimiter="\t")
     metadata_csv_fh.writeheader()
-    for pathogen_genome in pathogen_genomes:
-        # find the corresponding sample
-        sample_id = pathogen_genome.sample_id
-        sample = sample_id_to_sample[sample_id]
-        aspen_samples.add(sample.public_identifier)
-
-        sequence = "".join(
-            [
-                line
-                for line in pathogen_genome.sequence.splitlines()
-                if not (line.startswith(">") or line.startswith(";"))
-            ]
-        )
-
-        # N's are desired in aligned sequences but not uploaded ones!
-        if sequence_type != "aligned":
-            sequence = sequence.strip("Nn")
+    for batch in sample_batches:
+        for sample, raw_sequence in batch:
+            sequence = "".join(
+                [
+                    line
+                    for line in raw_sequence.splitlines()
+                    if not (line.startswith(">") or line.startswith(";"))
+                ]
+            )
 
-        fasta_label = f">{sample.public_identifier}\n"
-        if sequence_type == "aligned":
-            row = populate_aligned_row(sample, sequence)
-            # Use the accession from the resulting row as our fasta sample label
-            fasta_label = f">{row['accession']}\n"
-        else:
-            row = populate_uploaded_row(sample, sequence)
-
-        metadata_csv_fh.writerow(row)
-        sequences_fh.write(fasta_label)
-        sequences_fh.write(sequence)
-        sequences_fh.write("\n")
-        num_sequences += 1
+            # N's are desired in aligned sequences but not uploaded ones!
+            if sequence_type != "aligned":
+                sequence = sequence.strip("Nn")
+
+            fasta_label = f">{sample.public_identifier}\n"
+            if sequence_type == "aligned":
+                row = populate_aligned_row(sample, sequence)
+                # Use the accession from the resulting row as our fasta sample label
+                fasta_label = f">{row['accession']}\n"
+            else:
+                row = populate_uploaded_row(sample, sequence)
+
+            metadata_csv_fh.writerow(row)
+            sequences_fh.write(fasta_label)
+            sequences_fh.write(sequence)
+            sequences_fh.write("\n")
+            num_sequences += 1
     return num_sequences
 
 
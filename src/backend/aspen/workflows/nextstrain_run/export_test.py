@@ -125,8 +125,11 @@ def cli(
             session, sequences, sequence_type
         )
 
+        sample_batches = [
+            [(genome.sample, genome.sequence) for genome in pathogen_genomes]
+        ]
         num_sequences = write_sequences_files(
-            session, sequence_type, pathogen_genomes, sequences_fh, metadata_fh
+            session, sequence_type, sample_batches, sequences_fh, metadata_fh
         )
         if build_type != TreeType.OVERVIEW:
             gisaid_ids = generate_test_gisaid_ids(gisaid)
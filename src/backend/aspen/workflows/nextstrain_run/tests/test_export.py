@@ -484,6 +484,25 @@ def test_targeted_config_large(mocker, session, postgres_database, split_client)
     assert len(sequences.splitlines()) == 800  # 200 county samples, @2 lines each
 
 
+# Exports are streamed in batches; make sure batch boundaries don't change the output.
+def test_export_batches(mocker, session, postgres_database, split_client):
+    mock_remote_db_uri(mocker, postgres_database.as_uri())
+
+    tree_type = TreeType.OVERVIEW
+    phylo_run = create_test_data(session, split_client, tree_type, 10, 5, 0)
+    sequences, selected, metadata, _ = generate_run(phylo_run.id)
+
+    mocker.patch("aspen.workflows.nextstrain_run.export.EXPORT_BATCH_SIZE", 3)
+    batched_sequences, batched_selected, batched_metadata, _ = generate_run(
+        phylo_run.id
+    )
+    assert batched_sequences == sequences
+    assert batched_metadata == metadata
+    assert batched_selected == selected
+    assert len(selected.splitlines()) == 5
+    assert len(metadata.splitlines()) == 11  # 10 samples + 1 header line
+
+
 def generate_run(phylo_run_id, reset_status=False):
     sequences_fh = StringIO()
     selected_fh = StringIO()
@@ -1,6 +1,7 @@
+import io
 import re
 import uuid
-from typing import Iterable, Optional
+from typing import Any, Iterable, Iterator, Optional, Sequence
 
 from sqlalchemy import Column, MetaData, Table
 from sqlalchemy.orm.session import Session
@@ -73,3 +74,63 @@ def drop_temp_table(
     # mypy stubs (`sqlalchemy-stubs`) mistakenly set the DropTable type as
     # `str`, but SQLAlchemy actually expects a Table object for it.
     session.execute(DropTable(table_obj))  # type: ignore[arg-type]
+
+
+def _csv_field(value: Any) -> str:
+    # COPY's CSV format reads an unquoted empty field as NULL and a quoted one as
+    # an empty string, so always quote strings.
+    if value is None:
+        return ""
+    if isinstance(value, (int, float)):
+        return str(value)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class _CsvRowStream(io.RawIOBase):
+    """Read-only file object that renders rows as CSV lazily, so COPY can stream
+    arbitrarily many rows without building the whole payload in memory."""
+
+    def __init__(self, rows: Iterable[Sequence[Any]]):
+        self._rows: Iterator[Sequence[Any]] = iter(rows)
+        self._buffer = b""
+        self.row_count = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        while len(self._buffer) < len(b):
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = ",".join(_csv_field(value) for value in row) + "\n"
+            self._buffer += line.encode()
+            self.row_count += 1
+        chunk, self._buffer = self._buffer[: len(b)], self._buffer[len(b) :]
+        b[: len(chunk)] = chunk
+        return len(chunk)
+
+
+def copy_rows(
+    session: Session,
+    table: Table,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+) -> int:
+    """Bulk loads `rows` into `table` with a single COPY. Returns the row count.
+
+    Way faster than executemany INSERTs for big loads. Needs a psycopg2
+    connection, which is what the workflows use.
+    """
+    preparer = session.get_bind().dialect.identifier_preparer
+    copy_sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+        preparer.format_table(table),
+        ", ".join(preparer.quote(column) for column in columns),
+    )
+    stream = _CsvRowStream(rows)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(copy_sql, io.BufferedReader(stream, 1 << 16))
+    finally:
+        cursor.close()
+    return stream.row_count
@@ -0,0 +1,489 @@
+"""Benchmarks for the API's hot paths against synthetic datasets.
+
+For each dataset size this seeds a throwaway database (one group with N samples,
+each with an uploaded genome, a lineage, QC metrics and a GISAID accession, plus a
+phylo tree over some of them), then drives the real app in-process and records,
+per endpoint:
+  - latency percentiles (plus the first, cold, request on its own),
+  - how many SQL statements each request ran,
+  - the process's peak RSS, and how much it grew while hitting that endpoint.
+Results are written as JSON so runs can be diffed over time.
+
+Needs the docker-compose database + localstack, like the test suite does.
+
+Usage: python -m benchmarks.api_hot_paths --datasets 1k,50k --output results.json
+"""
+import asyncio
+import datetime
+import json
+import os
+import random
+import resource
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import boto3
+import click
+import sqlalchemy as sa
+from fastapi import FastAPI, Request
+from httpx import AsyncClient, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.api.authn import get_cookie_userid
+from aspen.api.deps import get_splitio
+from aspen.api.main import get_app
+from aspen.database import schema
+from aspen.database.connection import init_async_db, SqlAlchemyInterface
+from aspen.database.models import Group, PhyloTree, Role, User
+from aspen.test_infra.models.location import location_factory
+from aspen.test_infra.models.pathogen import pathogen_factory
+from aspen.test_infra.models.pathogen_repo_config import (
+    setup_gisaid_and_genbank_repo_configs,
+)
+from aspen.test_infra.models.phylo_tree import phylorun_factory, phylotree_factory
+from aspen.test_infra.models.usergroup import group_factory, userrole_factory
+from aspen.test_infra.postgres import (
+    create_test_database,
+    database_exists,
+    drop_test_database,
+    PostgresDatabase,
+)
+
+DATASETS = {"1k": 1_000, "50k": 50_000, "500k": 500_000}
+GROUP_NAME = "benchmark group"
+USER_ID = "benchmark-user"
+TREE_BUCKET = "benchmark-trees"
+NUM_LOCATIONS = 50
+NUM_LINEAGES = 200
+
+
+class StaticSplitClient:
+    """Stands in for split.io: every pathogen prefers GISAID."""
+
+    def get_pathogen_treatment(self, *args, **kwargs) -> str:
+        return "GISAID"
+
+    def get_usergroup_treatment(self, *args, **kwargs) -> str:
+        return "off"
+
+
+def get_header_userid(request: Request) -> Optional[str]:
+    return request.headers.get("user_id")
+
+
+def async_uri(database: PostgresDatabase) -> str:
+    return database.as_uri().replace("postgresql://", "postgresql+asyncpg://", 1)
+
+
+# Every synthetic sample gets a genome, a lineage, QC metrics and an accession.
+SEED_STATEMENTS = [
+    """
+    INSERT INTO aspen.samples (
+        submitting_group_id, uploaded_by_id, pathogen_id, private,
+        private_identifier, public_identifier, original_submission,
+        sample_collected_by, sample_collector_contact_address, authors,
+        collection_date, location_id, organism, host
+    )
+    SELECT
+        CAST(:group_id AS integer), CAST(:user_id AS integer),
+        CAST(:pathogen_id AS integer), n % 10 = 0,
+        'private_' || n, 'bench/public_' || n, '{}'::json,
+        'benchmark lab', 'benchmark address', '["benchmark"]'::jsonb,
+        DATE '2022-01-01' + (n % 700), :first_location_id + n % :num_locations,
+        'SARS-CoV-2', 'human'
+    FROM generate_series(1, :num_samples) AS n
+    """,
+    """
+    INSERT INTO aspen.entities (entity_type)
+    SELECT 'UPLOADED_PATHOGEN_GENOME'
+    FROM aspen.samples WHERE submitting_group_id = :group_id
+    """,
+    """
+    INSERT INTO aspen.pathogen_genomes (
+        entity_id, sequence, num_unambiguous_sites, num_missing_alleles, num_mixed,
+        sequencing_date
+    )
+    SELECT
+        id, CAST(:sequence AS text), length(CAST(:sequence AS text)), 0, 0,
+        DATE '2022-01-01'
+    FROM aspen.entities WHERE id > :max_entity_id
+    """,
+    """
+    INSERT INTO aspen.uploaded_pathogen_genomes (
+        pathogen_genome_id, sample_id, sequencing_depth, upload_date
+    )
+    SELECT genomes.id, samples.id, 0.9, now()
+    FROM (
+        SELECT id, row_number() OVER (ORDER BY id) AS n
+        FROM aspen.entities WHERE id > :max_entity_id
+    ) AS genomes
+    JOIN (
+        SELECT id, row_number() OVER (ORDER BY id) AS n
+        FROM aspen.samples WHERE submitting_group_id = :group_id
+    ) AS samples USING (n)
+    """,
+    """
+    INSERT INTO aspen.sample_lineages (
+        sample_id, lineage_type, lineage_software_version, lineage,
+        lineage_probability, last_updated
+    )
+    SELECT id, 'PANGOLIN', '4.1', 'B.1.' || (id % :num_lineages), 1.0, now()
+    FROM aspen.samples WHERE submitting_group_id = :group_id
+    """,
+    """
+    INSERT INTO aspen.sample_qc_metrics (
+        sample_id, qc_caller, qc_score, qc_software_version, qc_status
+    )
+    SELECT id, 'NEXTCLADE', '10', '2.0',
+        (ARRAY['good', 'mediocre', 'bad'])[1 + id % 3]
+    FROM aspen.samples WHERE submitting_group_id = :group_id
+    """,
+    """
+    INSERT INTO aspen.accessions (sample_id, accession_type, accession)
+    SELECT id, 'GISAID_ISL', 'EPI_ISL_' || id
+    FROM aspen.samples WHERE submitting_group_id = :group_id
+    """,
+    """
+    INSERT INTO aspen.phylo_tree_samples (sample_id, phylo_tree_id)
+    SELECT id, CAST(:tree_id AS integer)
+    FROM aspen.samples WHERE submitting_group_id = :group_id
+    ORDER BY id LIMIT :tree_size
+    """,
+]
+
+
+def make_tree_json(public_identifiers: List[str]) -> Dict[str, Any]:
+    leaves = [
+        {
+            "name": identifier,
+            "node_attrs": {
+                "country": {"value": "USA"},
+                "division": {"value": "California"},
+                "location": {"value": f"Benchmark County {i % NUM_LOCATIONS}"},
+            },
+        }
+        for i, identifier in enumerate(public_identifiers)
+    ]
+    # Group the leaves into internal nodes of 50 so the tree has some depth.
+    internal_nodes = [
+        {"name": f"NODE_{i}", "children": leaves[i : i + 50]}
+        for i in range(0, len(leaves), 50)
+    ]
+    return {
+        "meta": {
+            "colorings": [
+                {"key": key, "scale": [], "title": key, "type": "categorical"}
+                for key in ("country", "division", "location")
+            ]
+        },
+        "tree": {"name": "NODE_root", "children": internal_nodes},
+    }
+
+
+async def seed(
+    interface: SqlAlchemyInterface,
+    num_samples: int,
+    sequence_length: int,
+    tree_size: int,
+) -> None:
+    await schema.async_create_tables_and_schema(interface)
+    session: AsyncSession = interface.make_session()
+    session.add_all([Role(name="admin"), Role(name="viewer"), Role(name="member")])
+    await session.commit()
+
+    locations = [
+        location_factory("North America", "USA", "California", f"Benchmark County {i}")
+        for i in range(NUM_LOCATIONS)
+    ]
+    group = group_factory(name=GROUP_NAME, default_tree_location=locations[0])
+    user = await userrole_factory(
+        session, group, auth0_user_id=USER_ID, roles=["admin"]
+    )
+    pathogen = pathogen_factory("SC2", "SARS-CoV-2")
+    _, repo_config = setup_gisaid_and_genbank_repo_configs(session, pathogen)
+    phylo_run = phylorun_factory(
+        group, pathogen=pathogen, contextual_repository=repo_config.public_repository
+    )
+    phylo_tree = phylotree_factory(phylo_run, [], bucket=TREE_BUCKET)
+    session.add_all(locations + [group, user, pathogen, phylo_run, phylo_tree])
+    await session.commit()
+
+    max_entity_id = (
+        await session.execute(
+            sa.text("SELECT coalesce(max(id), 0) FROM aspen.entities")
+        )
+    ).scalar()
+    params = {
+        "group_id": group.id,
+        "user_id": user.id,
+        "pathogen_id": pathogen.id,
+        "first_location_id": min(location.id for location in locations),
+        "num_locations": NUM_LOCATIONS,
+        "num_samples": num_samples,
+        "num_lineages": NUM_LINEAGES,
+        "sequence": "".join(random.choice("ACGT") for _ in range(sequence_length)),
+        "max_entity_id": max_entity_id,
+        "tree_id": phylo_tree.entity_id,
+        "tree_size": tree_size,
+    }
+    for statement in SEED_STATEMENTS:
+        clause = sa.text(statement)
+        await session.execute(
+            clause, {key: params[key] for key in clause.compile().params}
+        )
+    await session.commit()
+
+    tree_identifiers = (
+        await session.execute(
+            sa.text(
+                "SELECT public_identifier FROM aspen.samples"
+                " WHERE submitting_group_id = :group_id ORDER BY id LIMIT :tree_size"
+            ),
+            {"group_id": group.id, "tree_size": tree_size},
+        )
+    ).scalars()
+    s3 = boto3.resource("s3", endpoint_url=os.getenv("BOTO_ENDPOINT_URL") or None)
+    bucket = s3.Bucket(TREE_BUCKET)
+    if bucket.creation_date is None:
+        bucket.create()
+    bucket.Object(phylo_tree.s3_key).put(
+        Body=json.dumps(make_tree_json(list(tree_identifiers)))
+    )
+    await session.close()
+
+    # Make sure the planner has real statistics for the new rows.
+    async with interface.engine.connect() as conn:  # type: ignore
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(sa.text("ANALYZE"))
+
+
+async def load_fixture_ids(interface: SqlAlchemyInterface) -> Dict[str, Any]:
+    session: AsyncSession = interface.make_session()
+    group = (
+        (await session.execute(sa.select(Group).where(Group.name == GROUP_NAME)))
+        .scalars()
+        .one()
+    )
+    tree_id = (
+        await session.execute(
+            sa.select(PhyloTree.entity_id).where(PhyloTree.group_id == group.id)
+        )
+    ).scalar()
+    user_id = (
+        await session.execute(sa.select(User.id).where(User.auth0_user_id == USER_ID))
+    ).scalar()
+    public_identifiers = (
+        (
+            await session.execute(
+                sa.text(
+                    "SELECT public_identifier FROM aspen.samples"
+                    " WHERE submitting_group_id = :group_id ORDER BY id LIMIT 1000"
+                ),
+                {"group_id": group.id},
+            )
+        )
+        .scalars()
+        .all()
+    )
+    await session.close()
+    return {
+        "group_id": group.id,
+        "user_id": user_id,
+        "tree_id": tree_id,
+        "public_identifiers": public_identifiers,
+    }
+
+
+def percentile(timings: List[float], pct: float) -> float:
+    # Nearest-rank percentile of an already sorted list.
+    index = max(0, min(len(timings) - 1, int(round(pct / 100 * len(timings))) - 1))
+    return timings[index]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def measure(
+    call: Callable[[], Awaitable[Response]],
+    iterations: int,
+    query_counter: List[int],
+) -> Dict[str, float]:
+    rss_before = peak_rss_mb()
+    timings: List[float] = []
+    query_counts: List[int] = []
+    response_bytes = 0
+    for _ in range(iterations + 1):
+        query_counter[0] = 0
+        start = time.perf_counter()
+        response = await call()
+        timings.append((time.perf_counter() - start) * 1000)
+        query_counts.append(query_counter[0])
+        response.raise_for_status()
+        response_bytes = len(response.content)
+    # The first request pays for cold caches, so report it on its own.
+    cold_ms = timings.pop(0)
+    query_counts.pop(0)
+    timings.sort()
+    return {
+        "iterations": iterations,
+        "cold_ms": cold_ms,
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": percentile(timings, 50),
+        "p90_ms": percentile(timings, 90),
+        "p95_ms": percentile(timings, 95),
+        "p99_ms": percentile(timings, 99),
+        "max_ms": timings[-1],
+        "queries_per_request": statistics.median(query_counts),
+        "response_bytes": response_bytes,
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_growth_mb": peak_rss_mb() - rss_before,
+    }
+
+
+async def run_endpoints(
+    app: FastAPI, ids: Dict[str, Any], iterations: int
+) -> Dict[str, Dict[str, float]]:
+    engine = app.state.db_engine.engine.sync_engine
+    query_counter = [0]
+
+    def count_query(*args):
+        query_counter[0] += 1
+
+    sa.event.listen(engine, "before_cursor_execute", count_query)
+    headers = {"user_id": USER_ID}
+    org_prefix = f"/v2/orgs/{ids['group_id']}/pathogens/SC2"
+    tree_prefix = f"{org_prefix}/phylo_trees/{ids['tree_id']}"
+    async with AsyncClient(app=app, base_url="http://benchmark") as client:
+        endpoints: Dict[str, Callable[[], Awaitable[Response]]] = {
+            "search_locations": lambda: client.post(
+                "/v2/locations/search/",
+                headers=headers,
+                json={
+                    "region": "North America",
+                    "country": "USA",
+                    "division": "California",
+                    "location": "Benchmark County 7",
+                },
+            ),
+            "get_single_phylo_tree": lambda: client.get(
+                f"{tree_prefix}/download", headers=headers
+            ),
+            "metadata_tsv": lambda: client.get(
+                f"{tree_prefix}/sample_ids", headers=headers
+            ),
+            "prepare_sequences_download": lambda: client.post(
+                f"{org_prefix}/sequences/",
+                headers=headers,
+                json={"sample_ids": ids["public_identifiers"]},
+            ),
+            "list_samples": lambda: client.get(
+                f"{org_prefix}/samples/", headers=headers
+            ),
+        }
+        results = {}
+        # Cheapest first, so peak RSS growth is attributed to the right endpoint.
+        for name, call in endpoints.items():
+            results[name] = await measure(call, iterations, query_counter)
+    sa.event.remove(engine, "before_cursor_execute", count_query)
+    return results
+
+
+async def benchmark_dataset(
+    label: str,
+    num_samples: int,
+    iterations: int,
+    sequence_length: int,
+    tree_size: int,
+    keep_database: bool,
+) -> Dict[str, Any]:
+    database_name = f"aspen_bench_{label}"
+    seed_seconds = None
+    if database_exists(database_name):
+        # Left behind by a previous --keep-databases run.
+        database = PostgresDatabase(database_name=database_name, port=5432)
+    else:
+        database = create_test_database(database_name, install_extensions=True)
+        start = time.perf_counter()
+        seed_interface = init_async_db(async_uri(database))
+        await seed(seed_interface, num_samples, sequence_length, tree_size)
+        await seed_interface.engine.dispose()  # type: ignore
+        seed_seconds = time.perf_counter() - start
+
+    os.environ["DB_DSN"] = async_uri(database)
+    app = get_app()
+    app.dependency_overrides[get_cookie_userid] = get_header_userid
+    app.dependency_overrides[get_splitio] = StaticSplitClient
+    await app.router.startup()
+    try:
+        ids = await load_fixture_ids(app.state.db_engine)
+        endpoints = await run_endpoints(app, ids, iterations)
+    finally:
+        await app.router.shutdown()
+        if not keep_database:
+            drop_test_database(database)
+    return {
+        "num_samples": num_samples,
+        "seed_seconds": seed_seconds,
+        "endpoints": endpoints,
+    }
+
+
+@click.command("api_hot_paths")
+@click.option(
+    "--datasets",
+    default="1k,50k",
+    show_default=True,
+    help=f"Comma separated, from: {', '.join(DATASETS)}",
+)
+@click.option("--iterations", type=int, default=20, show_default=True)
+@click.option("--sequence-length", type=int, default=1000, show_default=True)
+@click.option("--tree-size", type=int, default=2000, show_default=True)
+@click.option(
+    "--keep-databases",
+    is_flag=True,
+    help="Keep the seeded databases so later runs can skip seeding",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    default="benchmark_results.json",
+    show_default=True,
+)
+def cli(
+    datasets: str,
+    iterations: int,
+    sequence_length: int,
+    tree_size: int,
+    keep_databases: bool,
+    output: str,
+):
+    results: Dict[str, Any] = {
+        "started_at": datetime.datetime.utcnow().isoformat(),
+        "config": {
+            "iterations": iterations,
+            "sequence_length": sequence_length,
+            "tree_size": tree_size,
+        },
+        "datasets": {},
+    }
+    for label in datasets.split(","):
+        results["datasets"][label] = asyncio.run(
+            benchmark_dataset(
+                label,
+                DATASETS[label],
+                iterations,
+                sequence_length,
+                tree_size,
+                keep_databases,
+            )
+        )
+    with open(output, "w") as fh:
+        json.dump(results, fh, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
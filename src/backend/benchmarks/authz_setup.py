@@ -0,0 +1,85 @@
+"""Micro-benchmark for the per-request cost of setting up authorization.
+
+Compares building a fresh Oso instance for every request (register classes, parse
+policy.polar, then build a data filter) with reusing the worker's compiled policy.
+Nothing here talks to the database, so it can run anywhere the backend imports.
+
+Usage: python -m benchmarks.authz_setup --iterations 200
+"""
+import asyncio
+import json
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import click
+from oso import AsyncOso
+from polar.data.adapter.async_sqlalchemy2_adapter import AsyncSqlAlchemyAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from aspen.api.authn import AuthContext
+from aspen.api.authz import (
+    AuthZSession,
+    get_authz_policy,
+    POLICY_FILE,
+    register_classes,
+)
+from aspen.database.models import Group, Sample, User
+
+
+def make_auth_context() -> AuthContext:
+    group = Group(id=1, name="benchmark group")
+    user = User(id=1, name="benchmark user", system_admin=False)
+    return AuthContext(user, group, ["member"], [{"group_id": 2, "role": "viewer"}])
+
+
+async def per_request_oso(session: AsyncSession, ac: AuthContext) -> None:
+    # This is what every request used to do.
+    oso = AsyncOso()
+    oso.set_data_filtering_adapter(AsyncSqlAlchemyAdapter(session))
+    register_classes(oso)
+    await oso.load_files([POLICY_FILE])
+    await oso.authorized_query(ac, "read", Sample)
+
+
+async def shared_policy(session: AsyncSession, ac: AuthContext) -> None:
+    az = AuthZSession(session, ac)
+    await az.authorized_query("read", Sample)
+
+
+async def time_it(
+    func: Callable[[AsyncSession, AuthContext], Awaitable[None]], iterations: int
+) -> Dict[str, float]:
+    session = AsyncSession()
+    ac = make_auth_context()
+    timings: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await func(session, ac)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "mean_ms": statistics.mean(timings),
+        "p50_ms": timings[len(timings) // 2],
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+async def run(iterations: int) -> Dict[str, Dict[str, float]]:
+    # Build the shared policy up front, like the API does on worker startup.
+    await get_authz_policy()
+    return {
+        "per_request_oso": await time_it(per_request_oso, iterations),
+        "shared_policy": await time_it(shared_policy, iterations),
+    }
+
+
+@click.command("authz_setup")
+@click.option("--iterations", type=int, default=200, show_default=True)
+def cli(iterations: int):
+    results = asyncio.run(run(iterations))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
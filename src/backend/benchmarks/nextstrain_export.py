@@ -0,0 +1,131 @@
+"""Benchmark for the memory used by the Nextstrain sequence/metadata export.
+
+Creates a throwaway group with N synthetic samples (inside a transaction that gets
+rolled back), exports its sequences + metadata to /dev/null and reports the peak
+Python memory allocated while doing it. The peak should stay flat as N grows.
+
+Usage: python -m benchmarks.nextstrain_export --sizes 1000,10000,50000
+"""
+import datetime
+import json
+import os
+import random
+import time
+import tracemalloc
+from typing import Dict, List
+
+import click
+import sqlalchemy as sa
+
+from aspen.config.config import Config
+from aspen.database.connection import get_db_uri, init_db, Session
+from aspen.database.models import Group, Pathogen, Sample
+from aspen.test_infra.models.location import location_factory
+from aspen.test_infra.models.pathogen import pathogen_factory
+from aspen.test_infra.models.sequences import uploaded_pathogen_genome_factory
+from aspen.test_infra.models.usergroup import group_factory, user_factory
+from aspen.workflows.nextstrain_run import export
+
+# Roughly the length of a SARS-CoV-2 genome.
+SEQUENCE_LENGTH = 30000
+
+
+def create_samples(session: Session, num_samples: int) -> int:
+    suffix = f"{time.time_ns()}"
+    group = group_factory(name=f"export benchmark {suffix}", prefix=suffix)
+    user = user_factory(
+        group, email=f"{suffix}@benchmark.local", auth0_user_id=f"benchmark-{suffix}"
+    )
+    location = location_factory(
+        "North America", "USA", "Benchmark Division", f"Benchmark City {suffix}"
+    )
+    pathogen = (
+        session.execute(sa.select(Pathogen).where(Pathogen.slug == "SC2"))  # type: ignore
+        .scalars()
+        .one_or_none()
+    ) or pathogen_factory("SC2", "SARS-CoV-2")
+    session.add_all([group, user, location, pathogen])
+    session.flush()
+
+    sequence = "".join(random.choice("ACGT") for _ in range(SEQUENCE_LENGTH))
+    for i in range(num_samples):
+        sample = Sample(
+            submitting_group=group,
+            uploaded_by=user,
+            private_identifier=f"benchmark_private_{suffix}_{i}",
+            public_identifier=f"benchmark_public_{suffix}_{i}",
+            original_submission={},
+            collection_date=datetime.date.today(),
+            sample_collected_by="benchmark",
+            sample_collector_contact_address="benchmark",
+            collection_location=location,
+            organism="SARS-CoV-2",
+            pathogen=pathogen,
+            private=False,
+            authors=["benchmark"],
+        )
+        session.add(uploaded_pathogen_genome_factory(sample, sequence=sequence))
+        if i % 1000 == 999:
+            session.flush()
+            session.expunge_all()
+            group, user, location, pathogen = (
+                session.merge(obj, load=False)
+                for obj in (group, user, location, pathogen)
+            )
+    session.flush()
+    group_id = group.id
+    # Start the export with an empty session, like the workflow does.
+    session.expunge_all()
+    return group_id
+
+
+def export_samples(session: Session, group_id: int) -> Dict[str, float]:
+    group = session.get(Group, group_id)
+    pathogen = (
+        session.execute(sa.select(Pathogen).where(Pathogen.slug == "SC2"))  # type: ignore
+        .scalars()
+        .one()
+    )
+    tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as sequences_fh, open(os.devnull, "w") as metadata_fh:
+        num_sequences = export.write_sequences_files(
+            session,
+            "uploaded",
+            export.iter_county_sample_batches(session, group, pathogen, "uploaded"),
+            sequences_fh,
+            metadata_fh,
+        )
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "num_sequences": num_sequences,
+        "seconds": elapsed,
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+
+@click.command("nextstrain_export")
+@click.option("--sizes", default="1000,10000,50000", show_default=True)
+@click.option(
+    "--batch-size", type=int, default=export.EXPORT_BATCH_SIZE, show_default=True
+)
+def cli(sizes: str, batch_size: int):
+    export.EXPORT_BATCH_SIZE = batch_size
+    interface = init_db(get_db_uri(Config()))
+    results: List[Dict[str, float]] = []
+    for size in [int(size) for size in sizes.split(",")]:
+        session = interface.make_session()
+        try:
+            group_id = create_samples(session, size)
+            results.append({"samples": size, **export_samples(session, group_id)})
+        finally:
+            # Never keep the synthetic data around.
+            session.rollback()
+            session.close()
+    print(json.dumps({"batch_size": batch_size, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
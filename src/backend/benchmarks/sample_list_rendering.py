@@ -0,0 +1,148 @@
+"""Compares the two ways `list_samples` can build its response.
+
+  - "postgres": Postgres renders each sample's JSON and the handler streams it
+    (`SAMPLES_LIST_RENDER_IN_DB`, see aspen/api/utils/sample_json.py).
+  - "orm": load ORM objects, validate them with pydantic, serialize with orjson.
+
+Datasets are seeded like api_hot_paths (and share its databases when kept with
+--keep-databases). Besides the usual latency, query and memory numbers, each run
+checks that both paths returned the same bytes.
+
+Needs the docker-compose database + localstack, like the test suite does.
+
+Usage: python -m benchmarks.sample_list_rendering --datasets 10k,100k,500k
+"""
+import asyncio
+import datetime
+import json
+import os
+import time
+from typing import Any, Dict
+
+import click
+import sqlalchemy as sa
+from httpx import AsyncClient
+
+from aspen.api.authn import get_cookie_userid
+from aspen.api.deps import get_splitio
+from aspen.api.main import get_app
+from aspen.database.connection import init_async_db
+from aspen.test_infra.postgres import (
+    create_test_database,
+    database_exists,
+    drop_test_database,
+    PostgresDatabase,
+)
+from benchmarks.api_hot_paths import (
+    async_uri,
+    get_header_userid,
+    load_fixture_ids,
+    measure,
+    seed,
+    StaticSplitClient,
+    USER_ID,
+)
+
+DATASETS = {"10k": 10_000, "100k": 100_000, "500k": 500_000}
+# Cheapest first, so peak RSS growth is attributed to the right path.
+RENDER_IN_DB = {"postgres": True, "orm": False}
+
+
+async def benchmark_dataset(
+    label: str,
+    num_samples: int,
+    iterations: int,
+    keep_database: bool,
+) -> Dict[str, Any]:
+    database_name = f"aspen_bench_{label}"
+    seed_seconds = None
+    if database_exists(database_name):
+        # Left behind by a previous --keep-databases run.
+        database = PostgresDatabase(database_name=database_name, port=5432)
+    else:
+        database = create_test_database(database_name, install_extensions=True)
+        start = time.perf_counter()
+        seed_interface = init_async_db(async_uri(database))
+        # The sample list doesn't touch trees or sequences, so keep both small.
+        await seed(seed_interface, num_samples, sequence_length=100, tree_size=10)
+        await seed_interface.engine.dispose()  # type: ignore
+        seed_seconds = time.perf_counter() - start
+
+    os.environ["DB_DSN"] = async_uri(database)
+    app = get_app()
+    app.dependency_overrides[get_cookie_userid] = get_header_userid
+    app.dependency_overrides[get_splitio] = StaticSplitClient
+    await app.router.startup()
+    engine = app.state.db_engine.engine.sync_engine
+    query_counter = [0]
+
+    def count_query(*args):
+        query_counter[0] += 1
+
+    sa.event.listen(engine, "before_cursor_execute", count_query)
+    paths: Dict[str, Dict[str, float]] = {}
+    bodies: Dict[str, bytes] = {}
+    try:
+        ids = await load_fixture_ids(app.state.db_engine)
+        url = f"/v2/orgs/{ids['group_id']}/pathogens/SC2/samples/"
+        async with AsyncClient(app=app, base_url="http://benchmark") as client:
+            for path, render_in_db in RENDER_IN_DB.items():
+                app.state.aspen_settings.SAMPLES_LIST_RENDER_IN_DB = render_in_db
+                paths[path] = await measure(
+                    lambda: client.get(url, headers={"user_id": USER_ID}),
+                    iterations,
+                    query_counter,
+                )
+                bodies[path] = (
+                    await client.get(url, headers={"user_id": USER_ID})
+                ).content
+    finally:
+        sa.event.remove(engine, "before_cursor_execute", count_query)
+        await app.router.shutdown()
+        if not keep_database:
+            drop_test_database(database)
+    return {
+        "num_samples": num_samples,
+        "seed_seconds": seed_seconds,
+        "identical_bodies": bodies["postgres"] == bodies["orm"],
+        "speedup_p50": paths["orm"]["p50_ms"] / paths["postgres"]["p50_ms"],
+        "paths": paths,
+    }
+
+
+@click.command("sample_list_rendering")
+@click.option(
+    "--datasets",
+    default="10k,100k,500k",
+    show_default=True,
+    help=f"Comma separated, from: {', '.join(DATASETS)}",
+)
+@click.option("--iterations", type=int, default=5, show_default=True)
+@click.option(
+    "--keep-databases",
+    is_flag=True,
+    help="Keep the seeded databases so later runs can skip seeding",
+)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    default="sample_list_rendering.json",
+    show_default=True,
+)
+def cli(datasets: str, iterations: int, keep_databases: bool, output: str):
+    results: Dict[str, Any] = {
+        "started_at": datetime.datetime.utcnow().isoformat(),
+        "config": {"iterations": iterations},
+        "datasets": {},
+    }
+    for label in datasets.split(","):
+        results["datasets"][label] = asyncio.run(
+            benchmark_dataset(label, DATASETS[label], iterations, keep_databases)
+        )
+    with open(output, "w") as fh:
+        json.dump(results, fh, indent=2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,31 @@
+"""add sample list index
+
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+import enumtables  # noqa: F401
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_120000"
+down_revision = "20240816_223757"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_samples_pathogen_id_collection_date_id",
+        "samples",
+        ["pathogen_id", "collection_date", "id"],
+        unique=False,
+        schema="aspen",
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_samples_pathogen_id_collection_date_id",
+        table_name="samples",
+        schema="aspen",
+    )
@@ -0,0 +1,97 @@
+"""add queued jobs
+
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+import enumtables  # noqa: F401
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_130000"
+down_revision = "20261017_120000"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "queued_job_types",
+        sa.Column("item_id", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("item_id", name=op.f("pk_queued_job_types")),
+        schema="aspen",
+    )
+    op.create_table(
+        "queued_job_statuses",
+        sa.Column("item_id", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("item_id", name=op.f("pk_queued_job_statuses")),
+        schema="aspen",
+    )
+    op.enum_insert("queued_job_types", ["PANGOLIN", "LINEAGE_QC"], schema="aspen")
+    op.enum_insert(
+        "queued_job_statuses", ["PENDING", "DISPATCHED", "FAILED"], schema="aspen"
+    )
+    op.create_table(
+        "queued_jobs",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("job_type", enumtables.enum_column.EnumType(), nullable=False),
+        sa.Column("status", enumtables.enum_column.EnumType(), nullable=False),
+        sa.Column("pathogen_id", sa.Integer(), nullable=False),
+        sa.Column("group_id", sa.Integer(), nullable=True),
+        sa.Column(
+            "sample_ids",
+            sa.JSON(),
+            nullable=False,
+            comment="The sample identifiers the job takes: public identifiers for pangolin, sample ids for lineage qc.",
+        ),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False
+        ),
+        sa.Column(
+            "next_attempt_at",
+            sa.DateTime(),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column("dispatched_at", sa.DateTime(), nullable=True),
+        sa.Column("execution_arn", sa.String(), nullable=True),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["job_type"],
+            ["aspen.queued_job_types.item_id"],
+            name=op.f("fk_queued_jobs_job_type_queued_job_types"),
+        ),
+        sa.ForeignKeyConstraint(
+            ["status"],
+            ["aspen.queued_job_statuses.item_id"],
+            name=op.f("fk_queued_jobs_status_queued_job_statuses"),
+        ),
+        sa.ForeignKeyConstraint(
+            ["pathogen_id"],
+            ["aspen.pathogens.id"],
+            name=op.f("fk_queued_jobs_pathogen_id_pathogens"),
+        ),
+        sa.ForeignKeyConstraint(
+            ["group_id"],
+            ["aspen.groups.id"],
+            name=op.f("fk_queued_jobs_group_id_groups"),
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_queued_jobs")),
+        schema="aspen",
+    )
+    op.create_index(
+        "ix_queued_jobs_pending",
+        "queued_jobs",
+        ["next_attempt_at"],
+        unique=False,
+        schema="aspen",
+        postgresql_where=sa.text("status = 'PENDING'"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_queued_jobs_pending", table_name="queued_jobs", schema="aspen")
+    op.drop_table("queued_jobs", schema="aspen")
+    op.drop_table("queued_job_statuses", schema="aspen")
+    op.drop_table("queued_job_types", schema="aspen")
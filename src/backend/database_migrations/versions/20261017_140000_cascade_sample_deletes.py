@@ -0,0 +1,67 @@
+"""cascade sample deletes
+
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+import enumtables  # noqa: F401
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_140000"
+down_revision = "20261017_130000"
+branch_labels = None
+depends_on = None
+
+# (table, column, referred table, referred column, ondelete). These match what the
+# ORM relationships already do when a sample is deleted: children are deleted,
+# except lineages and aligned peptides, which are orphaned.
+FOREIGN_KEYS = [
+    ("accessions", "sample_id", "samples", "id", "CASCADE"),
+    ("uploaded_pathogen_genomes", "sample_id", "samples", "id", "CASCADE"),
+    ("aligned_pathogen_genome", "sample_id", "samples", "id", "CASCADE"),
+    ("sample_mutations", "sample_id", "samples", "id", "CASCADE"),
+    ("sample_qc_metrics", "sample_id", "samples", "id", "CASCADE"),
+    ("phylo_tree_samples", "sample_id", "samples", "id", "CASCADE"),
+    ("sample_lineages", "sample_id", "samples", "id", "SET NULL"),
+    ("aligned_peptides", "sample_id", "samples", "id", "SET NULL"),
+    ("pathogen_genomes", "entity_id", "entities", "id", "CASCADE"),
+    (
+        "uploaded_pathogen_genomes",
+        "pathogen_genome_id",
+        "pathogen_genomes",
+        "entity_id",
+        "CASCADE",
+    ),
+    (
+        "aligned_pathogen_genome",
+        "pathogen_genome_id",
+        "pathogen_genomes",
+        "entity_id",
+        "CASCADE",
+    ),
+    ("workflow_inputs", "entity_id", "entities", "id", "CASCADE"),
+]
+
+
+def replace_foreign_keys(with_ondelete: bool):
+    for table, column, referred_table, referred_column, ondelete in FOREIGN_KEYS:
+        name = f"fk_{table}_{column}_{referred_table}"
+        op.drop_constraint(name, table, schema="aspen", type_="foreignkey")
+        op.create_foreign_key(
+            op.f(name),
+            table,
+            referred_table,
+            [column],
+            [referred_column],
+            source_schema="aspen",
+            referent_schema="aspen",
+            ondelete=ondelete if with_ondelete else None,
+        )
+
+
+def upgrade():
+    replace_foreign_keys(with_ondelete=True)
+
+
+def downgrade():
+    replace_foreign_keys(with_ondelete=False)
@@ -0,0 +1,31 @@
+"""add public repository metadata isl index
+
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+import enumtables  # noqa: F401
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261017_150000"
+down_revision = "20261017_140000"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_public_repository_metadata_isl",
+        "public_repository_metadata",
+        ["isl"],
+        unique=False,
+        schema="aspen",
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "ix_public_repository_metadata_isl",
+        table_name="public_repository_metadata",
+        schema="aspen",
+    )